@@ -4,15 +4,16 @@ from django.db import migrations
 def generate_ref_code(apps, schema_editor):
     Attendance = apps.get_model('attendance', 'Attendance')
     Session = apps.get_model('attendance', 'AttendanceSession')
+    db_alias = schema_editor.connection.alias
     # iterate attendance records without ref_code
-    qs = Attendance.objects.filter(ref_code__isnull=True) | Attendance.objects.filter(ref_code='')
+    qs = Attendance.objects.using(db_alias).filter(ref_code__isnull=True) | Attendance.objects.using(db_alias).filter(ref_code='')
     for att in qs:
         # Build base similar to model logic
         event_id = None
         session_id = None
         try:
             if att.session_id:
-                session = Session.objects.filter(id=att.session_id).first()
+                session = Session.objects.using(db_alias).filter(id=att.session_id).first()
                 if session and getattr(session, 'event_id', None):
                     event_id = int(session.event_id)
                 if session:
@@ -39,7 +40,7 @@ def generate_ref_code(apps, schema_editor):
 
         candidate = base
         suffix = 0
-        while Attendance.objects.filter(ref_code=candidate).exclude(pk=att.pk).exists():
+        while Attendance.objects.using(db_alias).filter(ref_code=candidate).exclude(pk=att.pk).exists():
             suffix += 1
             suf = f"-{suffix}"
             truncate_len = 32 - len(suf)
@@ -4,6 +4,7 @@ from django.db import migrations, models
 def normalize_ref_codes(apps, schema_editor):
     Attendance = apps.get_model('attendance', 'Attendance')
     Session = apps.get_model('attendance', 'AttendanceSession')
+    db_alias = schema_editor.connection.alias
 
     def make_candidate(att):
         # Re-implement generation logic used in model to ensure alpha prefix
@@ -11,7 +12,7 @@ def normalize_ref_codes(apps, schema_editor):
         session_id = None
         try:
             if att.session_id:
-                session = Session.objects.filter(id=att.session_id).first()
+                session = Session.objects.using(db_alias).filter(id=att.session_id).first()
                 if session and getattr(session, 'event_id', None):
                     event_id = int(session.event_id)
                 if session:
@@ -53,7 +54,7 @@ def normalize_ref_codes(apps, schema_editor):
         candidate = base
         suffix = 0
         # Ensure uniqueness
-        while Attendance.objects.filter(ref_code=candidate).exclude(pk=att.pk).exists():
+        while Attendance.objects.using(db_alias).filter(ref_code=candidate).exclude(pk=att.pk).exists():
             suffix += 1
             suf = f"-{suffix}"
             truncate_len = 32 - len(suf)
@@ -62,7 +63,7 @@ def normalize_ref_codes(apps, schema_editor):
         return candidate
 
     # Update records whose ref_code is null/empty or does not start with a letter
-    qs = Attendance.objects.filter(models.Q(ref_code__isnull=True) | models.Q(ref_code='') | ~models.Q(ref_code__regex=r'^[A-Za-z]'))
+    qs = Attendance.objects.using(db_alias).filter(models.Q(ref_code__isnull=True) | models.Q(ref_code='') | ~models.Q(ref_code__regex=r'^[A-Za-z]'))
     for att in qs:
         att.ref_code = make_candidate(att)
         att.save()
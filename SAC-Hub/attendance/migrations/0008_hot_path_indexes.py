@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_merge_20251116_1737'),
+        ('events', '0013_event_indexes_unique_registration'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'status'], name='attendance_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['session', 'status'], name='attendance_session_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(fields=['event', 'locked', 'created_at'], name='attsession_event_locked_idx'),
+        ),
+    ]
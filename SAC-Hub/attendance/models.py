@@ -24,6 +24,11 @@ class AttendanceSession(models.Model):
 	locked = models.BooleanField(default=False)
 	attendance_code = models.CharField(max_length=32, unique=True, blank=True)
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['event', 'locked', 'created_at'], name='attsession_event_locked_idx'),
+		]
+
 	def save(self, *args, **kwargs):
 		if not self.attendance_code:
 			# short unique code
@@ -55,6 +60,10 @@ class Attendance(models.Model):
 
 	class Meta:
 		unique_together = ('session', 'student')
+		indexes = [
+			models.Index(fields=['student', 'status'], name='attendance_student_status_idx'),
+			models.Index(fields=['session', 'status'], name='attendance_session_status_idx'),
+		]
 
 	def __str__(self):
 		return f"{self.student} - {self.session} ({self.status})"
@@ -1,7 +1,10 @@
+from django.urls import path
 from rest_framework import routers
-from .views import CalendarEntryViewSet
+from .views import CalendarEntryViewSet, calendar_range
 
 router = routers.DefaultRouter()
 router.register(r'calendar-entries', CalendarEntryViewSet)
 
-urlpatterns = router.urls
+urlpatterns = [
+    path('calendar/', calendar_range, name='calendar-range'),
+] + router.urls
@@ -0,0 +1,170 @@
+"""
+Month grids for the event calendar.
+
+``month_grid(year, month, audience)`` returns the weeks of a month with each
+day's events, built from one query: events are bucketed by their local date
+in a single pass instead of scanning every event for every day. Month
+boundaries are the local midnights that start the month and the next one, so
+an event at 00:30 IST on the 1st lands on the 1st, not the previous month.
+
+The grid holds only what is the same for every viewer in an audience, and is
+cached under (year, month, audience, version). The version is a shared
+counter in the database (``sac_project.versions``): ``Event`` and
+``BlackoutDate`` saves and deletes bump it (``calendar_app.signals``), so no
+process reads a stale grid and old grids simply expire. Writes that skip
+signals (``bulk_create``, ``update()``) call ``invalidate()`` themselves.
+
+Per-request state (today's cell and the viewer's registrations) is applied on
+a copy with ``overlay``::
+
+    grid = month_grid(2025, 3)
+    weeks = overlay(grid['weeks'], 2025, 3, registered_ids={12, 40})
+
+The same version, with the time of the last change (``state``), validates
+responses of the range API (``calendar_app.views.calendar_range``).
+"""
+import calendar
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from events.models import DEFAULT_DURATION, Event, EventStatus
+from sac_project import versions
+
+from .models import BlackoutDate
+
+DEFAULTS = {
+    # Seconds a month grid stays cached (the version bump invalidates it earlier)
+    'GRID_TIMEOUT': 3600,
+    # Longest window the range API serves
+    'MAX_RANGE_DAYS': 366,
+}
+
+# Event statuses shown to each audience
+AUDIENCES = {
+    'public': [EventStatus.APPROVED],
+}
+
+VERSION_KEY = 'calendar'
+
+
+def calendar_setting(name):
+    return getattr(settings, 'CALENDAR', {}).get(name, DEFAULTS[name])
+
+
+def month_bounds(year, month):
+    """Aware datetimes of the local midnights starting ``month`` and the month after."""
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return (
+        timezone.make_aware(datetime(year, month, 1)),
+        timezone.make_aware(datetime(next_year, next_month, 1)),
+    )
+
+
+def state():
+    """(version, when calendar data last changed in whole seconds), in one query."""
+    current = versions.current(VERSION_KEY)
+    return current.version, current.modified.replace(microsecond=0)
+
+
+def version():
+    return state()[0]
+
+
+def last_modified():
+    return state()[1]
+
+
+def invalidate(using='default'):
+    """Make every cached month grid, and every validator handed out, stale.
+
+    ``using`` is the database whose calendar data changed.
+    """
+    versions.bump(VERSION_KEY, using=using)
+
+
+def build_grid(year, month, audience='public'):
+    start, end = month_bounds(year, month)
+    days = {}
+    events = Event.objects.filter(
+        date_time__gte=start, date_time__lt=end, status__in=AUDIENCES[audience]
+    ).order_by('date_time', 'id').values('id', 'name', 'date_time')
+    total = 0
+    for event in events:
+        days.setdefault(timezone.localtime(event['date_time']).day, []).append(event)
+        total += 1
+    weeks = [
+        [
+            {'day': day or '', 'is_other_month': not day, 'is_today': False, 'events': days.get(day, [])}
+            for day in week
+        ]
+        for week in calendar.monthcalendar(year, month)
+    ]
+    return {'weeks': weeks, 'total': total}
+
+
+def month_grid(year, month, audience='public'):
+    """The cached grid for ``month``: {'weeks': [[day cell, ...], ...], 'total': event count}."""
+    key = f'calendar:grid:{year}-{month:02d}:{audience}:v{version()}'
+    grid = cache.get(key)
+    if grid is None:
+        grid = build_grid(year, month, audience)
+        cache.set(key, grid, calendar_setting('GRID_TIMEOUT'))
+    return grid
+
+
+def month_event_ids(grid):
+    return [event['id'] for week in grid['weeks'] for cell in week for event in cell['events']]
+
+
+def overlay(weeks, year, month, registered_ids=(), today=None):
+    """Copy of ``weeks`` with today's cell marked and ``user_registered`` set on each event."""
+    today = today or timezone.localdate()
+    this_month = (today.year, today.month) == (year, month)
+    return [
+        [
+            dict(
+                cell,
+                is_today=this_month and cell['day'] == today.day,
+                events=[dict(event, user_registered=event['id'] in registered_ids) for event in cell['events']],
+            )
+            for cell in week
+        ]
+        for week in weeks
+    ]
+
+
+def window_events(start, end, club=None, department=None, audience='public'):
+    """Compact rows for the events starting in [start, end), in (start, id) order."""
+    events = Event.objects.filter(date_time__gte=start, date_time__lt=end, status__in=AUDIENCES[audience])
+    if club is not None:
+        events = events.filter(club_id=club)
+    if department is not None:
+        events = events.filter(department_id=department)
+    return [
+        {
+            'id': event['id'],
+            'title': event['name'],
+            'start': timezone.localtime(event['date_time']).isoformat(),
+            'end': timezone.localtime(event['end_time'] or event['date_time'] + DEFAULT_DURATION).isoformat(),
+            'type': event['event_type'],
+            'venue': event['venue'],
+            'club': event['club__name'],
+            'department': event['department__name'],
+        }
+        for event in events.order_by('date_time', 'id').values(
+            'id', 'name', 'date_time', 'end_time', 'event_type', 'venue', 'club__name', 'department__name'
+        )
+    ]
+
+
+def window_blackouts(start, end):
+    """Blackout days touching [start, end) as all-day background ranges."""
+    return [
+        {'start': day.isoformat(), 'end': (day + timedelta(days=1)).isoformat(), 'reason': reason, 'display': 'background'}
+        for day, reason in BlackoutDate.objects.filter(
+            date__gte=timezone.localtime(start).date(), date__lte=timezone.localtime(end - timedelta(microseconds=1)).date()
+        ).order_by('date').values_list('date', 'reason')
+    ]
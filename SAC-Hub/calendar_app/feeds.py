@@ -0,0 +1,229 @@
+"""
+Subscribable iCalendar (RFC 5545) feeds.
+
+Scopes: every approved event (``all``), one club's (``club:<id>``), one
+department's (``department:<id>``), and one user's registrations
+(``user:<id>``, served behind a signed token so the URL can be pasted into a
+calendar app without a session). Every feed also carries the blackout days.
+
+Feeds are built incrementally: each event's VEVENT block is cached under its
+id and ``updated_at``, so after an edit only that one block is rendered again
+and the rest are fetched with one ``get_many``. Whole feeds are cached per
+scope and calendar version (``calendar_app.engine``); user feeds are also
+keyed by the count and latest ``updated_at`` of the user's registrations.
+Both come from the database, so every worker agrees on them.
+
+``feed_etag``/``feed_last_modified`` give the validators for conditional GET,
+so a calendar app polling an unchanged feed gets a 304 after one indexed
+lookup (two for a user feed), without building the feed.
+"""
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils import timezone
+
+from events.models import DEFAULT_DURATION, Event, EventRegistration, EventStatus, RegistrationStatus
+
+from . import engine
+from .models import BlackoutDate
+
+FEED_DEFAULTS = {
+    # Events that ended longer ago than this are left out of feeds
+    'FEED_PAST_DAYS': 90,
+    'FEED_TIMEOUT': 3600,
+    'FEED_PRODUCT_ID': '-//SAC Hub//Event Calendar//EN',
+}
+
+TOKEN_SALT = 'calendar_app.feeds.user'
+
+
+def feed_setting(name):
+    return getattr(settings, 'CALENDAR', {}).get(name, FEED_DEFAULTS[name])
+
+
+def user_token(user):
+    """URL token for ``user``'s personal feed."""
+    return signing.Signer(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def user_from_token(token):
+    """The user id in ``token``, or None if the signature does not match."""
+    try:
+        return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def user_stamp(user_id):
+    """(count, latest ``updated_at`` or None) of ``user_id``'s registrations.
+
+    Any registration saved, added or deleted changes one of the two.
+    """
+    stamp = EventRegistration.objects.filter(student_id=user_id).aggregate(count=Count('id'), latest=Max('updated_at'))
+    return stamp['count'], stamp['latest']
+
+
+def _state(scope):
+    """(version, last modified) of the data behind ``scope``."""
+    version, modified = engine.state()
+    if scope.startswith('user:'):
+        count, latest = user_stamp(scope[5:])
+        if latest is None:
+            return (version, 0, None), modified
+        # Full precision in the version: two changes within a second must still give new ETags
+        return (version, count, latest.timestamp()), max(modified, latest.replace(microsecond=0))
+    return version, modified
+
+
+def feed_etag(scope):
+    version, _ = _state(scope)
+    # The date rolls the window of past events forward once a day
+    key = repr((scope, version, timezone.localdate()))
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def feed_last_modified(scope):
+    return _state(scope)[1]
+
+
+def escape_text(value):
+    return (
+        str(value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces (RFC 5545 3.1)."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts, start = [], 0
+    while start < len(encoded):
+        end = min(start + (75 if not parts else 74), len(encoded))
+        # Never cut a multi-byte character in half
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start = end
+    return '\r\n '.join(parts)
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_event(event, base_url, status=None):
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:event-{event['id']}@sac-hub",
+        f"DTSTAMP:{_utc(event['updated_at'])}",
+        f"DTSTART:{_utc(event['date_time'])}",
+        f"DTEND:{_utc(event['end_time'] or event['date_time'] + DEFAULT_DURATION)}",
+        f"SUMMARY:{escape_text(event['name'])}",
+        f"LOCATION:{escape_text(event['venue'])}",
+        f"CATEGORIES:{escape_text(event['event_type'])}",
+        f"DESCRIPTION:{escape_text(event['description'])}",
+        f"URL:{base_url}{reverse('event_detail', args=[event['id']])}",
+    ]
+    if event['club__name']:
+        lines.append(f"ORGANIZER;CN={escape_text(event['club__name'])}:MAILTO:noreply@sac-hub")
+    if status:
+        lines.append(f'STATUS:{status}')
+    lines.append('END:VEVENT')
+    return '\r\n'.join(fold(line) for line in lines)
+
+
+def render_blackout(day, reason):
+    return '\r\n'.join(fold(line) for line in [
+        'BEGIN:VEVENT',
+        f'UID:blackout-{day:%Y%m%d}@sac-hub',
+        f"DTSTAMP:{_utc(timezone.now().replace(hour=0, minute=0, second=0, microsecond=0))}",
+        f'DTSTART;VALUE=DATE:{day:%Y%m%d}',
+        f'DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}',
+        f'SUMMARY:{escape_text(f"Blackout: {reason}")}',
+        'TRANSP:TRANSPARENT',
+        'END:VEVENT',
+    ])
+
+
+EVENT_FIELDS = ('id', 'name', 'description', 'date_time', 'end_time', 'updated_at', 'venue', 'event_type', 'club__name')
+
+
+def _vevents(rows, base_url, statuses=None):
+    """VEVENT blocks for ``rows``, reusing the cached block of every unchanged event."""
+    statuses = statuses or {}
+    keys = {
+        row['id']: f"calendar:vevent:{base_url}:{row['id']}:{row['updated_at'].timestamp()}:{statuses.get(row['id'], '')}"
+        for row in rows
+    }
+    cached = cache.get_many(keys.values())
+    blocks, missing = [], {}
+    for row in rows:
+        block = cached.get(keys[row['id']])
+        if block is None:
+            block = missing[keys[row['id']]] = render_event(row, base_url, statuses.get(row['id']))
+        blocks.append(block)
+    if missing:
+        cache.set_many(missing, feed_setting('FEED_TIMEOUT'))
+    return blocks
+
+
+def _scope_rows(scope):
+    since = timezone.now() - timedelta(days=feed_setting('FEED_PAST_DAYS'))
+    events = Event.objects.filter(status=EventStatus.APPROVED, date_time__gte=since)
+    statuses = {}
+    kind, _, value = scope.partition(':')
+    if kind == 'club':
+        events = events.filter(club_id=value)
+    elif kind == 'department':
+        events = events.filter(department_id=value)
+    elif kind == 'user':
+        statuses = dict(
+            EventRegistration.objects.filter(student_id=value)
+            .exclude(status=RegistrationStatus.CANCELLED).values_list('event_id', 'status')
+        )
+        events = events.filter(pk__in=list(statuses))
+        statuses = {
+            event_id: 'CONFIRMED' if status == RegistrationStatus.REGISTERED else 'TENTATIVE'
+            for event_id, status in statuses.items()
+        }
+    return list(events.order_by('date_time', 'id').values(*EVENT_FIELDS)), statuses
+
+
+def build_feed(scope, name, base_url):
+    rows, statuses = _scope_rows(scope)
+    since = timezone.localdate() - timedelta(days=feed_setting('FEED_PAST_DAYS'))
+    blackouts = BlackoutDate.objects.filter(date__gte=since).order_by('date').values_list('date', 'reason')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f"PRODID:{feed_setting('FEED_PRODUCT_ID')}",
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        fold(f'X-WR-CALNAME:{escape_text(name)}'),
+        f'X-WR-TIMEZONE:{settings.TIME_ZONE}',
+        # Hint for clients that honour it; they poll with conditional GETs
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+        *_vevents(rows, base_url, statuses),
+        *(render_blackout(day, reason) for day, reason in blackouts),
+        'END:VCALENDAR',
+    ]
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def get_feed(scope, name, base_url):
+    """The ICS text for ``scope``, from the cache while the data is unchanged."""
+    key = 'calendar:feed:' + hashlib.md5(
+        repr((base_url, scope, name, feed_etag(scope))).encode(), usedforsecurity=False
+    ).hexdigest()
+    body = cache.get(key)
+    if body is None:
+        body = build_feed(scope, name, base_url)
+        cache.set(key, body, feed_setting('FEED_TIMEOUT'))
+    return body
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from events.models import Event
+
+from .engine import invalidate
+from .models import BlackoutDate
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=BlackoutDate)
+@receiver(post_delete, sender=BlackoutDate)
+def invalidate_calendar(sender, using, **kwargs):
+    """Any change may move, add or drop an entry in some calendar window."""
+    invalidate(using=using)
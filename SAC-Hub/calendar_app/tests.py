@@ -1,3 +1,236 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from events.models import Event, EventRegistration, RegistrationStatus
+from users.models import Club, Department, User
+from . import engine
+from .feeds import escape_text, fold, user_from_token, user_token
+from .models import BlackoutDate
+
+
+class CalendarTestMixin:
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def event(name, local_start, status='APPROVED', **fields):
+        return Event.objects.create(
+            name=name, event_type='Cultural', venue='Auditorium', status=status,
+            date_time=timezone.make_aware(local_start), **fields,
+        )
+
+
+class MonthGridTests(CalendarTestMixin, TestCase):
+    def test_month_bounds_are_local_midnights(self):
+        start, end = engine.month_bounds(2025, 12)
+        self.assertEqual(timezone.localtime(start).replace(tzinfo=None), datetime(2025, 12, 1))
+        self.assertEqual(timezone.localtime(end).replace(tzinfo=None), datetime(2026, 1, 1))
+        # Asia/Kolkata: the month starts at 18:30 UTC the day before
+        self.assertEqual(start.astimezone(dt_timezone.utc), datetime(2025, 11, 30, 18, 30, tzinfo=dt_timezone.utc))
+
+    def test_events_are_bucketed_by_local_date(self):
+        early = self.event('Dawn Yoga', datetime(2025, 3, 1, 0, 30))
+        late = self.event('Night Sky', datetime(2025, 3, 31, 23, 30))
+        self.event('Previous Month', datetime(2025, 2, 28, 23, 59))
+        self.event('Next Month', datetime(2025, 4, 1, 0, 0))
+        self.event('Pending', datetime(2025, 3, 10, 10, 0), status='PENDING')
+        grid = engine.month_grid(2025, 3)
+        days = {cell['day']: [event['id'] for event in cell['events']] for week in grid['weeks'] for cell in week}
+        self.assertEqual(grid['total'], 2)
+        self.assertEqual(days[1], [early.pk])
+        self.assertEqual(days[31], [late.pk])
+        self.assertEqual(engine.month_event_ids(grid), [early.pk, late.pk])
+
+    def test_overlay_marks_today_and_registrations(self):
+        event = self.event('Quiz', datetime(2025, 3, 5, 18, 0))
+        grid = engine.month_grid(2025, 3)
+        weeks = engine.overlay(grid['weeks'], 2025, 3, registered_ids={event.pk}, today=date(2025, 3, 5))
+        [cell] = [cell for week in weeks for cell in week if cell['is_today']]
+        self.assertEqual(cell['day'], 5)
+        self.assertTrue(cell['events'][0]['user_registered'])
+        # The cached grid is left untouched
+        self.assertFalse(any(cell['is_today'] for week in engine.month_grid(2025, 3)['weeks'] for cell in week))
+
+
+class CalendarVersionTests(CalendarTestMixin, TestCase):
+    def test_saves_and_deletes_invalidate_cached_grids(self):
+        self.assertEqual(engine.month_grid(2025, 3)['total'], 0)
+        event = self.event('Hackathon', datetime(2025, 3, 8, 9, 0))
+        self.assertEqual(engine.month_grid(2025, 3)['total'], 1)
+        event.delete()
+        self.assertEqual(engine.month_grid(2025, 3)['total'], 0)
+
+    def test_writes_that_skip_signals_call_invalidate(self):
+        event = self.event('Hackathon', datetime(2025, 3, 8, 9, 0))
+        self.assertEqual(engine.month_grid(2025, 3)['total'], 1)
+        Event.objects.filter(pk=event.pk).update(status='CANCELLED')
+        self.assertEqual(engine.month_grid(2025, 3)['total'], 1)
+        engine.invalidate()
+        self.assertEqual(engine.month_grid(2025, 3)['total'], 0)
+
+    def test_version_is_shared_through_the_database(self):
+        before, modified = engine.version(), engine.last_modified()
+        self.assertEqual(modified.microsecond, 0)
+        engine.invalidate()
+        after = engine.version()
+        self.assertGreater(after, before)
+        # Not held in the cache, so clearing (or a separate process's cache) cannot reset it
+        cache.clear()
+        self.assertEqual(engine.version(), after)
+        self.assertGreaterEqual(engine.last_modified(), modified)
+
+    def test_rolled_back_changes_keep_the_version(self):
+        before = engine.version()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.event('Never Held', datetime(2025, 3, 8, 9, 0))
+            self.assertGreater(engine.version(), before)
+            raise RuntimeError
+        self.assertEqual(engine.version(), before)
+
+
+class CalendarRangeTests(CalendarTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('calendar-range')
+        self.club = Club.objects.create(name='Music')
+        self.department = Department.objects.create(name='Physics')
+        self.concert = self.event('Concert', datetime(2025, 3, 4, 19, 0), club=self.club)
+        self.lecture = self.event('Lecture', datetime(2025, 3, 5, 11, 0), department=self.department)
+        self.event('Later', datetime(2025, 3, 12, 11, 0))
+        self.event('Pending', datetime(2025, 3, 6, 11, 0), status='PENDING')
+        BlackoutDate.objects.create(date=date(2025, 3, 8), reason='Holi')
+        BlackoutDate.objects.create(date=date(2025, 3, 10), reason='Exams')
+
+    def get(self, query, **headers):
+        return self.client.get(self.url, query, **headers)
+
+    def titles(self, query):
+        return [event['title'] for event in self.get(query).json()['events']]
+
+    def test_invalid_windows_are_rejected(self):
+        for query, error in [
+            ({'end': '2025-03-10'}, 'start must be'),
+            ({'start': 'yesterday', 'end': '2025-03-10'}, 'start must be'),
+            ({'start': '2025-03-10', 'end': '2025-03-03'}, 'end must be after start'),
+            ({'start': '2025-01-01', 'end': '2026-06-01'}, 'window is longer than'),
+            ({'start': '2025-03-03', 'end': '2025-03-10', 'club': 'music'}, 'club must be an id'),
+            ({'start': '2025-03-03', 'end': '2025-03-10', 'department': '-1'}, 'department must be an id'),
+        ]:
+            response = self.get(query, HTTP_IF_MODIFIED_SINCE=http_date(timezone.now().timestamp() + 3600))
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn(error, response.json()['error'])
+
+    def test_window_and_filters(self):
+        week = {'start': '2025-03-03', 'end': '2025-03-10'}
+        self.assertEqual(self.titles(week), ['Concert', 'Lecture'])
+        self.assertEqual(self.titles({**week, 'club': self.club.pk}), ['Concert'])
+        self.assertEqual(self.titles({**week, 'department': self.department.pk}), ['Lecture'])
+        # Offsets are honoured: 19:00 IST is 13:30 UTC
+        self.assertEqual(self.titles({'start': '2025-03-04T13:31:00+00:00', 'end': '2025-03-10'}), ['Lecture'])
+        [concert] = self.get({**week, 'club': self.club.pk}).json()['events']
+        self.assertEqual(concert['start'], '2025-03-04T19:00:00+05:30')
+        self.assertEqual(concert['club'], 'Music')
+
+    def test_blackouts_touching_the_window(self):
+        body = self.get({'start': '2025-03-03', 'end': '2025-03-10'}).json()
+        self.assertEqual(
+            body['blackouts'],
+            [{'start': '2025-03-08', 'end': '2025-03-09', 'reason': 'Holi', 'display': 'background'}],
+        )
+
+    def test_unchanged_windows_get_304(self):
+        week = {'start': '2025-03-03', 'end': '2025-03-10'}
+        response = self.get(week)
+        etag, modified = response['ETag'], response['Last-Modified']
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(self.get(week, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.get(week, HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
+        # Another window has its own ETag
+        self.assertNotEqual(self.get({**week, 'club': self.club.pk})['ETag'], etag)
+        self.lecture.name = 'Guest Lecture'
+        self.lecture.save()
+        response = self.get(week, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event['title'] for event in response.json()['events']], ['Concert', 'Guest Lecture'])
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class FeedTests(CalendarTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        soon = timezone.localtime().replace(tzinfo=None, microsecond=0) + timedelta(days=2)
+        self.club = Club.objects.create(name='Drama')
+        self.play = self.event('Play; Act I, Scene 2', soon, club=self.club, description='Line one\nLine two')
+        self.talk = self.event('Talk', soon + timedelta(days=1))
+        self.student = User.objects.create(username='21CS0001', roll_no='21CS0001', roles=['STUDENT'])
+        self.user_url = reverse('calendar_feed_user', args=[user_token(self.student)])
+
+    def test_user_tokens_are_signed(self):
+        token = user_token(self.student)
+        self.assertEqual(user_from_token(token), self.student.pk)
+        self.assertIsNone(user_from_token(f'{self.student.pk + 1}:{token.split(":", 1)[1]}'))
+        self.assertIsNone(user_from_token('garbage'))
+        self.assertEqual(self.client.get(reverse('calendar_feed_user', args=['garbage'])).status_code, 404)
+
+    def test_text_escaping(self):
+        self.assertEqual(escape_text('a\\b; c, d\r\ne\nf'), 'a\\\\b\\; c\\, d\\ne\\nf')
+        self.assertEqual(escape_text(None), '')
+
+    def test_long_lines_are_folded_at_75_octets(self):
+        self.assertEqual(fold('SUMMARY:short'), 'SUMMARY:short')
+        line = 'DESCRIPTION:' + 'नमस्ते ' * 30
+        folded = fold(line)
+        pieces = folded.split('\r\n')
+        self.assertTrue(all(len(piece.encode()) <= 75 for piece in pieces))
+        self.assertTrue(all(piece.startswith(' ') for piece in pieces[1:]))
+        # Unfolding (dropping CRLF + space) gives back the line, so no character was split
+        self.assertEqual(folded.replace('\r\n ', ''), line)
+
+    def test_feed_content(self):
+        response = self.client.get(reverse('calendar_feed_club', args=[self.club.pk]))
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n'))
+        self.assertIn('X-WR-CALNAME:Drama - SAC Hub', body)
+        self.assertIn(f'UID:event-{self.play.pk}@sac-hub', body)
+        self.assertIn('SUMMARY:Play\\; Act I\\, Scene 2', body)
+        self.assertIn('DESCRIPTION:Line one\\nLine two', body)
+        self.assertNotIn(f'UID:event-{self.talk.pk}@sac-hub', body)
+
+    def test_unchanged_feeds_get_304(self):
+        url = reverse('calendar_feed')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.talk.venue = 'Seminar Hall'
+        self.talk.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('LOCATION:Seminar Hall', response.content.decode())
 
-# Create your tests here.
+    def test_user_feed_follows_registrations(self):
+        response = self.client.get(self.user_url)
+        self.assertNotIn('BEGIN:VEVENT\r\nUID:event-', response.content.decode())
+        etag = response['ETag']
+        registration = EventRegistration.objects.create(
+            event=self.play, student=self.student, status=RegistrationStatus.WAITLISTED,
+        )
+        response = self.client.get(self.user_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('STATUS:TENTATIVE', response.content.decode())
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.user_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        registration.status = RegistrationStatus.REGISTERED
+        registration.save()
+        response = self.client.get(self.user_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertIn('STATUS:CONFIRMED', response.content.decode())
+        etag = response['ETag']
+        registration.delete()
+        self.assertEqual(self.client.get(self.user_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
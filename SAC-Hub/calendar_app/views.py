@@ -1,8 +1,141 @@
 
+import hashlib
+from datetime import timedelta
+
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition, require_GET
 from rest_framework import viewsets
+
+from users.models import Club, Department
+
+from . import engine, feeds
 from .models import CalendarEntry
 from .serializers import CalendarEntrySerializer
 
 class CalendarEntryViewSet(viewsets.ModelViewSet):
 	queryset = CalendarEntry.objects.all()
 	serializer_class = CalendarEntrySerializer
+
+
+def _window(request):
+	"""(start, end, club, department) from the query string; raises ValueError if invalid."""
+	bounds = []
+	for name in ('start', 'end'):
+		value = parse_datetime(request.GET.get(name, '').replace(' ', '+'))
+		if value is None:
+			raise ValueError(f'{name} must be an ISO 8601 date or datetime')
+		bounds.append(timezone.make_aware(value) if timezone.is_naive(value) else value)
+	start, end = bounds
+	if end <= start:
+		raise ValueError('end must be after start')
+	if end - start > timedelta(days=engine.calendar_setting('MAX_RANGE_DAYS')):
+		raise ValueError(f"window is longer than {engine.calendar_setting('MAX_RANGE_DAYS')} days")
+	filters = []
+	for name in ('club', 'department'):
+		value = request.GET.get(name)
+		if value and not value.isdigit():
+			raise ValueError(f'{name} must be an id')
+		filters.append(int(value) if value else None)
+	return (start, end, *filters)
+
+
+def _calendar_state(request):
+	# Both validators come from one read of the shared calendar version
+	if not hasattr(request, '_calendar_state'):
+		request._calendar_state = engine.state()
+	return request._calendar_state
+
+
+def _window_etag(request):
+	try:
+		window = _window(request)
+	except ValueError:
+		return None
+	key = repr((_calendar_state(request)[0], *window)).encode()
+	return hashlib.md5(key, usedforsecurity=False).hexdigest()
+
+
+def _window_last_modified(request):
+	try:
+		_window(request)
+	except ValueError:
+		return None
+	return _calendar_state(request)[1]
+
+
+@require_GET
+@condition(etag_func=_window_etag, last_modified_func=_window_last_modified)
+def calendar_range(request):
+	"""Approved events and blackout days for an arbitrary window, for client-side calendars.
+
+	GET /api/calendar/?start=2025-03-03&end=2025-03-10&club=4&department=2
+
+	Responses carry an ETag and Last-Modified derived from the calendar data
+	version, which is kept in the database (see calendar_app.engine), so a
+	client re-requesting a window that has not changed gets 304 Not Modified
+	from any worker.
+	"""
+	try:
+		start, end, club, department = _window(request)
+	except ValueError as exc:
+		return JsonResponse({'error': str(exc)}, status=400)
+	response = JsonResponse({
+		'start': start.isoformat(),
+		'end': end.isoformat(),
+		'events': engine.window_events(start, end, club=club, department=department),
+		'blackouts': engine.window_blackouts(start, end),
+	})
+	# Let browsers keep the data, but revalidate it with the ETag each time
+	patch_cache_control(response, no_cache=True)
+	return response
+
+
+def _feed_scope(request, club_id=None, department_id=None, token=None):
+	if club_id is not None:
+		return f'club:{club_id}'
+	if department_id is not None:
+		return f'department:{department_id}'
+	if token is not None:
+		user_id = feeds.user_from_token(token)
+		return f'user:{user_id}' if user_id is not None else None
+	return 'all'
+
+
+def _feed_etag(request, **kwargs):
+	scope = _feed_scope(request, **kwargs)
+	return feeds.feed_etag(scope) if scope else None
+
+
+def _feed_last_modified(request, **kwargs):
+	scope = _feed_scope(request, **kwargs)
+	return feeds.feed_last_modified(scope) if scope else None
+
+
+@require_GET
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
+def calendar_feed(request, club_id=None, department_id=None, token=None):
+	"""iCalendar feed of approved events: all, one club's, one department's, or a user's registrations.
+
+	Calendar apps poll feeds; unchanged feeds are answered with 304 from the
+	validators alone, changed ones are served from calendar_app.feeds' cache.
+	"""
+	scope = _feed_scope(request, club_id=club_id, department_id=department_id, token=token)
+	if scope is None:
+		raise Http404('Unknown feed')
+	if club_id is not None:
+		name = f'{get_object_or_404(Club, pk=club_id).name} - SAC Hub'
+	elif department_id is not None:
+		name = f'{get_object_or_404(Department, pk=department_id).name} - SAC Hub'
+	elif token is not None:
+		name = 'My events - SAC Hub'
+	else:
+		name = 'SAC Hub events'
+	base_url = request.build_absolute_uri('/').rstrip('/')
+	response = HttpResponse(feeds.get_feed(scope, name, base_url), content_type='text/calendar; charset=utf-8')
+	response['Content-Disposition'] = 'inline; filename="calendar.ics"'
+	patch_cache_control(response, no_cache=True)
+	return response
@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from .models import CertificateField, CertificateTemplate
+
+
+class CertificateFieldInline(admin.TabularInline):
+    model = CertificateField
+    extra = 0
+
+
+@admin.register(CertificateTemplate)
+class CertificateTemplateAdmin(admin.ModelAdmin):
+    list_display = ("name", "club", "static_file", "is_default", "updated_at")
+    list_filter = ("is_default",)
+    search_fields = ("name", "club__name")
+    inlines = [CertificateFieldInline]
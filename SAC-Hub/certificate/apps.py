@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CertificateConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'certificate'
+
+    def ready(self):
+        # Reload the template registry when templates or clubs change
+        import certificate.signals  # noqa
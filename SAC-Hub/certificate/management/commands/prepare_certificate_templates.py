@@ -0,0 +1,48 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from certificate.registry import layout_for_club
+from certificate.template_images import TemplateError, prepare_template, raw_name, store_template
+from users.models import Club
+
+
+def is_prepared(template):
+    return template.name.endswith('.png') and os.path.exists(raw_name(template.path))
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the certificate templates clubs already have and normalize them as an upload "
+        "would be (see certificate.template_images)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the templates that cannot be used')
+        parser.add_argument('--force', action='store_true', help='Also redo templates that were already prepared')
+
+    def handle(self, *args, **options):
+        prepared = skipped = failed = 0
+        for club in Club.objects.exclude(certificate_template='').exclude(certificate_template__isnull=True):
+            template = club.certificate_template
+            if is_prepared(template) and not options['force']:
+                skipped += 1
+                continue
+            try:
+                with template.open('rb') as handle:
+                    image = prepare_template(handle, layout_for_club(club))
+            except (TemplateError, FileNotFoundError) as error:
+                failed += 1
+                self.stderr.write(f'  {club.name} ({template.name}): {error}')
+                continue
+            if not options['dry_run']:
+                with transaction.atomic():
+                    store_template(club, image, template.name)
+                    club.save(update_fields=['certificate_template'])
+            prepared += 1
+
+        verb = 'would be prepared' if options['dry_run'] else 'prepared'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prepared} template(s) {verb}, {skipped} already up to date, {failed} unusable.'
+        ))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('users', '0013_club_certificate_template_help'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Shown in the generate form; bulk files may name it in a "template" column', max_length=100, unique=True)),
+                ('static_file', models.CharField(blank=True, help_text='Background in certificate/static, used when there is no club template', max_length=255)),
+                ('is_default', models.BooleanField(default=False, help_text='Used when no template matches')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('club', models.OneToOneField(blank=True, help_text="Club whose certificates use this layout (on the club's uploaded template, if it has one)", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='certificate_layout', to='users.club')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CertificateField',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(choices=[('name', 'Name'), ('department', 'Department'), ('event', 'Event'), ('date', 'Date'), ('club', 'Club')], max_length=20)),
+                ('x1', models.PositiveIntegerField()),
+                ('x2', models.PositiveIntegerField()),
+                ('y', models.PositiveIntegerField()),
+                ('font_size', models.PositiveSmallIntegerField(default=40)),
+                ('min_font_size', models.PositiveSmallIntegerField(blank=True, help_text='Shrink text wider than x1-x2 down to this size (empty: never shrink)', null=True)),
+                ('color', models.CharField(default='black', help_text='CSS color name or #rrggbb', max_length=30)),
+                ('bold', models.BooleanField(default=False)),
+                ('font', models.CharField(blank=True, help_text='TrueType file in static/ (default: Roboto)', max_length=100)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fields', to='certificate.certificatetemplate')),
+            ],
+            options={
+                'ordering': ['template', 'y'],
+                'constraints': [models.UniqueConstraint(fields=('template', 'key'), name='unique_certificate_field')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# The templates shipped in certificate/static, with values next to their labels
+STATIC_TEMPLATES = [
+    ("Sample", "sample.jpg", True),
+    ("Tech Club", "tech_club.jpg", False),
+    ("Sports Club", "sports_club.jpg", False),
+    ("Cultural Club", "cultural_club.jpg", False),
+    ("Science Club", "science_club.jpg", False),
+]
+
+# The labels are at y 456-736 of the 1500x1000 templates; values follow them
+STATIC_LAYOUT = [
+    {"key": "name", "y": 438, "font_size": 30, "min_font_size": 22, "color": "#021c77"},
+    {"key": "department", "y": 509, "font_size": 28, "min_font_size": 20, "color": "black"},
+    {"key": "event", "y": 579, "font_size": 28, "min_font_size": 20, "color": "black"},
+    {"key": "date", "y": 649, "font_size": 28, "min_font_size": 20, "color": "black"},
+    {"key": "club", "y": 719, "font_size": 28, "min_font_size": 20, "color": "black"},
+]
+
+
+def seed_templates(apps, schema_editor):
+    CertificateTemplate = apps.get_model('certificate', 'CertificateTemplate')
+    CertificateField = apps.get_model('certificate', 'CertificateField')
+    db_alias = schema_editor.connection.alias
+    for name, static_file, is_default in STATIC_TEMPLATES:
+        template, created = CertificateTemplate.objects.using(db_alias).get_or_create(
+            name=name, defaults={'static_file': static_file, 'is_default': is_default},
+        )
+        if created:
+            CertificateField.objects.using(db_alias).bulk_create(
+                CertificateField(template=template, x1=320, x2=1300, bold=True, **field) for field in STATIC_LAYOUT
+            )
+
+
+def remove_templates(apps, schema_editor):
+    CertificateTemplate = apps.get_model('certificate', 'CertificateTemplate')
+    db_alias = schema_editor.connection.alias
+    CertificateTemplate.objects.using(db_alias).filter(name__in=[name for name, _, _ in STATIC_TEMPLATES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificate', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_templates, remove_templates),
+    ]
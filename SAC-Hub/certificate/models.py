@@ -0,0 +1,62 @@
+from django.db import models
+
+from users.models import Club
+
+
+class CertificateFieldKey(models.TextChoices):
+    NAME = 'name', 'Name'
+    DEPARTMENT = 'department', 'Department'
+    EVENT = 'event', 'Event'
+    DATE = 'date', 'Date'
+    CLUB = 'club', 'Club'
+
+
+class CertificateTemplate(models.Model):
+    """A certificate background and the layout of its fields (resolved through certificate.registry)."""
+    name = models.CharField(max_length=100, unique=True, help_text='Shown in the generate form; bulk files may name it in a "template" column')
+    club = models.OneToOneField(
+        Club, on_delete=models.SET_NULL, null=True, blank=True, related_name='certificate_layout',
+        help_text="Club whose certificates use this layout (on the club's uploaded template, if it has one)",
+    )
+    static_file = models.CharField(max_length=255, blank=True, help_text='Background in certificate/static, used when there is no club template')
+    is_default = models.BooleanField(default=False, help_text='Used when no template matches')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class CertificateField(models.Model):
+    """Where and how one value is drawn on a template; coordinates are pixels at the template's width."""
+    template = models.ForeignKey(CertificateTemplate, on_delete=models.CASCADE, related_name='fields')
+    key = models.CharField(max_length=20, choices=CertificateFieldKey.choices)
+    # The text is centered between x1 and x2, with its top at y
+    x1 = models.PositiveIntegerField()
+    x2 = models.PositiveIntegerField()
+    y = models.PositiveIntegerField()
+    font_size = models.PositiveSmallIntegerField(default=40)
+    min_font_size = models.PositiveSmallIntegerField(
+        null=True, blank=True, help_text='Shrink text wider than x1-x2 down to this size (empty: never shrink)',
+    )
+    color = models.CharField(max_length=30, default='black', help_text='CSS color name or #rrggbb')
+    bold = models.BooleanField(default=False)
+    font = models.CharField(max_length=100, blank=True, help_text='TrueType file in static/ (default: Roboto)')
+
+    class Meta:
+        ordering = ['template', 'y']
+        constraints = [
+            models.UniqueConstraint(fields=['template', 'key'], name='unique_certificate_field'),
+        ]
+
+    def __str__(self):
+        return f"{self.template} {self.get_key_display()}"
+
+    def as_layout(self):
+        """This field as a layout entry for certificate.views.render_certificate."""
+        return {
+            'x1': self.x1, 'x2': self.x2, 'y': self.y, 'font_size': self.font_size,
+            'min_font_size': self.min_font_size, 'color': self.color, 'bold': self.bold, 'font': self.font,
+        }
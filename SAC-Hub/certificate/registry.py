@@ -0,0 +1,108 @@
+"""
+Certificate templates and their layouts, resolved in O(1).
+
+``CertificateTemplate`` rows (with their ``CertificateField`` layouts) are
+loaded once per process into dictionaries keyed by template name and by
+club, and ``resolve`` is a dictionary lookup::
+
+    template = resolve(name='Tech Club')
+    create_certificate_pdf(..., template.image, template.layout)
+
+The dictionaries are rebuilt when the registry version (a
+``sac_project.versions`` counter in the database, one indexed lookup per
+``resolve``) changes. Saving or deleting a template, a field or a club bumps
+it (``certificate.signals``) in the same transaction, so every process picks
+up an edit on its next certificate once it commits; writes that skip signals
+call ``invalidate()`` themselves.
+
+A club without a layout of its own whose uploaded template exists is drawn
+with ``DEFAULT_LAYOUT``; anything else unknown gets the default template.
+"""
+import os
+from collections import namedtuple
+
+from sac_project import versions
+
+from .models import CertificateTemplate
+
+# Layout of uploaded club templates without one of their own, at 1500 px wide
+DEFAULT_LAYOUT = {
+    # Provide start/end X so text is centered inside its own field span
+    "name": {"y": 1020, "x1": 633, "x2": 1258, "font_size": 45, "min_font_size": 35, "color": "#021c77", "bold": True},
+    "department": {"y": 1093, "x1": 214, "x2": 1040, "font_size": 40, "color": "black", "bold": True},
+    "event": {"y": 1160, "x1": 773, "x2": 1257, "font_size": 30, "color": "black", "bold": True},
+    "date": {"y": 1237, "x1": 213, "x2": 453, "font_size": 40, "color": "black", "bold": True},
+    "club": {"y": 1229, "x1": 756, "x2": 1260, "font_size": 40, "color": "black", "bold": True},
+}
+
+FALLBACK_FILE = 'sample.jpg'
+
+VERSION_KEY = 'certificate-registry'
+
+# ``image`` is what render_certificate takes: an absolute path or a file in certificate/static
+ResolvedTemplate = namedtuple('ResolvedTemplate', 'name image layout')
+
+# The loaded registry: (version, by name, by club id, default); replaced whole, never mutated
+_loaded = (None, {}, {}, None)
+
+
+def version():
+    """(version, modified) of the registry; ``modified`` tells apart a number reused after a rollback."""
+    return versions.current(VERSION_KEY)
+
+
+def invalidate():
+    """Make every process reload the registry before its next lookup."""
+    versions.bump(VERSION_KEY)
+
+
+def _image(template):
+    club = template.club
+    if club is not None and club.certificate_template:
+        return club.certificate_template.path
+    return template.static_file or FALLBACK_FILE
+
+
+def load():
+    """(by name, by club id, default) from the database, in two queries."""
+    by_name, by_club, default = {}, {}, None
+    for template in CertificateTemplate.objects.select_related('club').prefetch_related('fields'):
+        resolved = ResolvedTemplate(
+            template.name, _image(template), {field.key: field.as_layout() for field in template.fields.all()},
+        )
+        by_name[template.name] = resolved
+        if template.club_id is not None:
+            by_club[template.club_id] = resolved
+        if template.is_default and default is None:
+            default = resolved
+    return by_name, by_club, default or ResolvedTemplate('Sample', FALLBACK_FILE, DEFAULT_LAYOUT)
+
+
+def _registry():
+    global _loaded
+    current = version()
+    if _loaded[0] != current:
+        _loaded = (current, *load())
+    return _loaded
+
+
+def resolve(name=None, club=None):
+    """The template for ``club`` (a Club, or None) or else the one called ``name``, or the default."""
+    _, by_name, by_club, default = _registry()
+    if club is not None:
+        if club.pk in by_club:
+            return by_club[club.pk]
+        if club.certificate_template and os.path.exists(club.certificate_template.path):
+            return ResolvedTemplate(club.name, club.certificate_template.path, DEFAULT_LAYOUT)
+    return by_name.get(name, default)
+
+
+def names():
+    """Names of the registered templates, in order."""
+    return sorted(_registry()[1])
+
+
+def layout_for_club(club):
+    """The layout an uploaded template of ``club`` is drawn with."""
+    resolved = _registry()[2].get(club.pk) if club.pk is not None else None
+    return resolved.layout if resolved is not None else DEFAULT_LAYOUT
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Club
+
+from .models import CertificateField, CertificateTemplate
+from .registry import invalidate
+
+
+@receiver(post_save, sender=CertificateTemplate)
+@receiver(post_delete, sender=CertificateTemplate)
+@receiver(post_save, sender=CertificateField)
+@receiver(post_delete, sender=CertificateField)
+@receiver(post_save, sender=Club)
+@receiver(post_delete, sender=Club)
+def invalidate_registry(sender, **kwargs):
+    """A changed layout, or a club's new uploaded template, changes what resolves."""
+    invalidate()
@@ -0,0 +1,32 @@
+"""Background tasks of the certificate app (see jobs.queue)."""
+import zipfile
+from datetime import datetime
+
+from jobs.queue import task
+
+
+@task('certificate.bulk_zip')
+def bulk_certificates(ctx, *, rows, event, date, club_name):
+    """Render a certificate PDF for every ``[name, department, template]`` in ``rows`` into one ZIP.
+
+    A row's template is a registered template name; blank uses ``club_name``'s.
+    """
+    from sac_project.metrics import CERTIFICATE_RENDER
+
+    from .registry import resolve
+    from .views import create_certificate_pdf
+
+    total = len(rows)
+    ctx.progress(0, total)
+    with ctx.open_result(f"certificates_{datetime.now().strftime('%d%m%Y_%H%M%S')}.zip") as handle:
+        # Each PDF is compressed into the temporary file as it is rendered
+        with zipfile.ZipFile(handle, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for done, (name, dept, *template_name) in enumerate(rows, 1):
+                template = resolve(name=(template_name and template_name[0]) or club_name)
+                with CERTIFICATE_RENDER.time(source='bulk'):
+                    cert_buffer = create_certificate_pdf(
+                        name, dept, event, date, club_name, template.image, template.layout,
+                    )
+                zip_file.writestr(f"{name}_{event}_certificate.pdf", cert_buffer.getvalue())
+                ctx.progress(done, total)
+    return {'certificates': total}
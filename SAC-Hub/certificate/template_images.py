@@ -0,0 +1,173 @@
+"""
+Club certificate templates, checked and normalized once, when uploaded.
+
+``prepare_template`` reads an upload and:
+
+1. decodes it (at most ``MAX_PIXELS``), applies its EXIF rotation and
+   converts it to RGB, with any transparency on white;
+2. scales it to ``CANONICAL_WIDTH``, the width the layout coordinates
+   (``DEFAULT_LAYOUT``, or the club's own in ``certificate.registry``) are
+   measured in;
+3. checks it against the layout: every field must fit inside the template,
+   otherwise TemplateError says which size is needed.
+
+``store_template`` saves the result as PNG in the club's
+``certificate_template`` field (the files it replaces are deleted once the
+club is saved), with two files next to it:
+
+* ``<name>.rgb``, the raw pixels, which ``open_template`` reads without
+  decoding anything (a few ms, against tens for a JPEG and hundreds for a
+  phone photo);
+* ``<name>.preview.jpg``, a sample certificate drawn on it, shown on the
+  club form.
+
+``manage.py prepare_certificate_templates`` does the same for templates
+uploaded before.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from .registry import DEFAULT_LAYOUT, layout_for_club
+from .views import render_certificate
+
+CANONICAL_WIDTH = 1500
+# Narrower uploads would be scaled up too far for crisp text
+MIN_WIDTH = 1000
+MAX_PIXELS = 40_000_000
+PREVIEW_WIDTH = 750
+
+SAMPLE = {
+    'name': 'Gundala Charitha',
+    'department': 'Electronics & Communication Engineering',
+    'event': 'Tech Quest',
+    'date': '2026-01-03',
+}
+
+
+class TemplateError(ValueError):
+    """The upload cannot be used as a certificate template; the message is shown to the user."""
+
+
+def required_size(layout=None):
+    """(width, height) the fields of ``layout`` need, at CANONICAL_WIDTH."""
+    fields = (layout or DEFAULT_LAYOUT).values()
+    return (
+        max(field.get('x2', 0) for field in fields),
+        max(field.get('y', 0) + field.get('font_size', 40) for field in fields),
+    )
+
+
+def raw_name(name):
+    return f'{os.path.splitext(name)[0]}.rgb'
+
+
+def preview_name(name):
+    return f'{os.path.splitext(name)[0]}.preview.jpg'
+
+
+def prepare_template(upload, layout=None):
+    """The RGB image, at CANONICAL_WIDTH, of the uploaded template; raises TemplateError."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    upload.seek(0)
+    try:
+        with Image.open(upload) as original:
+            width, height = original.size
+            if width * height > MAX_PIXELS:
+                raise TemplateError(f'The image is too large ({width}x{height} px).')
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as error:
+        raise TemplateError(f'The file is not a readable JPG or PNG image ({error}).')
+
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel('A'))
+    else:
+        image = image.convert('RGB')
+    if image.width < MIN_WIDTH:
+        raise TemplateError(f'The image must be at least {MIN_WIDTH} px wide (it is {image.width} px).')
+    if image.width != CANONICAL_WIDTH:
+        image = image.resize(
+            (CANONICAL_WIDTH, round(image.height * CANONICAL_WIDTH / image.width)), Image.LANCZOS,
+        )
+
+    needed_width, needed_height = required_size(layout)
+    if image.width < needed_width or image.height < needed_height:
+        raise TemplateError(
+            f'The certificate text is placed down to {needed_height} px on a {CANONICAL_WIDTH} px wide '
+            f'template, so the image must be at least {CANONICAL_WIDTH}x{needed_height} px (or the same '
+            f'proportions); this one is {image.width}x{image.height} px at that width.'
+        )
+    return image
+
+
+def _replace(storage, name, content):
+    # A leftover file of that name would make the storage pick another name
+    storage.delete(name)
+    storage.save(name, ContentFile(content))
+
+
+def _delete(storage, names):
+    for name in names:
+        storage.delete(name)
+
+
+def store_template(club, image, upload_name):
+    """Save a prepared template (and its raw pixels and preview) on ``club``; the caller saves the club.
+
+    The previous files are deleted when the transaction commits, so call this
+    and ``club.save()`` inside ``transaction.atomic()``: if the save fails,
+    the club keeps pointing at files that still exist.
+    """
+    field = club.certificate_template
+    storage = field.storage
+    old = field.name
+    png = BytesIO()
+    image.save(png, 'PNG')
+    field.save(f'{os.path.splitext(os.path.basename(upload_name))[0]}.png', ContentFile(png.getvalue()), save=False)
+
+    _replace(storage, raw_name(field.name), image.tobytes())
+    preview = render_certificate(
+        SAMPLE['name'], SAMPLE['department'], SAMPLE['event'], SAMPLE['date'], club.name, field.path,
+        layout_for_club(club),
+    )
+    preview = preview.resize((PREVIEW_WIDTH, round(preview.height * PREVIEW_WIDTH / preview.width)))
+    buffer = BytesIO()
+    preview.save(buffer, 'JPEG', quality=85)
+    _replace(storage, preview_name(field.name), buffer.getvalue())
+
+    if old and old != field.name:
+        # 'stage.jpg' becoming 'stage.png' keeps the same side files
+        kept = {field.name, raw_name(field.name), preview_name(field.name)}
+        stale = {old, raw_name(old), preview_name(old)} - kept
+        transaction.on_commit(lambda: _delete(storage, stale))
+
+
+def open_template(path):
+    """The RGB image of the template file at ``path``, read from its raw pixels when it was prepared."""
+    from PIL import Image
+
+    raw = raw_name(path)
+    if path.endswith('.png') and os.path.exists(raw):
+        with Image.open(path) as header:
+            size = header.size
+        with open(raw, 'rb') as handle:
+            data = handle.read()
+        if len(data) == size[0] * size[1] * 3:
+            return Image.frombytes('RGB', size, data)
+    with Image.open(path) as image:
+        return image.convert('RGB')
+
+
+def preview_url(club):
+    """URL of the sample certificate of the club's template, if it was prepared."""
+    template = club.certificate_template
+    if not template:
+        return None
+    name = preview_name(template.name)
+    return template.storage.url(name) if template.storage.exists(name) else None
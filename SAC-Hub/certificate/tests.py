@@ -0,0 +1,148 @@
+import os
+import zipfile
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from jobs.models import Job, JobStatus
+from jobs.queue import run_pending
+from sac_project.models import DataVersion
+from sac_project.testing import TempMediaMixin
+from users.models import Club, User
+from .models import CertificateField, CertificateTemplate
+from .registry import DEFAULT_LAYOUT, VERSION_KEY, resolve
+from .template_images import (
+    CANONICAL_WIDTH, TemplateError, open_template, prepare_template, preview_url, raw_name, store_template,
+)
+from .views import render_certificate
+
+
+class CertificateTemplateTests(TempMediaMixin, TestCase):
+    def test_rejects_unusable_uploads(self):
+        with self.assertRaisesMessage(TemplateError, 'at least 1500x1277'):
+            prepare_template(self.upload('short.png', (1500, 1000)))
+        with self.assertRaisesMessage(TemplateError, 'at least 1000 px wide'):
+            prepare_template(self.upload('small.png', (800, 800)))
+        with self.assertRaisesMessage(TemplateError, 'not a readable'):
+            prepare_template(SimpleUploadedFile('notes.png', b'not an image'))
+
+    def test_normalizes_and_stores(self):
+        # Transparent, twice the canonical size: scaled down and flattened on white
+        image = prepare_template(self.upload('big.png', (3000, 2600), 'RGBA'))
+        self.assertEqual((image.mode, image.size), ('RGB', (CANONICAL_WIDTH, 1300)))
+        self.assertEqual(image.getpixel((10, 10)), (255, 255, 255))
+
+        club = Club.objects.create(name='Robotics')
+        store_template(club, image, 'big.jpeg')
+        club.save()
+        template = club.certificate_template
+        self.assertTrue(template.name.endswith('big.png'))
+        self.assertTrue(os.path.exists(raw_name(template.path)))
+        self.assertIsNotNone(preview_url(club))
+        self.assertEqual(open_template(template.path).tobytes(), image.tobytes())
+
+        # A new template replaces the old files once the club is saved
+        old = template.path
+        with self.captureOnCommitCallbacks(execute=True):
+            store_template(club, prepare_template(self.upload('new.jpg', (1500, 1300), fmt='JPEG')), 'new.jpg')
+            self.assertTrue(os.path.exists(old) and os.path.exists(raw_name(old)))
+            club.save()
+        self.assertFalse(os.path.exists(old) or os.path.exists(raw_name(old)))
+
+    def test_failed_edit_keeps_the_old_files(self):
+        admin = User.objects.create(username='admin', roles=['ADMIN'])
+        club = Club.objects.create(name='Robotics')
+        Club.objects.create(name='Drama')
+        store_template(club, prepare_template(self.upload('old.png', (1500, 1300))), 'old.png')
+        club.save()
+        old = club.certificate_template.path
+        self.client.force_login(admin)
+
+        # The duplicate name fails the save after the new template was stored
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('club_edit', args=[club.id]), {
+                'name': 'Drama', 'certificate_template': self.upload('new.png', (1500, 1300)),
+            })
+        self.assertEqual(response.status_code, 200)
+        club.refresh_from_db()
+        self.assertEqual(club.certificate_template.path, old)
+        self.assertTrue(os.path.exists(old) and os.path.exists(raw_name(old)))
+        self.assertIsNotNone(preview_url(club))
+
+    def test_prepare_command(self):
+        usable = Club.objects.create(name='Robotics', certificate_template=self.upload('a.jpg', (1500, 1300), fmt='JPEG'))
+        Club.objects.create(name='Drama', certificate_template=self.upload('b.png', (1500, 1000)))
+        out, err = StringIO(), StringIO()
+        call_command('prepare_certificate_templates', dry_run=True, stdout=out, stderr=err)
+        self.assertIn('1 template(s) would be prepared, 0 already up to date, 1 unusable', out.getvalue())
+        self.assertIn('Drama', err.getvalue())
+
+        call_command('prepare_certificate_templates', stdout=StringIO(), stderr=StringIO())
+        usable.refresh_from_db()
+        self.assertTrue(usable.certificate_template.name.endswith('.png'))
+        out = StringIO()
+        call_command('prepare_certificate_templates', stdout=out, stderr=StringIO())
+        self.assertIn('0 template(s) prepared, 1 already up to date', out.getvalue())
+
+
+class CertificateRegistryTests(TempMediaMixin, TestCase):
+    def test_resolves_from_process_cache_until_changed(self):
+        tech = resolve(name='Tech Club')
+        self.assertEqual(tech.image, 'tech_club.jpg')
+        self.assertEqual(tech.layout['name']['y'], 438)
+        # Only the version is read
+        with self.assertNumQueries(2):
+            self.assertIs(resolve(name='Tech Club'), tech)
+            # Unknown names get the default template
+            self.assertEqual(resolve(name='Nobody').name, 'Sample')
+
+        CertificateField.objects.filter(template__name='Tech Club', key='name').update(y=400)
+        self.assertEqual(resolve(name='Tech Club').layout['name']['y'], 438)
+        before = DataVersion.objects.get(key=VERSION_KEY).version
+        CertificateTemplate.objects.get(name='Tech Club').save()
+        # The version other processes read is in the database
+        self.assertGreater(DataVersion.objects.get(key=VERSION_KEY).version, before)
+        self.assertEqual(resolve(name='Tech Club').layout['name']['y'], 400)
+
+    def test_club_layouts(self):
+        club = Club.objects.create(name='Robotics', certificate_template=self.upload('r.png', (1500, 1300)))
+        resolved = resolve(name='Robotics', club=club)
+        self.assertEqual((resolved.image, resolved.layout), (club.certificate_template.path, DEFAULT_LAYOUT))
+
+        template = CertificateTemplate.objects.create(name='Robotics', club=club)
+        CertificateField.objects.create(template=template, key='name', x1=100, x2=600, y=50)
+        resolved = resolve(club=club)
+        self.assertEqual((resolved.image, list(resolved.layout)), (club.certificate_template.path, ['name']))
+
+    def test_long_text_shrinks_into_its_span(self):
+        layout = {'name': {'x1': 100, 'x2': 400, 'y': 200, 'font_size': 60, 'min_font_size': 10}}
+        image = render_certificate('Gundala Venkata Sai Charitha', '', '', '', '', 'sample.jpg', layout)
+        band = image.crop((60, 200, 1400, 270)).convert('L')
+        left, _, right, _ = band.point(lambda value: 255 if value < 128 else 0).getbbox()
+        # Drawn (smaller than 60 px) within x 100-400; the sample is blank around it
+        self.assertGreaterEqual(left + 60, 100)
+        self.assertLessEqual(right + 60, 400)
+
+    def test_bulk_job_mixes_templates_per_row(self):
+        user = User.objects.create(username='coord', roles=['SAC_COORDINATOR'])
+        self.client.force_login(user)
+        url = reverse('certificate:generate_certificates')
+        data = {'event': 'Tech Quest', 'date': '2026-01-03', 'club_name': 'Tech Club'}
+
+        bad = SimpleUploadedFile('rows.csv', b'name,department,template\nAsha,CSE,Chess Club\n')
+        self.client.post(url, {**data, 'excel_file': bad})
+        self.assertFalse(Job.objects.exists())
+
+        rows = SimpleUploadedFile('rows.csv', b'name,department,template\nAsha,CSE,\nRavi,ECE,Sports Club\n')
+        response = self.client.post(url, {**data, 'excel_file': rows})
+        job = Job.objects.get()
+        self.assertEqual(job.args['rows'], [['Asha', 'CSE', ''], ['Ravi', 'ECE', 'Sports Club']])
+        self.assertRedirects(response, reverse('jobs:job_detail', args=[job.id]), fetch_redirect_response=False)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.SUCCEEDED, job.error)
+        with job.result_file.open('rb') as handle, zipfile.ZipFile(handle) as archive:
+            self.assertEqual(len(archive.namelist()), 2)
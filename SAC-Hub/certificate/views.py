@@ -1,32 +1,18 @@
-from django.shortcuts import render
+from django.shortcuts import render, redirect
 from django.http import FileResponse
+from django.contrib import messages
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from PIL import Image, ImageDraw, ImageFont, ImageColor
 from io import BytesIO
-import zipfile
-import pandas as pd
 import os
 from datetime import datetime
+from functools import lru_cache
 
-# Club options with their corresponding certificate templates
-CLUB_OPTIONS = [
-    {"name": "Tech Club", "certificate_template": "tech_club.jpg"},
-    {"name": "Sports Club", "certificate_template": "sports_club.jpg"},
-    {"name": "Cultural Club", "certificate_template": "cultural_club.jpg"},
-    {"name": "Science Club", "certificate_template": "science_club.jpg"},
-]
+from jobs.queue import enqueue
+from sac_project.metrics import CERTIFICATE_RENDER
+from sac_project.tabular import TabularError, read_table
 
-
-# Default layout and styling (adjust as needed)
-DEFAULT_LAYOUT = {
-    # Provide start/end X so text is centered inside its own field span
-    "name": {"y": 1020, "x1": 633, "x2": 1258, "font_size": 45, "color": "#021c77", "bold": True},
-    "department": {"y": 1093, "x1": 214, "x2": 1040, "font_size": 40, "color": "black", "bold": True},
-    "event": {"y": 1160, "x1": 773, "x2": 1257, "font_size": 30, "color": "black", "bold": True},
-    "date": {"y": 1237, "x1": 213, "x2": 453, "font_size": 40, "color": "black", "bold": True},
-    "club": {"y": 1229, "x1": 756, "x2": 1260, "font_size": 40, "color": "black", "bold": True},
-}
+from .registry import DEFAULT_LAYOUT, names, resolve
 
 
 @login_required
@@ -60,7 +46,6 @@ def home(request):
     
     context = {
         'attended_events': attended_events,
-        'clubs': CLUB_OPTIONS
     }
     return render(request, 'certificate/index.html', context)
 
@@ -74,67 +59,73 @@ def generate_certificates(request):
         date = request.POST.get('date', '')
         club_name = request.POST.get('club_name', '')
         
-        template_file = get_template_for_club(club_name)
-        
         # Check if it's bulk generation (Excel file)
         excel_file = request.FILES.get('excel_file')
         
         if excel_file:
-            # Bulk generation from Excel file
-            df = pd.read_excel(excel_file)
-            
-            # Create a zip file to store certificates
-            zip_buffer = BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                for index, row in df.iterrows():
-                    name = row.get('name', row.get('Name', ''))
-                    dept = row.get('department', row.get('Department', ''))
-                    
-                    # Generate certificate with mandatory fields from form
-                    cert_buffer = create_certificate_pdf(name, dept, event, date, club_name, template_file)
-                    
-                    # Add the certificate to the zip file
-                    zip_file.writestr(f"{name}_{event}_certificate.pdf", cert_buffer.getvalue())
-            
-            # Prepare the zip file for download
-            zip_buffer.seek(0)
-            response = FileResponse(zip_buffer, as_attachment=True, filename=f"certificates_{datetime.now().strftime('%d%m%Y_%H%M%S')}.zip")
-            return response
+            # Bulk generation from Excel file: read the rows here, render in a background job
+            try:
+                rows = [
+                    [row.name, row.department, row.template]
+                    for _, row in read_table(
+                        excel_file, excel_file.name, ('name', 'department', 'template'), required=('name',),
+                    )
+                ]
+            except TabularError as error:
+                messages.error(request, str(error))
+                return redirect('certificate:generate_certificates')
+            if not rows:
+                messages.error(request, 'The uploaded file has no rows.')
+                return redirect('certificate:generate_certificates')
+            # An optional "template" column picks another registered template for its row
+            unknown = {row[2] for row in rows if row[2]} - set(names())
+            if unknown:
+                messages.error(request, f"Unknown certificate template(s): {', '.join(sorted(unknown))}.")
+                return redirect('certificate:generate_certificates')
+
+            job = enqueue(
+                'certificate.bulk_zip',
+                args={'rows': rows, 'event': event, 'date': date, 'club_name': club_name},
+                label=f'{len(rows)} certificate(s) for {event}',
+                created_by=request.user,
+            )
+            messages.success(request, f'Generating {len(rows)} certificate(s); the ZIP will be ready to download here.')
+            return redirect('jobs:job_detail', job_id=job.id)
         else:
             # Single certificate generation
             name = request.POST.get('name', '')
             dept = request.POST.get('department', '')
             
             # Generate single certificate
-            cert_buffer = create_certificate_pdf(name, dept, event, date, club_name, template_file)
+            template = resolve(name=club_name)
+            with CERTIFICATE_RENDER.time(source='single'):
+                cert_buffer = create_certificate_pdf(
+                    name, dept, event, date, club_name, template.image, template.layout,
+                )
             
             # Return as download
             response = FileResponse(cert_buffer, as_attachment=True, filename=f"{name}_{event}_certificate.pdf")
             return response
     
-    # GET request - show form with club options
+    # GET request - show form with the registered templates
     context = {
-        'clubs': CLUB_OPTIONS
+        'template_names': names()
     }
     return render(request, 'certificate/generate_certificates.html', context)
 
 
-def get_template_for_club(club_name: str) -> str:
-    """Return the template filename for a given club, or a default sample."""
-    for club in CLUB_OPTIONS:
-        if club["name"] == club_name:
-            return club["certificate_template"]
-    return "sample.jpg"
-
+@lru_cache(maxsize=128)
+def load_font(size: int, bold: bool = False, font: str = ""):
+    """Load ``font`` (or Roboto) from project static; fallback to DejaVu/ default. Cached per process."""
+    from PIL import ImageFont
 
-def load_font(size: int, bold: bool = False):
-    """Load Roboto from project static; fallback to DejaVu/ default."""
     static_dir = os.path.join(settings.BASE_DIR, "static")
     roboto_file = "Roboto-Bold.ttf" if bold else "Roboto-Regular.ttf"
     roboto_path = os.path.join(static_dir, roboto_file)
     dejavu = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf" if bold else "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+    candidates = (os.path.join(static_dir, font), roboto_path, dejavu) if font else (roboto_path, dejavu)
 
-    for path in (roboto_path, dejavu):
+    for path in candidates:
         try:
             return ImageFont.truetype(path, size)
         except Exception:
@@ -142,8 +133,13 @@ def load_font(size: int, bold: bool = False):
     return ImageFont.load_default()
 
 
-def create_certificate_pdf(name, department, event, date, club_name, template_file, layout=None):
-    """Create a certificate PDF with centered text alignment on the template image."""
+def render_certificate(name, department, event, date, club_name, template_file, layout=None):
+    """Draw the certificate fields, centered in their spans, on the template; returns the RGB image."""
+    # Pillow is only imported when a certificate is drawn, not when the URLs load
+    from PIL import ImageColor, ImageDraw
+
+    from .template_images import open_template
+
     layout = layout or DEFAULT_LAYOUT
 
     # Resolve template path - check if it's an absolute path (uploaded file) or static file
@@ -156,8 +152,8 @@ def create_certificate_pdf(name, department, event, date, club_name, template_fi
         if not os.path.exists(template_path):
             template_path = os.path.join(settings.BASE_DIR, 'certificate', 'static', 'sample.jpg')
 
-    # Open image in RGB to ensure PDF compatibility
-    image = Image.open(template_path).convert("RGB")
+    # RGB for PDF compatibility; prepared uploads load from their raw pixels
+    image = open_template(template_path)
     draw = ImageDraw.Draw(image)
     img_width, _ = image.size
 
@@ -175,9 +171,11 @@ def create_certificate_pdf(name, department, event, date, club_name, template_fi
                 continue
         return text
 
-    # Helper to draw centered text using layout settings
+    # Helper to draw centered text using layout settings; fields missing from the layout are not drawn
     def draw_field(value, field_key):
-        field = layout.get(field_key, {})
+        if field_key not in layout:
+            return
+        field = layout[field_key]
         y_pos = field.get("y", 0)
         font_size = field.get("font_size", 40)
         color = field.get("color", "black")
@@ -196,14 +194,18 @@ def create_certificate_pdf(name, department, event, date, club_name, template_fi
 
         text = str(value) if value is not None else ""
 
-        # If name is long, shrink font to keep centered text within span
-        if field_key == "name" and len(text) > 23:
-            font_size = 35
-
-        font = load_font(font_size, bold)
+        font = load_font(font_size, bold, field.get("font") or "")
         bbox = draw.textbbox((0, 0), text, font=font)
         text_width = bbox[2] - bbox[0]
 
+        # Text wider than its span shrinks (width scales with the size), down to min_font_size
+        min_size = field.get("min_font_size")
+        while min_size and text_width > span and font_size > min_size:
+            font_size = max(min_size, min(font_size - 1, font_size * span // text_width))
+            font = load_font(font_size, bold, field.get("font") or "")
+            bbox = draw.textbbox((0, 0), text, font=font)
+            text_width = bbox[2] - bbox[0]
+
         # Center inside the provided field span
         x_pos = x1 + max(0, (span - text_width) // 2)
         draw.text((x_pos, y_pos), text, fill=color, font=font)
@@ -214,6 +216,12 @@ def create_certificate_pdf(name, department, event, date, club_name, template_fi
     draw_field(event, "event")
     draw_field(format_date_value(date), "date")
     draw_field(club_name, "club")
+    return image
+
+
+def create_certificate_pdf(name, department, event, date, club_name, template_file, layout=None):
+    """Create a certificate PDF with centered text alignment on the template image."""
+    image = render_certificate(name, department, event, date, club_name, template_file, layout)
 
     # Save to PDF buffer
     buffer = BytesIO()
@@ -233,15 +241,17 @@ def generate_certificate(request):
         "club_name": "Tech Club",
     }
 
-    template_file = get_template_for_club(sample["club_name"])
-    cert_buffer = create_certificate_pdf(
-        sample["name"],
-        sample["department"],
-        sample["event"],
-        sample["date"],
-        sample["club_name"],
-        template_file,
-    )
+    template = resolve(name=sample["club_name"])
+    with CERTIFICATE_RENDER.time(source='sample'):
+        cert_buffer = create_certificate_pdf(
+            sample["name"],
+            sample["department"],
+            sample["event"],
+            sample["date"],
+            sample["club_name"],
+            template.image,
+            template.layout,
+        )
 
     return FileResponse(cert_buffer, as_attachment=True, filename="certificate.pdf")
 
@@ -274,23 +284,20 @@ def download_event_certificate(request, event_id):
     # Get club name for template
     club_name = event.club.name if event.club else "MITS SAC"
     
-    # Get appropriate template from club's certificate_template field
-    if event.club and hasattr(event.club, 'certificate_template') and event.club.certificate_template:
-        # Use uploaded file path
-        template_file = event.club.certificate_template.path
-    else:
-        # Use static template
-        template_file = get_template_for_club(club_name)
+    # The club's registered layout or uploaded template, else the template named after it
+    template = resolve(name=club_name, club=event.club)
     
     # Generate certificate
-    cert_buffer = create_certificate_pdf(
-        student_name,
-        department,
-        event.name,
-        event.date_time,
-        club_name,
-        template_file,
-    )
+    with CERTIFICATE_RENDER.time(source='event'):
+        cert_buffer = create_certificate_pdf(
+            student_name,
+            department,
+            event.name,
+            event.date_time,
+            club_name,
+            template.image,
+            template.layout,
+        )
     
     # Return as download
     filename = f"{student_name}_{event.name}_certificate.pdf".replace(" ", "_")
@@ -2,8 +2,12 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Count
 from users.models import Club, Department, User
+from users.directory import filter_users
+from certificate.registry import layout_for_club
+from certificate.template_images import prepare_template, preview_url, store_template
 
 from django.core.paginator import Paginator
 from django.db.models import Count
@@ -63,14 +67,18 @@ def club_create(request):
     
     if request.method == 'POST':
         try:
+            # Check the template before anything is created
+            upload = request.FILES.get('certificate_template')
+            template = prepare_template(upload) if upload else None
+            
             club = Club.objects.create(
                 name=request.POST['name'],
                 description=request.POST.get('description', ''),
             )
             
             # Handle certificate template upload
-            if 'certificate_template' in request.FILES:
-                club.certificate_template = request.FILES['certificate_template']
+            if template is not None:
+                store_template(club, template, upload.name)
                 club.save()
             
             # Add coordinators (signals will handle role assignment)
@@ -115,10 +123,6 @@ def club_edit(request, club_id):
             club.name = request.POST['name']
             club.description = request.POST.get('description', '')
             
-            # Handle certificate template upload
-            if 'certificate_template' in request.FILES:
-                club.certificate_template = request.FILES['certificate_template']
-            
             # Update advisor
             advisor_id = request.POST.get('advisor')
             if advisor_id:
@@ -126,7 +130,12 @@ def club_edit(request, club_id):
             else:
                 club.advisor = None
             
-            club.save()
+            # The replaced template files are only deleted once the save commits
+            with transaction.atomic():
+                if 'certificate_template' in request.FILES:
+                    upload = request.FILES['certificate_template']
+                    store_template(club, prepare_template(upload, layout_for_club(club)), upload.name)
+                club.save()
             
             # Update coordinators (signals will handle role assignment)
             coordinator_ids = request.POST.getlist('coordinators')
@@ -144,6 +153,7 @@ def club_edit(request, club_id):
     
     context = {
         'club': club,
+        'certificate_preview': preview_url(club),
         'faculty_users': faculty_users,
         'all_users': all_users,
     }
@@ -214,14 +224,8 @@ def manage_club_members(request, club_id):
     # Search filter
     search_query = request.GET.get('search', '').strip()
     if search_query:
-        from django.db.models import Q
-        members = members.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(roll_no__icontains=search_query) |
-            Q(username__icontains=search_query)
-        )
+        # Every word must prefix-match a name word, roll number, email or username
+        members = filter_users(members, search_query)
     
     # Role filter
     role_filter = request.GET.get('role', '').strip()
@@ -293,4 +297,4 @@ def manage_club_members(request, club_id):
         'is_advisor': is_advisor,
     }
     
-    return render(request, 'clubs/manage_members_v2.html', context)
\ No newline at end of file
+    return render(request, 'clubs/manage_members_v2.html', context)
\ No newline at end of file
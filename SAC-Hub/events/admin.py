@@ -3,7 +3,7 @@ from .models import Event, CollaborationRequest, EventReport, EventAssociation,
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-	list_display = ("name", "event_type", "date_time", "status", "club")
+	list_display = ("name", "event_type", "date_time", "status", "club", "capacity", "registered_count")
 	search_fields = ("name", "event_type")
 	list_filter = ("status", "event_type")
 
@@ -0,0 +1,114 @@
+"""
+Venue clashes and blackout days.
+
+An event occupies its venue from ``date_time`` to ``end_time``; two events at
+the same venue clash when those intervals overlap. Only pending and approved
+events hold a venue.
+
+Overlap lookups are indexed range queries on ``(venue, end_time)``: an event
+overlapping [start, end) must end after ``start``, so the query reads only the
+venue's index entries from ``start`` on and checks ``date_time < end`` on
+those. Every bound comes from the row itself, so no process-wide state (such
+as the longest event duration) can make the window too narrow.
+
+``slot_warnings`` backs the warnings shown when an event is created or
+edited; ``conflict_report`` sweeps a whole range (a semester, the approval
+queue) in one query::
+
+    report = conflict_report(semester_start, semester_end)
+    for first, second in report.clashes:
+        ...
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.utils import timezone
+
+from calendar_app.models import BlackoutDate
+
+from .models import Event, EventStatus
+
+# Statuses that hold a venue
+ACTIVE_STATUSES = [EventStatus.PENDING, EventStatus.APPROVED]
+
+
+def overlapping(venue, start, end, exclude=None, using='default'):
+    """Active events at ``venue`` overlapping [start, end), earliest first."""
+    events = Event.objects.using(using).filter(
+        venue=venue,
+        end_time__gt=start,
+        date_time__lt=end,
+        status__in=ACTIVE_STATUSES,
+    )
+    if exclude is not None:
+        events = events.exclude(pk=exclude)
+    return list(events.order_by('date_time', 'id'))
+
+
+def blackouts_between(start, end, using='default'):
+    """Blackout days touching [start, end), in local dates."""
+    return list(BlackoutDate.objects.using(using).filter(
+        date__gte=timezone.localtime(start).date(),
+        date__lte=timezone.localtime(end - timedelta(microseconds=1)).date(),
+    ).order_by('date'))
+
+
+def slot_warnings(venue, start, end, exclude=None):
+    """Human-readable warnings about clashes and blackout days for a proposed slot."""
+    warnings = []
+    for other in overlapping(venue, start, end, exclude=exclude):
+        warnings.append(
+            f'{venue} is already booked for "{other.name}" '
+            f'({timezone.localtime(other.date_time):%b %d, %I:%M %p} - {timezone.localtime(other.ends_at):%I:%M %p}, '
+            f'{other.get_status_display().lower()}).'
+        )
+    for blackout in blackouts_between(start, end):
+        warnings.append(f'{blackout.date:%b %d} is a blackout date: {blackout.reason}.')
+    return warnings
+
+
+@dataclass
+class ConflictReport:
+    # (earlier event, later event) pairs at the same venue
+    clashes: list = field(default_factory=list)
+    # (event, blackout date) pairs
+    blackouts: list = field(default_factory=list)
+
+    def by_event(self):
+        """{event id: [descriptions of what it clashes with]}."""
+        found = {}
+        for first, second in self.clashes:
+            found.setdefault(first.id, []).append(f'"{second.name}" at {second.venue}')
+            found.setdefault(second.id, []).append(f'"{first.name}" at {first.venue}')
+        for event, blackout in self.blackouts:
+            found.setdefault(event.id, []).append(f'blackout on {blackout.date:%b %d} ({blackout.reason})')
+        return found
+
+
+def conflict_report(start, end, statuses=None, using='default'):
+    """Every venue clash and blackout hit among events overlapping [start, end).
+
+    One query ordered by (venue, date_time), then a sweep per venue keeping
+    the events still in progress: O(n log n + k) for n events and k clashes.
+    """
+    events = Event.objects.using(using).filter(
+        end_time__gt=start,
+        date_time__lt=end,
+        status__in=statuses or ACTIVE_STATUSES,
+    ).select_related('club').order_by('venue', 'date_time', 'id')
+    blackouts = {blackout.date: blackout for blackout in blackouts_between(start, end, using)}
+    report = ConflictReport()
+    venue, running = None, []
+    for event in events:
+        if event.venue != venue:
+            venue, running = event.venue, []
+        running = [other for other in running if other.ends_at > event.date_time]
+        report.clashes.extend((other, event) for other in running)
+        running.append(event)
+        if blackouts:
+            day, last = timezone.localtime(event.date_time).date(), timezone.localtime(event.ends_at - timedelta(microseconds=1)).date()
+            while day <= last:
+                if day in blackouts:
+                    report.blackouts.append((event, blackouts[day]))
+                day += timedelta(days=1)
+    return report
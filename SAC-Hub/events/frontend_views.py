@@ -5,11 +5,173 @@ from django.core.paginator import Paginator
 from django.contrib import messages
 from django.db.models import Q, Count
 from .models import Event, CollaborationRequest, EventReport
+from .conflicts import conflict_report, slot_warnings
+from .models import DEFAULT_DURATION, EventAssociation, EventCollaboration
+from .recurrence import WEEKDAYS
+from .series import create_series, update_following
+from .registration import cancel as cancel_registration, fill_from_waitlist, register as register_for_event, waitlist_position
+from .search import attach_snippets, search_events
 from users.models import Club, Department, User, Notification
 from attendance.models import Attendance
+from jobs.queue import enqueue
 from datetime import datetime
 
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def _parse_capacity(value):
+    """Capacity from the event form: blank means unlimited."""
+    if not value:
+        return None
+    if not value.isdigit() or int(value) == 0:
+        raise ValueError('Capacity must be a positive whole number.')
+    return int(value)
+
+
+def _parse_event_times(post):
+    """(start, end) from the event form; a blank end time means the default duration."""
+    times = []
+    for name, label in (('date_time', 'Date & time'), ('end_time', 'End time')):
+        value = post.get(name, '').strip()
+        parsed = parse_datetime(value) if value else None
+        if value and parsed is None:
+            raise ValueError(f'{label} is not a valid date and time.')
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        times.append(parsed)
+    start, end = times
+    if end is not None and end <= start:
+        raise ValueError('End time must be after the start time.')
+    return start, end
+
+
+# (BYDAY code, label) for the event form's Repeat checkboxes
+REPEAT_DAYS = list(zip(WEEKDAYS, ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']))
+
+
+def _series_rule(post):
+    """Recurrence rule text from the form's Repeat fields, or None for a one-off event."""
+    freq = post.get('repeat', '').strip().upper()
+    if not freq:
+        return None
+    parts = [f'FREQ={freq}', f"INTERVAL={post.get('repeat_interval', '').strip() or 1}"]
+    days = [day for day in post.getlist('repeat_days') if day in WEEKDAYS]
+    if days and freq == 'WEEKLY':
+        parts.append('BYDAY=' + ','.join(days))
+    if post.get('repeat_until', '').strip():
+        parts.append('UNTIL=' + post['repeat_until'].strip().replace('-', ''))
+    else:
+        parts.append(f"COUNT={post.get('repeat_count', '').strip() or 0}")
+    return ';'.join(parts)
+
+
+def _warn_about_slot(request, event):
+    """Flash a warning for every clash or blackout day in the event's slot."""
+    for warning in slot_warnings(event.venue, event.date_time, event.ends_at, exclude=event.pk):
+        messages.warning(request, warning)
+
+
+def _create_event_series(request, rule, start, end, club_id, event_status):
+    """event_create for a repeating event: one series with its occurrences created in bulk."""
+    organizers = list(Club.objects.get(id=club_id).coordinators.all()) if club_id else []
+    if request.user not in organizers:
+        organizers.append(request.user)
+    series, events = create_series(
+        rule=rule,
+        first_start=start,
+        duration=(end or start + DEFAULT_DURATION) - start,
+        created_by=request.user,
+        status=event_status,
+        organizers=organizers,
+        with_attendance_sessions=bool(request.POST.get('repeat_attendance')),
+        name=request.POST['name'],
+        event_type=request.POST['event_type'],
+        description=request.POST.get('description', ''),
+        venue=request.POST['venue'].strip(),
+        club_id=club_id,
+        department_id=request.POST.get('department') or None,
+        resources=request.POST.get('resources', ''),
+        capacity=_parse_capacity(request.POST.get('capacity', '').strip()),
+    )
+    
+    # Association and collaboration requests apply to every occurrence
+    def requested(suffix):
+        return [
+            (kind, {f'{field}_id': pk})
+            for kind, field in (('DEPARTMENT', 'department'), ('CLUB', 'club'))
+            for pk in filter(None, request.POST.getlist(f'{field}_{suffix}'))
+        ]
+    
+    EventAssociation.objects.bulk_create([
+        EventAssociation(event=event, association_type=kind, requested_by=request.user, **target)
+        for kind, target in requested('associations') for event in events
+    ])
+    collaboration_details = request.POST.get('collaboration_details', '')
+    EventCollaboration.objects.bulk_create([
+        EventCollaboration(
+            event=event, collaboration_type=kind, collaboration_details=collaboration_details,
+            requested_by=request.user, **target
+        )
+        for kind, target in requested('collaborations') for event in events
+    ])
+    
+    success_message = f'Event series "{series.name}" created with {len(events)} occurrences!'
+    if event_status == 'PENDING':
+        success_message += ' Events submitted for administrator approval.'
+    messages.success(request, success_message)
+    clashes = conflict_report(events[0].date_time, events[-1].ends_at).by_event()
+    for event in events:
+        for clash in clashes.get(event.id, []):
+            messages.warning(request, f'{timezone.localtime(event.date_time):%b %d}: clashes with {clash}.')
+    return redirect('event_detail', event_id=events[0].id)
+
+
+def _edit_following(request, event):
+    """event_edit applied to this and every later occurrence of the series, as one UPDATE."""
+    start, end = _parse_event_times(request.POST)
+    club_id = request.POST.get('club') or None
+    changes = {
+        'name': request.POST['name'],
+        'event_type': request.POST['event_type'],
+        'description': request.POST.get('description', ''),
+        'venue': request.POST['venue'].strip(),
+        'club_id': club_id,
+        'department_id': request.POST.get('department') or None,
+        'resources': request.POST.get('resources', ''),
+        'capacity': _parse_capacity(request.POST.get('capacity', '').strip()),
+    }
+    if 'status' in request.POST and (request.user.is_staff or 'ADMIN' in (request.user.roles or [])):
+        changes['status'] = request.POST['status']
+    events = update_following(
+        event, shift=start - event.date_time, duration=(end or start + DEFAULT_DURATION) - start, **changes
+    )
+    
+    # Organizers follow the club, as for a single event
+    if club_id:
+        organizers = list(Club.objects.get(id=club_id).coordinators.all())
+        if event.created_by and event.created_by not in organizers:
+            organizers.append(event.created_by)
+    else:
+        organizers = [event.created_by] if event.created_by else []
+    through = Event.organizers.through
+    through.objects.filter(event_id__in=[occurrence.id for occurrence in events]).delete()
+    through.objects.bulk_create([
+        through(event_id=occurrence.id, user_id=organizer.id) for occurrence in events for organizer in organizers
+    ])
+    
+    if changes['capacity'] != event.capacity:
+        # A raised (or removed) capacity frees seats for the waitlist
+        for occurrence in events:
+            fill_from_waitlist(occurrence)
+    
+    messages.success(request, f'{len(events)} occurrences of "{changes["name"]}" updated successfully!')
+    clashes = conflict_report(events[0].date_time, events[-1].ends_at).by_event() if events else {}
+    for occurrence in events:
+        for clash in clashes.get(occurrence.id, []):
+            messages.warning(request, f'{timezone.localtime(occurrence.date_time):%b %d}: clashes with {clash}.')
+    return redirect('event_detail', event_id=event.id)
+
 
 def event_list(request):
     """List all events with filtering options"""
@@ -63,23 +225,30 @@ def event_list(request):
     if event_type_filter:
         events = events.filter(event_type__icontains=event_type_filter)
     
-    # Order by date (upcoming first)
-    events = events.order_by('date_time')
+    # Full-text search results come best match first; otherwise order by date (upcoming first)
+    search_query = request.GET.get('search', '').strip()
+    if search_query:
+        events = search_events(search_query, events)
+    else:
+        events = events.order_by('date_time')
     
     # Add registration counts and user registration status
     if request.user.is_authenticated:
         for event in events:
-            event.registration_count = EventRegistration.objects.filter(event=event).count()
+            event.registration_count = event.registered_count
             event.user_registered = EventRegistration.objects.filter(event=event, student=request.user).exists()
     
     # Pagination
     paginator = Paginator(events, 12)
     page_number = request.GET.get('page')
     events = paginator.get_page(page_number)
+    if search_query:
+        attach_snippets(events, search_query)
     
     context = {
         'events': events,
         'clubs': clubs,
+        'search_query': search_query,
     }
     return render(request, 'events/event_list.html', context)
 
@@ -116,7 +285,12 @@ def event_detail(request, event_id):
             (event.club and 'CLUB_COORDINATOR' in user_roles and request.user in event.club.coordinators.all())):
             can_view_registrations = True
         if can_view_registrations:
-            registration_count = EventRegistration.objects.filter(event=event).count()
+            registration_count = event.registered_count
+
+    # Clashes and blackout days, for the people who can fix them
+    schedule_warnings = []
+    if can_view_registrations and event.status in ['PENDING', 'APPROVED'] and event.ends_at > timezone.now():
+        schedule_warnings = slot_warnings(event.venue, event.date_time, event.ends_at, exclude=event.pk)
 
     # Recent events from same club (excluding current)
     recent_events = []
@@ -131,6 +305,7 @@ def event_detail(request, event_id):
         'user_registration': user_registration,
         'registration_count': registration_count,
         'can_view_registrations': can_view_registrations,
+        'schedule_warnings': schedule_warnings,
     }
     return render(request, 'events/event_detail.html', context)
 
@@ -193,6 +368,7 @@ def event_create(request):
                     'coordinator_club': coordinator_club,
                     'form': request.POST,
                     'event': None,
+                    'repeat_days': REPEAT_DAYS,
                 })
             
             # Create event from form data
@@ -202,16 +378,23 @@ def event_create(request):
                 event_status = 'APPROVED'  # Admins can auto-approve
             
             club_id = request.POST.get('club') or None
+            start, end = _parse_event_times(request.POST)
+            rule = _series_rule(request.POST)
+            
+            if rule:
+                return _create_event_series(request, rule, start, end, club_id, event_status)
             
             event = Event.objects.create(
                 name=request.POST['name'],
                 event_type=request.POST['event_type'],
                 description=request.POST.get('description', ''),
-                date_time=request.POST['date_time'],
-                venue=request.POST['venue'],
+                date_time=start,
+                end_time=end,
+                venue=request.POST['venue'].strip(),
                 club_id=club_id,
                 department_id=request.POST.get('department') or None,
                 resources=request.POST.get('resources', ''),
+                capacity=_parse_capacity(request.POST.get('capacity', '').strip()),
                 status=event_status,
                 created_by=request.user
             )
@@ -297,6 +480,7 @@ def event_create(request):
                 success_message += ' Event approved successfully!'
             
             messages.success(request, success_message)
+            _warn_about_slot(request, event)
             return redirect('event_detail', event_id=event.id)
             
         except Exception as e:
@@ -324,6 +508,7 @@ def event_create(request):
         'coordinator_club': coordinator_club,
         'event': None,
         'form': {},
+        'repeat_days': REPEAT_DAYS,
 
     }
     return render(request, 'events/event_form.html', context)
@@ -355,17 +540,21 @@ def event_edit(request, event_id):
     
     if request.method == 'POST':
         try:
+            if event.series_id and request.POST.get('apply_to_following'):
+                return _edit_following(request, event)
+            
             # Update event
             event.name = request.POST['name']
             event.event_type = request.POST['event_type']
             event.description = request.POST.get('description', '')
-            event.date_time = request.POST['date_time']
-            event.venue = request.POST['venue']
+            event.date_time, event.end_time = _parse_event_times(request.POST)
+            event.venue = request.POST['venue'].strip()
             
             club_id = request.POST.get('club') or None
             event.club_id = club_id
             event.department_id = request.POST.get('department') or None
             event.resources = request.POST.get('resources', '')
+            event.capacity = _parse_capacity(request.POST.get('capacity', '').strip())
             
             # Update status if user has permission
             if 'status' in request.POST and (request.user.is_staff or 'ADMIN' in request.user.roles):
@@ -388,7 +577,11 @@ def event_edit(request, event_id):
                 else:
                     event.organizers.clear()
             
+            # A raised (or removed) capacity frees seats for the waitlist
+            fill_from_waitlist(event)
+            
             messages.success(request, f'Event "{event.name}" updated successfully!')
+            _warn_about_slot(request, event)
             return redirect('event_detail', event_id=event.id)
             
         except Exception as e:
@@ -453,27 +646,32 @@ def event_register(request, event_id):
         messages.error(request, 'You cannot register for past events.')
         return redirect('event_detail', event_id=event.id)
     
-    # Check if user is already registered
-    if EventRegistration.objects.filter(event=event, student=request.user).exists():
-        messages.warning(request, 'You are already registered for this event.')
+    # Check if user is already registered or waitlisted
+    existing = EventRegistration.objects.filter(event=event, student=request.user).exclude(status='CANCELLED').first()
+    if existing:
+        if existing.status == 'WAITLISTED':
+            messages.warning(request, f'You are already on the waitlist for this event (position {waitlist_position(existing)}).')
+        else:
+            messages.warning(request, 'You are already registered for this event.')
         return redirect('event_detail', event_id=event.id)
     
     if request.method == 'POST':
         try:
-            registration = EventRegistration.objects.create(
-                event=event,
-                student=request.user,
-                notes=request.POST.get('notes', '')
-            )
+            registration, created = register_for_event(event, request.user, notes=request.POST.get('notes', ''))
+            waitlisted = registration.status == 'WAITLISTED'
             
             # Notify organizers about new registration
-            for organizer in event.organizers.all():
-                Notification.objects.create(
-                    user=organizer,
-                    message=f"{request.user.get_full_name()} registered for event '{event.name}'."
-                )
+            if created:
+                for organizer in event.organizers.all():
+                    Notification.objects.create(
+                        user=organizer,
+                        message=f"{request.user.get_full_name()} {'joined the waitlist for' if waitlisted else 'registered for'} event '{event.name}'."
+                    )
             
-            messages.success(request, f'Successfully registered for "{event.name}"!')
+            if waitlisted:
+                messages.info(request, f'"{event.name}" is full. You are number {waitlist_position(registration)} on the waitlist and will be registered automatically if a seat opens up.')
+            else:
+                messages.success(request, f'Successfully registered for "{event.name}"!')
             return redirect('event_detail', event_id=event.id)
             
         except Exception as e:
@@ -492,8 +690,7 @@ def event_unregister(request, event_id):
     event = get_object_or_404(Event, id=event_id)
     
     try:
-        registration = EventRegistration.objects.get(event=event, student=request.user)
-        registration.delete()
+        cancel_registration(event, request.user)
         
         # Notify organizers about unregistration
         for organizer in event.organizers.all():
@@ -530,12 +727,14 @@ def event_registrations(request, event_id):
         messages.error(request, 'You do not have permission to view event registrations.')
         return redirect('event_detail', event_id=event.id)
     
-    registrations = EventRegistration.objects.filter(event=event).select_related('student').order_by('-registered_at')
+    registrations = EventRegistration.objects.filter(event=event, status='REGISTERED').select_related('student').order_by('-registered_at')
+    waitlist = EventRegistration.objects.filter(event=event, status='WAITLISTED').select_related('student').order_by('id')
     
     context = {
         'event': event,
         'registrations': registrations,
         'registration_count': registrations.count(),
+        'waitlist': waitlist,
     }
     return render(request, 'events/event_registrations.html', context)
 
@@ -774,18 +973,20 @@ def events_management(request):
     if event_type_filter:
         events = events.filter(event_type__icontains=event_type_filter)
     
-    search_filter = request.GET.get('search')
+    # Full-text search results come best match first; otherwise newest first
+    search_filter = request.GET.get('search', '').strip()
     if search_filter:
-        events = events.filter(Q(name__icontains=search_filter) | Q(description__icontains=search_filter))
-    
-    # Order by creation date (newest first)
-    events = events.order_by('-created_at')
+        events = search_events(search_filter, events)
+    else:
+        events = events.order_by('-created_at')
     
     # Pagination
     from django.core.paginator import Paginator
     paginator = Paginator(events, 10)
     page_number = request.GET.get('page', 1)
     events = paginator.get_page(page_number)
+    if search_filter:
+        attach_snippets(events, search_filter)
     
     # Statistics
     all_events = Event.objects.all()
@@ -1066,43 +1267,12 @@ def send_report_reminder(request, report_id):
         messages.error(request, 'No organizers found for this event.')
         return redirect('review_event_report', report_id=report_id)
     
-    # Create appropriate reminder message based on report status
-    if report.status == 'PENDING':
-        message = (
-            f"Reminder: Your event report for '{event.name}' (held on {event.date_time.strftime('%B %d, %Y')}) "
-            f"is still pending approval. Please follow up with the SAC Coordinator if needed. "
-            f"Report Title: {report.title}"
-        )
-        reminder_type = "Report Pending Approval"
-    elif report.status == 'REJECTED':
-        message = (
-            f"Reminder: Your event report for '{event.name}' (held on {event.date_time.strftime('%B %d, %Y')}) "
-            f"has been rejected. Please review the feedback and resubmit the corrected report. "
-            f"Report Title: {report.title}. "
-            f"Feedback: {report.approval_notes if report.approval_notes else 'Check the report details for more information.'}"
-        )
-        reminder_type = "Report Rejected - Action Required"
-    else:
-        message = (
-            f"Reminder: Your event report for '{event.name}' (held on {event.date_time.strftime('%B %d, %Y')}) "
-            f"requires your attention. Report Title: {report.title}"
-        )
-        reminder_type = "Report Status Update"
-    
-    # Send notifications to all organizers
-    notification_count = 0
-    for organizer in organizers:
-        notification = Notification(
-            user=organizer,
-            message=f"{reminder_type}\n\n{message}",
-            important=report.status == 'REJECTED'  # Mark rejected reminders as important
-        )
-        notification.save()
-        notification_count += 1
-    
-    # Log the reminder action
-    action_message = f"Reminder sent to {notification_count} organizer(s) for report: {report.title}"
-    messages.success(request, action_message)
+    # The notifications are created by a background job
+    enqueue(
+        'events.report_reminder', args={'report_id': report.id},
+        label=f'Report reminder: {report.title}', created_by=request.user,
+    )
+    messages.success(request, f"Sending a reminder to {organizers.count()} organizer(s) for report: {report.title}")
     
     # Redirect back to report review page
-    return redirect('review_event_report', report_id=report_id)
\ No newline at end of file
+    return redirect('review_event_report', report_id=report_id)
\ No newline at end of file
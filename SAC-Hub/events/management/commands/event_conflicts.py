@@ -0,0 +1,45 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from events.conflicts import ACTIVE_STATUSES, conflict_report
+
+
+class Command(BaseCommand):
+    help = (
+        "List venue clashes and events on blackout days between two dates, e.g. "
+        "for a whole semester: event_conflicts 2025-07-15 2025-12-15"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', help='First day (YYYY-MM-DD)')
+        parser.add_argument('end', help='Last day (YYYY-MM-DD), inclusive')
+        parser.add_argument(
+            '--status', action='append', dest='statuses',
+            help=f"Event status to include (repeatable; default: {', '.join(ACTIVE_STATUSES)})",
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to read')
+
+    def handle(self, *args, **options):
+        days = [parse_date(options[name]) for name in ('start', 'end')]
+        if None in days or days[1] < days[0]:
+            raise CommandError('start and end must be dates (YYYY-MM-DD), start first')
+        start = timezone.make_aware(datetime.combine(days[0], time.min))
+        end = timezone.make_aware(datetime.combine(days[1] + timedelta(days=1), time.min))
+        report = conflict_report(start, end, statuses=options['statuses'], using=options['database'])
+
+        def describe(event):
+            local = timezone.localtime(event.date_time)
+            return f'#{event.id} "{event.name}" {local:%Y-%m-%d %H:%M}-{timezone.localtime(event.ends_at):%H:%M} ({event.status})'
+
+        for first, second in report.clashes:
+            self.stdout.write(f'{first.venue}: {describe(first)} overlaps {describe(second)}')
+        for event, blackout in report.blackouts:
+            self.stdout.write(f'Blackout {blackout.date} ({blackout.reason}): {describe(event)}')
+        style = self.style.WARNING if report.clashes or report.blackouts else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{len(report.clashes)} clash(es), {len(report.blackouts)} event(s) on blackout days.'
+        ))
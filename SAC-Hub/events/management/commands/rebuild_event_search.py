@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from events.search import FallbackBackend, create_index, get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the event full-text search index (SQLite FTS5 table or PostgreSQL "
+        "GIN index), e.g. after bulk imports that bypass model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to rebuild')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        backend = get_backend(using)
+        started = time.perf_counter()
+        with transaction.atomic(using=using):
+            if isinstance(backend, FallbackBackend):
+                # Missing index (e.g. the table was dropped): try to create it
+                create_index(using)
+                backend = get_backend(using)
+            backend.rebuild()
+        if isinstance(backend, FallbackBackend):
+            self.stdout.write(self.style.WARNING(
+                'This database has no full-text support; searches use icontains matching.'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the event search index with {type(backend).__name__} in {time.perf_counter() - started:.2f}s.'
+        ))
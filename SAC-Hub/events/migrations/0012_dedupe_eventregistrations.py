@@ -0,0 +1,35 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def dedupe_registrations(apps, schema_editor):
+    """Keep one registration per (event, student) before the unique constraint.
+
+    An active REGISTERED row wins over a cancelled one; otherwise the most
+    recently updated row is kept.
+    """
+    EventRegistration = apps.get_model('events', 'EventRegistration')
+    db_alias = schema_editor.connection.alias
+    duplicates = (
+        EventRegistration.objects.using(db_alias).values('event_id', 'student_id')
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+    )
+    for pair in duplicates:
+        rows = list(
+            EventRegistration.objects.using(db_alias).filter(event_id=pair['event_id'], student_id=pair['student_id'])
+            .order_by('-updated_at', '-id')
+        )
+        keep = next((row for row in rows if row.status == 'REGISTERED'), rows[0])
+        EventRegistration.objects.using(db_alias).filter(id__in=[row.id for row in rows if row.id != keep.id]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_eventreport'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_registrations, migrations.RunPython.noop),
+    ]
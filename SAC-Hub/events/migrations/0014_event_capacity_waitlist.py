@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:05
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_registered_count(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    db_alias = schema_editor.connection.alias
+    counts = Event.objects.using(db_alias).annotate(seats=Count('registrations', filter=Q(registrations__status='REGISTERED')))
+    for event in counts.filter(seats__gt=0):
+        Event.objects.using(db_alias).filter(pk=event.pk).update(registered_count=event.seats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0013_event_indexes_unique_registration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Maximum number of registrations (leave empty for no limit)', null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='registered_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='eventregistration',
+            name='status',
+            field=models.CharField(choices=[('REGISTERED', 'Registered'), ('WAITLISTED', 'Waitlisted'), ('CANCELLED', 'Cancelled')], default='REGISTERED', max_length=20),
+        ),
+        migrations.RunPython(backfill_registered_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+from django.db import DatabaseError, migrations
+
+# Frozen copies of events.search as of this migration, so later changes to the
+# search module cannot change what this migration does.
+FTS_TABLE = 'events_event_fts'
+COLUMNS = 'name, event_type, venue, description'
+PG_INDEX = 'event_search_vector_idx'
+PG_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(event_type, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(venue, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'D')"
+)
+
+
+def fts5_available(cursor):
+    try:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+    except DatabaseError:
+        return False
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {PG_INDEX} ON events_event USING GIN (({PG_DOCUMENT}))')
+        elif connection.vendor == 'sqlite' and fts5_available(cursor):
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{COLUMNS}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, {COLUMNS}) SELECT id, {COLUMNS} FROM events_event')
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {PG_INDEX}')
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0014_event_capacity_waitlist'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
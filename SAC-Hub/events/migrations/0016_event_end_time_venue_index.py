@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:51
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_end_time(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Event.objects.using(schema_editor.connection.alias).filter(end_time__isnull=True).update(
+        end_time=F('date_time') + timedelta(hours=2)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0015_event_search_index'),
+        ('users', '0011_user_search_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='end_time',
+            field=models.DateTimeField(blank=True, help_text='When the event ends (defaults to two hours after the start)', null=True),
+        ),
+        migrations.RunPython(backfill_end_time, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['venue', 'date_time'], name='event_venue_date_idx'),
+        ),
+    ]
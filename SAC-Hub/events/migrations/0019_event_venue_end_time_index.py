@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0018_event_thumbnail_variants'),
+        ('users', '0013_club_certificate_template_help'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='event_venue_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['venue', 'end_time'], name='event_venue_end_idx'),
+        ),
+    ]
@@ -1,7 +1,12 @@
 
+from datetime import timedelta
+
 from django.db import models
 from users.models import Club, Department, User, Notification
 
+# Length given to events saved without an end time
+DEFAULT_DURATION = timedelta(hours=2)
+
 class EventStatus(models.TextChoices):
 	DRAFT = 'DRAFT', 'Draft'
 	PENDING = 'PENDING', 'Pending Approval'
@@ -14,6 +19,7 @@ class Event(models.Model):
 	event_type = models.CharField(max_length=100)
 	description = models.TextField(blank=True)
 	date_time = models.DateTimeField()
+	end_time = models.DateTimeField(null=True, blank=True, help_text='When the event ends (defaults to two hours after the start)')
 	venue = models.CharField(max_length=200)
 	resources = models.TextField(blank=True)
 	club = models.ForeignKey(Club, on_delete=models.SET_NULL, null=True, blank=True, related_name='events', help_text='Club associated with this event (optional)')
@@ -26,16 +32,48 @@ class Event(models.Model):
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 	thumbnail = models.ImageField(upload_to='event_thumbnails/', null=True, blank=True)
+	# Resized copies of the thumbnail, written by sac_project.images
+	thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
+	capacity = models.PositiveIntegerField(null=True, blank=True, help_text='Maximum number of registrations (leave empty for no limit)')
+	# Seats taken, maintained by events.registration with conditional UPDATEs
+	registered_count = models.PositiveIntegerField(default=0, editable=False)
+	# Set on occurrences of a recurring series (events.series)
+	series = models.ForeignKey('EventSeries', on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrences')
+
+	class Meta:
+		indexes = [
+			# Listings filter by status and sort or range over the date
+			models.Index(fields=['status', 'date_time'], name='event_status_date_idx'),
+			# Club dashboards: a club's events in a given status
+			models.Index(fields=['club', 'status'], name='event_club_status_idx'),
+			# Venue clash lookups: a venue's events ending after a given time (events.conflicts)
+			models.Index(fields=['venue', 'end_time'], name='event_venue_end_idx'),
+		]
 
 	def __str__(self):
 		return self.name
 
+	@property
+	def seats_left(self):
+		if self.capacity is None:
+			return None
+		return max(self.capacity - self.registered_count, 0)
+
+	@property
+	def ends_at(self):
+		return self.end_time or self.date_time + DEFAULT_DURATION
+
 	def save(self, *args, **kwargs):
+		if self.end_time is None:
+			self.end_time = self.date_time + DEFAULT_DURATION
 		is_new = self._state.adding
 		old_status = None
 		if not is_new:
 			old = Event.objects.get(pk=self.pk)
 			old_status = old.status
+			if kwargs.get('update_fields') is None:
+				# registered_count is owned by events.registration; never write back a stale copy
+				kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != 'registered_count']
 		super().save(*args, **kwargs)
 
 		# Notify administrators on new event submission for approval
@@ -82,6 +120,24 @@ class Event(models.Model):
 						message=f"Status of event '{self.name}' changed to {self.get_status_display()}."
 					)
 
+class EventSeries(models.Model):
+	"""A recurring event; its occurrences are Event rows created by events.series."""
+	name = models.CharField(max_length=200)
+	rule = models.CharField(max_length=200, help_text='Recurrence rule, e.g. FREQ=WEEKLY;BYDAY=MO,WE;COUNT=12 (see events.recurrence)')
+	first_start = models.DateTimeField()
+	duration = models.DurationField()
+	with_attendance_sessions = models.BooleanField(default=False, help_text='Create an attendance session for every occurrence')
+	club = models.ForeignKey(Club, on_delete=models.SET_NULL, null=True, blank=True, related_name='event_series')
+	department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True, related_name='event_series')
+	created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='created_event_series')
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		verbose_name_plural = 'event series'
+
+	def __str__(self):
+		return f"{self.name} ({self.rule})"
+
 class CollaborationRequest(models.Model):
 	event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='collaboration_requests')
 	requesting_department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='collab_requests')
@@ -141,16 +197,28 @@ class EventCollaboration(models.Model):
 		entity = self.get_collaborating_entity()
 		return f"Collaboration: {self.event} with {entity} ({self.status})"
 
+class RegistrationStatus(models.TextChoices):
+	REGISTERED = 'REGISTERED', 'Registered'
+	WAITLISTED = 'WAITLISTED', 'Waitlisted'
+	CANCELLED = 'CANCELLED', 'Cancelled'
+
 class EventRegistration(models.Model):
 	event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='registrations')
 	student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_registrations')
-	status = models.CharField(max_length=20, choices=[('REGISTERED', 'Registered'), ('CANCELLED', 'Cancelled')], default='REGISTERED')
+	status = models.CharField(max_length=20, choices=RegistrationStatus.choices, default=RegistrationStatus.REGISTERED)
 	notes = models.TextField(blank=True, default='')
 	registered_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 
 	class Meta:
 		ordering = ['-registered_at']
+		constraints = [
+			# Also serves the (event, student) lookups as an index
+			models.UniqueConstraint(fields=['event', 'student'], name='unique_event_registration'),
+		]
+		indexes = [
+			models.Index(fields=['student', 'status'], name='eventreg_student_status_idx'),
+		]
 
 	def __str__(self):
 		return f"{self.student} -> {self.event} ({self.status})"
@@ -234,4 +302,4 @@ class EventReport(models.Model):
 				Notification.objects.create(
 					user=self.submitted_by,
 					message=f"Your event report '{self.title}' has been {self.status.lower()}."
-				)
\ No newline at end of file
+				)
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+A small subset of iCalendar recurrence rules (RFC 5545 RRULE).
+
+Supported parts: ``FREQ`` (DAILY, WEEKLY or MONTHLY), ``INTERVAL``, ``BYDAY``
+(weekday codes, WEEKLY only), and one of ``COUNT`` or ``UNTIL``. Occurrences
+are generated in local time, so a 10:00 meetup stays at 10:00 across DST
+changes. Monthly rules repeat on the start's day of the month and skip months
+that lack it, as RFC 5545 does::
+
+    rule = parse_rule('FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10')
+    starts = occurrences(rule, first_start)
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# Upper bound on occurrences of one series
+MAX_OCCURRENCES = 200
+
+
+class RuleError(ValueError):
+    pass
+
+
+@dataclass
+class Rule:
+    freq: str
+    interval: int = 1
+    byday: list = field(default_factory=list)  # weekday numbers, Monday = 0
+    count: int = None
+    until: datetime = None
+
+    def __str__(self):
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.byday:
+            parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in self.byday))
+        if self.count:
+            parts.append(f'COUNT={self.count}')
+        if self.until:
+            parts.append(f"UNTIL={self.until.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}")
+        return ';'.join(parts)
+
+
+def _parse_until(value):
+    try:
+        if value.endswith('Z'):
+            return timezone.make_aware(datetime.strptime(value, '%Y%m%dT%H%M%SZ'), dt_timezone.utc)
+        # A bare date includes the whole local day
+        return timezone.make_aware(datetime.combine(datetime.strptime(value, '%Y%m%d').date(), time.max))
+    except ValueError:
+        raise RuleError(f'UNTIL must be YYYYMMDD or YYYYMMDDTHHMMSSZ, not {value!r}')
+
+
+def parse_rule(text):
+    """Parse ``text`` (with or without the ``RRULE:`` prefix) into a Rule; raises RuleError."""
+    text = (text or '').strip()
+    if text.upper().startswith('RRULE:'):
+        text = text[6:]
+    parts = {}
+    for part in filter(None, text.split(';')):
+        name, sep, value = part.partition('=')
+        if not sep or not value:
+            raise RuleError(f'Malformed rule part {part!r}')
+        parts[name.strip().upper()] = value.strip().upper()
+    unknown = set(parts) - {'FREQ', 'INTERVAL', 'BYDAY', 'COUNT', 'UNTIL'}
+    if unknown:
+        raise RuleError(f"Unsupported rule part(s): {', '.join(sorted(unknown))}")
+    if parts.get('FREQ') not in FREQUENCIES:
+        raise RuleError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    rule = Rule(freq=parts['FREQ'])
+    if 'INTERVAL' in parts:
+        if not parts['INTERVAL'].isdigit() or int(parts['INTERVAL']) < 1:
+            raise RuleError('INTERVAL must be a positive whole number')
+        rule.interval = int(parts['INTERVAL'])
+    if 'BYDAY' in parts:
+        if rule.freq != 'WEEKLY':
+            raise RuleError('BYDAY is only supported with FREQ=WEEKLY')
+        days = parts['BYDAY'].split(',')
+        if any(day not in WEEKDAYS for day in days):
+            raise RuleError(f"BYDAY takes weekday codes: {', '.join(WEEKDAYS)}")
+        rule.byday = sorted({WEEKDAYS.index(day) for day in days})
+    if ('COUNT' in parts) == ('UNTIL' in parts):
+        raise RuleError('A rule needs exactly one of COUNT or UNTIL')
+    if 'COUNT' in parts:
+        if not parts['COUNT'].isdigit() or not 1 <= int(parts['COUNT']) <= MAX_OCCURRENCES:
+            raise RuleError(f'COUNT must be between 1 and {MAX_OCCURRENCES}')
+        rule.count = int(parts['COUNT'])
+    else:
+        rule.until = _parse_until(parts['UNTIL'])
+    return rule
+
+
+def _candidates(rule, start):
+    """Local naive datetimes following ``rule`` from ``start`` (unbounded)."""
+    if rule.freq == 'DAILY':
+        step = 0
+        while True:
+            yield start + timedelta(days=step * rule.interval)
+            step += 1
+    elif rule.freq == 'WEEKLY':
+        days = rule.byday or [start.weekday()]
+        week = start - timedelta(days=start.weekday())
+        while True:
+            for day in days:
+                moment = week + timedelta(days=day)
+                if moment >= start:
+                    yield moment
+            week += timedelta(weeks=rule.interval)
+    else:
+        month = start.year * 12 + start.month - 1
+        while True:
+            try:
+                yield start.replace(year=month // 12, month=month % 12 + 1)
+            except ValueError:
+                pass  # e.g. the 31st in a 30-day month
+            month += rule.interval
+
+
+def occurrences(rule, start):
+    """Aware start times of every occurrence, the first being ``start`` when it matches the rule."""
+    result = []
+    for moment in _candidates(rule, timezone.localtime(start).replace(tzinfo=None)):
+        aware = timezone.make_aware(moment)
+        if rule.until and aware > rule.until:
+            break
+        if len(result) == MAX_OCCURRENCES:
+            raise RuleError(f'The rule has more than {MAX_OCCURRENCES} occurrences')
+        result.append(aware)
+        if len(result) == rule.count:
+            break
+    return result
@@ -0,0 +1,124 @@
+"""
+Seat accounting for event registrations.
+
+``Event.registered_count`` is only changed with single UPDATE statements, and
+the capacity check is part of the UPDATE's WHERE clause, so checking for a
+free seat and taking it is one atomic step even when many students register
+at once. The unique constraint on (event, student) turns a double submit into
+an IntegrityError, which rolls the seat claim back with the rest of the
+transaction.
+
+When an event is full the registration is WAITLISTED. A cancelled seat goes
+to the oldest waitlisted student (FIFO by id) in the same transaction as the
+cancellation.
+
+Every transaction here starts by touching the event row (``_lock_event``).
+On PostgreSQL/MySQL that is a row lock that serialises seat changes per
+event. On SQLite the first write takes the database write lock, and no
+transaction ever has to upgrade a read lock, which is what produces
+"database is locked" errors under concurrency.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from users.models import Notification
+from .models import Event, EventRegistration, RegistrationStatus
+
+
+def _lock_event(event_id):
+    # A no-op write: holds the event row until the transaction ends
+    Event.objects.filter(pk=event_id).update(registered_count=F('registered_count'))
+
+
+def _claim_seat(event_id, override_capacity=False):
+    """Take one seat if the event has one free; returns whether it did."""
+    seats = Event.objects.filter(pk=event_id)
+    if not override_capacity:
+        seats = seats.filter(Q(capacity__isnull=True) | Q(registered_count__lt=F('capacity')))
+    return seats.update(registered_count=F('registered_count') + 1) == 1
+
+
+def _promote_waitlisted(event):
+    """Move waitlisted students into free seats, oldest first."""
+    promoted = []
+    for registration in EventRegistration.objects.filter(event=event, status=RegistrationStatus.WAITLISTED).order_by('id'):
+        if not _claim_seat(event.pk):
+            break
+        registration.status = RegistrationStatus.REGISTERED
+        registration.save(update_fields=['status', 'updated_at'])
+        Notification.objects.create(
+            user_id=registration.student_id,
+            message=f"A seat opened up for '{event.name}'. You have been moved off the waitlist and are now registered."
+        )
+        promoted.append(registration)
+    return promoted
+
+
+def register(event, student, notes='', override_capacity=False):
+    """Register ``student`` for ``event``, or waitlist them if it is full.
+
+    Returns ``(registration, created)`` like ``get_or_create``; an existing
+    registration is returned unchanged. With ``override_capacity``
+    (on-the-spot registration by organizers) a seat is always taken, also for
+    a student who is on the waitlist.
+    """
+    replaceable = [RegistrationStatus.CANCELLED]
+    if override_capacity:
+        replaceable.append(RegistrationStatus.WAITLISTED)
+    existing = EventRegistration.objects.filter(event=event, student=student).first()
+    if existing and existing.status not in replaceable:
+        return existing, False
+    try:
+        with transaction.atomic():
+            _lock_event(event.pk)
+            if existing:
+                EventRegistration.objects.filter(pk=existing.pk, status=existing.status).delete()
+            has_seat = _claim_seat(event.pk, override_capacity)
+            registration = EventRegistration.objects.create(
+                event=event,
+                student=student,
+                notes=notes,
+                status=RegistrationStatus.REGISTERED if has_seat else RegistrationStatus.WAITLISTED,
+            )
+    except IntegrityError:
+        # A concurrent request registered this student first
+        return EventRegistration.objects.get(event=event, student=student), False
+    return registration, True
+
+
+def cancel(event, student):
+    """Remove ``student``'s registration or waitlist entry for ``event``.
+
+    A freed seat is handed to the oldest waitlisted student. Returns the
+    promoted registrations (empty if none); raises
+    ``EventRegistration.DoesNotExist`` when there was nothing to cancel.
+    """
+    with transaction.atomic():
+        _lock_event(event.pk)
+        registration = (
+            EventRegistration.objects.filter(event=event, student=student)
+            .exclude(status=RegistrationStatus.CANCELLED).first()
+        )
+        if registration is None:
+            raise EventRegistration.DoesNotExist('No active registration for this event.')
+        registration.delete()
+        if registration.status != RegistrationStatus.REGISTERED:
+            return []
+        Event.objects.filter(pk=event.pk, registered_count__gt=0).update(registered_count=F('registered_count') - 1)
+        return _promote_waitlisted(event)
+
+
+def fill_from_waitlist(event):
+    """Promote waitlisted students into any free seats, e.g. after the capacity was raised."""
+    with transaction.atomic():
+        _lock_event(event.pk)
+        return _promote_waitlisted(event)
+
+
+def waitlist_position(registration):
+    """1-based position of a waitlisted registration, or None."""
+    if registration.status != RegistrationStatus.WAITLISTED:
+        return None
+    return EventRegistration.objects.filter(
+        event_id=registration.event_id, status=RegistrationStatus.WAITLISTED, id__lt=registration.id
+    ).count() + 1
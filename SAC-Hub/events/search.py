@@ -0,0 +1,313 @@
+"""
+Full-text search over events.
+
+One API, one index per database backend:
+
+* SQLite: an FTS5 table ``events_event_fts`` (rowid = event id) holding the
+  name, event type, venue and description, ranked with BM25.
+* PostgreSQL: a GIN index on the ``to_tsvector`` of the same columns, ranked
+  with ``ts_rank_cd`` and highlighted with ``ts_headline``.
+* Anything else (or SQLite built without FTS5) falls back to ``icontains``.
+
+The SQLite index is updated from the ``Event`` post_save/post_delete signals
+(``events.signals``); writes that skip signals (``bulk_create``, raw SQL) need
+``manage.py rebuild_event_search``. The PostgreSQL index is an expression
+index, so the database maintains it.
+
+Usage::
+
+    events = search_events('robotics workshop', Event.objects.filter(status='APPROVED'))
+    page = Paginator(events, 10).get_page(1)
+    attach_snippets(page, 'robotics workshop')  # sets event.search_snippet
+
+``search_events`` returns the queryset restricted to matches, annotated with
+``search_rank`` (higher is better) and ordered by it. The index is queried
+only for rows of that queryset, so filters applied before searching are not
+cut short by ``MAX_RESULTS``.
+"""
+import re
+
+from django.core.exceptions import EmptyResultSet
+from django.db import DatabaseError, connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Event
+
+FTS_TABLE = 'events_event_fts'
+# Indexed columns, most important first (name matches weigh the most)
+COLUMNS = ('name', 'event_type', 'venue', 'description')
+WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+# Upper bound on ranked hits fetched from the index per search (best first)
+MAX_RESULTS = 1000
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+
+def tokenize(query):
+    return _TOKEN.findall(query or '')[:16]
+
+
+def _highlight(text):
+    """Escape ``text`` and turn the start/end markers into <mark> tags."""
+    return mark_safe(escape(text).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def _scope(queryset):
+    """SQL and params selecting the ids of ``queryset``, or None if it is empty."""
+    try:
+        return queryset.order_by().values('pk').query.sql_with_params()
+    except EmptyResultSet:
+        return None
+
+
+def _rank_order(queryset, ranks):
+    """Restrict ``queryset`` to the ranked ids and order it best first."""
+    if not ranks:
+        return queryset.none()
+    rank = Case(*[When(pk=pk, then=Value(score)) for pk, score in ranks.items()], output_field=FloatField())
+    return queryset.filter(pk__in=list(ranks)).annotate(search_rank=rank).order_by('-search_rank', '-date_time')
+
+
+class SQLiteFTSBackend:
+    def __init__(self, using):
+        self.using = using
+
+    @staticmethod
+    def match_expression(tokens):
+        # Every word must match, as a prefix; quoting neutralises FTS5 operators
+        return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+    def create(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{', '.join(COLUMNS)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        self.rebuild()
+
+    def drop(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(COLUMNS)}) "
+                f"SELECT id, {', '.join(COLUMNS)} FROM {Event._meta.db_table}"
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+    def index(self, event):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [event.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(COLUMNS)}) VALUES (%s, %s, %s, %s, %s)",
+                [event.pk] + [getattr(event, column) or '' for column in COLUMNS],
+            )
+
+    def remove(self, event_id):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [event_id])
+
+    def search(self, queryset, tokens):
+        scope = _scope(queryset)
+        if scope is None:
+            return queryset.none()
+        scope_sql, scope_params = scope
+        with connections[self.using].cursor() as cursor:
+            # Ordered by the weighted score; the built-in "rank" column is unweighted bm25
+            cursor.execute(
+                f"SELECT rowid, bm25({FTS_TABLE}, {', '.join(map(str, WEIGHTS))}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid IN ({scope_sql}) ORDER BY 2 LIMIT %s",
+                [self.match_expression(tokens), *scope_params, MAX_RESULTS],
+            )
+            # bm25() is lower for better matches
+            ranks = {pk: -score for pk, score in cursor.fetchall()}
+        return _rank_order(queryset, ranks)
+
+    def snippets(self, event_ids, tokens):
+        placeholders = ', '.join(['%s'] * len(event_ids))
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({FTS_TABLE}, -1, %s, %s, '…', 16) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid IN ({placeholders})",
+                [_MARK_START, _MARK_END, self.match_expression(tokens), *event_ids],
+            )
+            return {pk: _highlight(snippet) for pk, snippet in cursor.fetchall()}
+
+
+class PostgresBackend:
+    CONFIG = 'english'
+    INDEX = 'event_search_vector_idx'
+
+    def __init__(self, using):
+        self.using = using
+
+    @classmethod
+    def document(cls, alias=''):
+        prefix = f'{alias}.' if alias else ''
+        weights = 'ABCD'
+        return ' || '.join(
+            f"setweight(to_tsvector('{cls.CONFIG}', coalesce({prefix}{column}, '')), '{weight}')"
+            for column, weight in zip(COLUMNS, weights)
+        )
+
+    @classmethod
+    def tsquery(cls, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def create(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {self.INDEX} ON {Event._meta.db_table} '
+                f'USING GIN (({self.document()}))'
+            )
+
+    def drop(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'DROP INDEX IF EXISTS {self.INDEX}')
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'REINDEX INDEX {self.INDEX}')
+
+    def index(self, event):
+        pass
+
+    def remove(self, event_id):
+        pass
+
+    def search(self, queryset, tokens):
+        scope = _scope(queryset)
+        if scope is None:
+            return queryset.none()
+        scope_sql, scope_params = scope
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT e.id, ts_rank_cd({self.document('e')}, q) "
+                f"FROM {Event._meta.db_table} e, to_tsquery('{self.CONFIG}', %s) q "
+                f"WHERE ({self.document('e')}) @@ q AND e.id IN ({scope_sql}) ORDER BY 2 DESC LIMIT %s",
+                [self.tsquery(tokens), *scope_params, MAX_RESULTS],
+            )
+            ranks = dict(cursor.fetchall())
+        return _rank_order(queryset, ranks)
+
+    def snippets(self, event_ids, tokens):
+        text = " || ' ' || ".join(f"coalesce({column}, '')" for column in COLUMNS)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, ts_headline('{self.CONFIG}', {text}, to_tsquery('{self.CONFIG}', %s), %s) "
+                f"FROM {Event._meta.db_table} WHERE id = ANY(%s)",
+                [self.tsquery(tokens), f'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=30, MinWords=10',
+                 list(event_ids)],
+            )
+            return {pk: _highlight(snippet) for pk, snippet in cursor.fetchall()}
+
+
+class FallbackBackend:
+    """``icontains`` matching for databases without a full-text index."""
+
+    def __init__(self, using):
+        self.using = using
+
+    def create(self):
+        pass
+
+    drop = rebuild = create
+
+    def index(self, event):
+        pass
+
+    def remove(self, event_id):
+        pass
+
+    def search(self, queryset, tokens):
+        for token in tokens:
+            queryset = queryset.filter(
+                Q(name__icontains=token) | Q(description__icontains=token) | Q(event_type__icontains=token)
+            )
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).order_by('-date_time')
+
+    def snippets(self, event_ids, tokens):
+        pattern = re.compile('|'.join(re.escape(token) for token in tokens), re.IGNORECASE)
+        snippets = {}
+        for pk, name, description in Event.objects.using(self.using).filter(pk__in=event_ids).values_list(
+            'pk', 'name', 'description'
+        ):
+            text = description or name
+            match = pattern.search(text)
+            start = max(match.start() - 60, 0) if match else 0
+            excerpt = ('…' if start else '') + text[start:start + 160]
+            snippets[pk] = _highlight(pattern.sub(lambda m: f'{_MARK_START}{m.group(0)}{_MARK_END}', excerpt))
+        return snippets
+
+
+def fts5_available(using='default'):
+    connection = connections[using]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            return bool(cursor.fetchone()[0])
+    except DatabaseError:
+        return False
+
+
+_has_fts_table = {}
+
+
+def get_backend(using='default'):
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return PostgresBackend(using)
+    if connection.vendor == 'sqlite':
+        key = (using, str(connection.settings_dict['NAME']))
+        if key not in _has_fts_table:
+            with connection.cursor() as cursor:
+                _has_fts_table[key] = FTS_TABLE in connection.introspection.table_names(cursor)
+        if _has_fts_table[key]:
+            return SQLiteFTSBackend(using)
+    return FallbackBackend(using)
+
+
+def create_index(using='default'):
+    """Create and fill the index for this database (``manage.py rebuild_event_search``)."""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        PostgresBackend(using).create()
+    elif connection.vendor == 'sqlite' and fts5_available(using):
+        SQLiteFTSBackend(using).create()
+    _has_fts_table.clear()
+
+
+def drop_index(using='default'):
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        PostgresBackend(using).drop()
+    elif connection.vendor == 'sqlite':
+        SQLiteFTSBackend(using).drop()
+    _has_fts_table.clear()
+
+
+def search_events(query, queryset=None):
+    """Events matching every word of ``query`` (as a prefix), best match first."""
+    queryset = Event.objects.all() if queryset is None else queryset
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.none()
+    return get_backend(queryset.db).search(queryset, tokens)
+
+
+def attach_snippets(events, query):
+    """Set ``search_snippet`` (safe HTML with <mark> highlights) on each event."""
+    events = list(events)
+    tokens = tokenize(query)
+    if not events or not tokens:
+        return events
+    snippets = get_backend(events[0]._state.db or 'default').snippets([event.pk for event in events], tokens)
+    for event in events:
+        event.search_snippet = snippets.get(event.pk, '')
+    return events
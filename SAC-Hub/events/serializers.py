@@ -2,6 +2,10 @@ from rest_framework import serializers
 from .models import Event, CollaborationRequest, EventReport
 
 class EventSerializer(serializers.ModelSerializer):
+    # Only present in ?search= results
+    search_rank = serializers.FloatField(read_only=True)
+    search_snippet = serializers.CharField(read_only=True)
+
     class Meta:
         model = Event
         fields = '__all__'
@@ -0,0 +1,137 @@
+"""
+Recurring event series.
+
+``create_series`` expands a recurrence rule (``events.recurrence``) into
+``Event`` rows with chunked ``bulk_create``, plus their organizer rows and,
+optionally, one ``AttendanceSession`` each. ``bulk_create`` skips
+``Event.save`` and the model signals, so the side effects are done here once
+for the whole series instead of once per occurrence:
+
+* one notification per recipient for the series (not one per occurrence);
+* the search index rows are written for the new events;
+* the calendar version is bumped once.
+
+``update_following`` applies an edit to an occurrence and every later one
+with a single UPDATE; time changes are expressed relative to each row
+(``date_time + shift``), so every occurrence keeps its own date.
+"""
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from attendance.models import AttendanceSession
+from calendar_app.engine import invalidate as invalidate_calendar
+from users.models import Notification, User
+
+from .models import Event, EventSeries, EventStatus
+from .recurrence import RuleError, occurrences, parse_rule
+from .search import COLUMNS as SEARCH_COLUMNS, get_backend as get_search_backend
+
+CHUNK_SIZE = 500
+
+
+def _notify(users, message):
+    # Few recipients; create() keeps the real-time push of users.signals
+    for user in users:
+        Notification.objects.create(user=user, message=message)
+
+
+def _admins():
+    return [user for user in User.objects.only('id', 'roles') if {'ADMIN', 'SAC_COORDINATOR'} & set(user.roles or [])]
+
+
+def create_series(*, rule, first_start, duration, created_by=None, status=EventStatus.PENDING, organizers=(),
+                  with_attendance_sessions=False, chunk_size=CHUNK_SIZE, **fields):
+    """Create an EventSeries and all its occurrences; returns ``(series, events)``.
+
+    ``fields`` are Event fields shared by every occurrence (``name``,
+    ``event_type``, ``venue``, ``club_id``, ...). Raises RuleError for a
+    rule that does not parse or produces no occurrence.
+    """
+    parsed = parse_rule(rule)
+    starts = occurrences(parsed, first_start)
+    if not starts:
+        raise RuleError('The rule produces no occurrences')
+    organizers = list(organizers)
+    with transaction.atomic():
+        series = EventSeries.objects.create(
+            name=fields['name'], rule=str(parsed), first_start=starts[0], duration=duration,
+            with_attendance_sessions=with_attendance_sessions, club_id=fields.get('club_id'),
+            department_id=fields.get('department_id'), created_by=created_by,
+        )
+        events = Event.objects.bulk_create([
+            Event(series=series, date_time=start, end_time=start + duration, status=status, created_by=created_by, **fields)
+            for start in starts
+        ], batch_size=chunk_size)
+        Event.organizers.through.objects.bulk_create([
+            Event.organizers.through(event_id=event.id, user_id=organizer.id)
+            for event in events for organizer in organizers
+        ], batch_size=chunk_size)
+        if with_attendance_sessions:
+            AttendanceSession.objects.bulk_create([
+                AttendanceSession(
+                    event=event, label=f'{event.name} ({timezone.localtime(event.date_time):%b %d})',
+                    created_by=created_by, open_at=event.date_time,
+                    attendance_code=uuid.uuid4().hex[:12].upper(),
+                )
+                for event in events
+            ], batch_size=chunk_size)
+        search = get_search_backend()
+        for event in events:
+            search.index(event)
+
+        count = len(events)
+        if status == EventStatus.PENDING:
+            submitter = created_by.get_full_name() if created_by else 'Unknown'
+            _notify(_admins(), f"New event series '{series.name}' ({count} occurrences) by {submitter} is pending approval.")
+        if series.club_id:
+            _notify(
+                series.club.coordinators.all(),
+                f"New event series '{series.name}' ({count} occurrences) has been submitted for your club.",
+            )
+    invalidate_calendar()
+    return series, events
+
+
+def update_following(occurrence, *, shift=timedelta(0), duration=None, **changes):
+    """Apply an edit to ``occurrence`` and every later occurrence of its series.
+
+    ``changes`` are plain field values (``name``, ``venue``, ``status``,
+    ...); ``shift`` moves every start by the same amount and ``duration``,
+    if given, sets each occurrence's length. Returns the updated Events.
+    """
+    if occurrence.series_id is None:
+        raise ValueError(f'{occurrence} is not part of a series')
+    following = Event.objects.filter(series_id=occurrence.series_id, date_time__gte=occurrence.date_time)
+    updates = dict(changes, updated_at=timezone.now())
+    if shift:
+        updates['date_time'] = F('date_time') + shift
+    if duration is not None:
+        # SET expressions see the old row, so add the shift here too
+        updates['end_time'] = F('date_time') + shift + duration
+    elif shift:
+        updates['end_time'] = F('end_time') + shift
+    with transaction.atomic():
+        ids = list(following.values_list('id', flat=True))
+        Event.objects.filter(id__in=ids).update(**updates)
+        events = list(Event.objects.filter(id__in=ids).select_related('club').order_by('date_time'))
+        if 'name' in changes:
+            EventSeries.objects.filter(pk=occurrence.series_id).update(name=changes['name'])
+        if set(changes) & set(SEARCH_COLUMNS):
+            search = get_search_backend()
+            for event in events:
+                search.index(event)
+        if 'status' in changes and changes['status'] != occurrence.status and events:
+            message = (
+                f"Status of {len(events)} occurrence(s) of '{events[0].name}' "
+                f"changed to {events[0].get_status_display()}."
+            )
+            recipients = {user.id: user for user in occurrence.organizers.all()}
+            if occurrence.created_by_id:
+                recipients.setdefault(occurrence.created_by_id, occurrence.created_by)
+            _notify(recipients.values(), message)
+    invalidate_calendar()
+    return events
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Event
+from .search import COLUMNS, get_backend
+
+
+@receiver(post_save, sender=Event)
+def index_event(sender, instance, using, update_fields=None, **kwargs):
+    """Keep the full-text index in step with the event's searchable fields."""
+    if update_fields is not None and not set(update_fields) & set(COLUMNS):
+        return
+    get_backend(using).index(instance)
+
+
+@receiver(post_delete, sender=Event)
+def unindex_event(sender, instance, using, **kwargs):
+    get_backend(using).remove(instance.pk)
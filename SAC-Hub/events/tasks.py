@@ -0,0 +1,55 @@
+"""Background tasks of the events app (see jobs.queue)."""
+from jobs.queue import PermanentError, task
+
+
+def reminder_message(report):
+    """(message, important) of the reminder about ``report`` sent to its event's organizers."""
+    event = report.event
+    held_on = event.date_time.strftime('%B %d, %Y')
+    if report.status == 'PENDING':
+        reminder_type = "Report Pending Approval"
+        message = (
+            f"Reminder: Your event report for '{event.name}' (held on {held_on}) "
+            f"is still pending approval. Please follow up with the SAC Coordinator if needed. "
+            f"Report Title: {report.title}"
+        )
+    elif report.status == 'REJECTED':
+        reminder_type = "Report Rejected - Action Required"
+        message = (
+            f"Reminder: Your event report for '{event.name}' (held on {held_on}) "
+            f"has been rejected. Please review the feedback and resubmit the corrected report. "
+            f"Report Title: {report.title}. "
+            f"Feedback: {report.approval_notes if report.approval_notes else 'Check the report details for more information.'}"
+        )
+    else:
+        reminder_type = "Report Status Update"
+        message = (
+            f"Reminder: Your event report for '{event.name}' (held on {held_on}) "
+            f"requires your attention. Report Title: {report.title}"
+        )
+    # Rejected reports need action, so their reminders are important
+    return f"{reminder_type}\n\n{message}", report.status == 'REJECTED'
+
+
+@task('events.report_reminder')
+def send_report_reminder(ctx, *, report_id):
+    """Notify the organizers of a report's event, all at once, so a retry never notifies anyone twice."""
+    from django.db import transaction
+
+    from users.models import Notification
+
+    from .models import EventReport
+
+    if ctx.job.progress_done:
+        # An earlier attempt committed the notifications and failed afterwards
+        return {'sent': ctx.job.progress_done}
+    report = EventReport.objects.select_related('event').filter(id=report_id).first()
+    if report is None:
+        raise PermanentError('The event report no longer exists.')
+    message, important = reminder_message(report)
+    organizers = list(report.event.organizers.all())
+    with transaction.atomic():
+        for organizer in organizers:
+            Notification.objects.create(user=organizer, message=message, important=important)
+        ctx.checkpoint(len(organizers), len(organizers))
+    return {'sent': len(organizers)}
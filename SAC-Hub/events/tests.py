@@ -1,3 +1,290 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from calendar_app.models import BlackoutDate
+from sac_project.testing import QueryBudgetMixin
+from users.models import Notification, User
+from . import search
+from .conflicts import conflict_report, overlapping, slot_warnings
+from .models import DEFAULT_DURATION, Event, EventRegistration, RegistrationStatus
+from .recurrence import RuleError, occurrences, parse_rule
+from .series import create_series, update_following
+from .registration import cancel, register
+from .search import SQLiteFTSBackend, attach_snippets, get_backend, search_events
+
+
+class RegistrationConcurrencyTests(TransactionTestCase):
+    """Seat accounting must hold when many requests hit the same event at once."""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Concurrent connections need a file-backed test database.')
+        self.event = Event.objects.create(
+            name='Annual Fest', event_type='Cultural', venue='Main Hall',
+            date_time=timezone.now() + timedelta(days=7), status='APPROVED', capacity=25,
+        )
+        self.students = [
+            User.objects.create(username=f'21CS{i:04d}', roll_no=f'21CS{i:04d}', roles=['STUDENT'])
+            for i in range(100)
+        ]
+
+    def run_concurrently(self, func, calls):
+        """Run ``func(*args)`` for every args tuple in its own thread, all released together."""
+        barrier = threading.Barrier(len(calls))
+        errors = []
+
+        def worker(args):
+            try:
+                barrier.wait()
+                func(*args)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(args,)) for args in calls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def statuses(self):
+        return list(
+            EventRegistration.objects.filter(event=self.event).order_by('id').values_list('status', flat=True)
+        )
+
+    def assert_consistent(self):
+        self.event.refresh_from_db()
+        registered = EventRegistration.objects.filter(event=self.event, status=RegistrationStatus.REGISTERED).count()
+        waitlisted = EventRegistration.objects.filter(event=self.event, status=RegistrationStatus.WAITLISTED).count()
+        self.assertEqual(self.event.registered_count, registered)
+        self.assertLessEqual(registered, self.event.capacity)
+        if waitlisted:
+            self.assertEqual(registered, self.event.capacity, 'free seats left while students are waitlisted')
+
+    def test_concurrent_registrations_never_exceed_capacity(self):
+        self.run_concurrently(register, [(self.event, student) for student in self.students])
+
+        statuses = self.statuses()
+        self.assertEqual(statuses.count(RegistrationStatus.REGISTERED), 25)
+        self.assertEqual(statuses.count(RegistrationStatus.WAITLISTED), 75)
+        self.assert_consistent()
+
+    def test_double_submit_creates_one_registration(self):
+        student = self.students[0]
+        self.run_concurrently(register, [(self.event, student)] * 20)
+
+        self.assertEqual(self.statuses(), [RegistrationStatus.REGISTERED])
+        self.assert_consistent()
+
+    def test_cancellations_promote_waitlist_in_order(self):
+        for student in self.students[:40]:
+            register(self.event, student)
+        waitlist = list(
+            EventRegistration.objects.filter(event=self.event, status=RegistrationStatus.WAITLISTED)
+            .order_by('id').values_list('student_id', flat=True)
+        )
+
+        self.run_concurrently(cancel, [(self.event, student) for student in self.students[:10]])
+
+        promoted = set(
+            EventRegistration.objects.filter(event=self.event, status=RegistrationStatus.REGISTERED, student_id__in=waitlist)
+            .values_list('student_id', flat=True)
+        )
+        self.assertEqual(promoted, set(waitlist[:10]))
+        self.assert_consistent()
+
+    def test_mixed_registrations_and_cancellations_stay_consistent(self):
+        for student in self.students[:40]:
+            register(self.event, student)
+
+        calls = [(cancel, student) for student in self.students[:20]]
+        calls += [(register, student) for student in self.students[40:]]
+        self.run_concurrently(lambda func, student: func(self.event, student), calls)
+
+        self.assertEqual(len(self.statuses()), 80)
+        self.assert_consistent()
+
+
+class EventPageQueryTests(QueryBudgetMixin, TestCase):
+    """Query counts of the event pages must not grow with the number of registrations."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = Event.objects.create(
+            name='Tech Talk', event_type='Technical', venue='Seminar Hall',
+            date_time=timezone.now() + timedelta(days=3), status='APPROVED',
+        )
+        cls.student = User.objects.create(username='21CS9999', roll_no='21CS9999', roles=['STUDENT'])
+        for i in range(30):
+            attendee = User.objects.create(username=f'21CS{i:04d}', roll_no=f'21CS{i:04d}', roles=['STUDENT'])
+            EventRegistration.objects.create(event=cls.event, student=attendee)
+
+    def setUp(self):
+        self.client.force_login(self.student)
+
+    def test_event_detail_query_budget(self):
+        response = self.assertMaxQueries('event_detail', 7, args=[self.event.id])
+        self.assertEqual(response.status_code, 200)
+
+
+class ConflictTests(TestCase):
+    """Venue clash lookups must find every overlap, including with long events."""
+
+    def setUp(self):
+        cache.clear()
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=10)
+
+    def event(self, name, offset_hours, hours, venue='Main Hall', status='APPROVED'):
+        start = self.start + timedelta(hours=offset_hours)
+        return Event.objects.create(
+            name=name, event_type='Technical', venue=venue, status=status,
+            date_time=start, end_time=start + timedelta(hours=hours),
+        )
+
+    def test_end_time_defaults_to_default_duration(self):
+        event = Event.objects.create(name='Talk', event_type='Technical', venue='Room 1', date_time=self.start)
+        self.assertEqual(event.end_time, self.start + DEFAULT_DURATION)
+
+    def test_overlapping_events_at_the_same_venue(self):
+        clash = self.event('Clash', 1, 2)
+        self.event('Adjacent', 3, 1)
+        self.event('Elsewhere', 1, 2, venue='Room 1')
+        self.event('Rejected', 1, 2, status='REJECTED')
+        self.assertEqual(overlapping('Main Hall', self.start, self.start + timedelta(hours=3)), [clash])
+        self.assertEqual(overlapping('Main Hall', self.start, self.start + timedelta(hours=3), exclude=clash.pk), [])
+
+    def test_long_events_are_found(self):
+        fest = self.event('Fest', -48, 72)
+        self.assertEqual(overlapping('Main Hall', self.start, self.start + timedelta(hours=1)), [fest])
+        # Also when saved without signals, and by a report starting after the event did
+        week = Event.objects.create(
+            name='Book Fair', event_type='Cultural', venue='Room 1', status='APPROVED',
+            date_time=self.start - timedelta(days=7), end_time=self.start + timedelta(days=7),
+        )
+        Event.objects.filter(pk=week.pk).update(end_time=self.start + timedelta(days=30))
+        self.assertEqual(overlapping('Room 1', self.start + timedelta(days=20), self.start + timedelta(days=21)), [week])
+        report = conflict_report(self.start + timedelta(days=20), self.start + timedelta(days=21))
+        self.assertEqual(report.clashes, [])
+
+    def test_overlap_lookup_uses_the_venue_end_index(self):
+        plan = Event.objects.filter(
+            venue='Main Hall', end_time__gt=self.start, date_time__lt=self.start + timedelta(hours=1),
+            status__in=['PENDING', 'APPROVED'],
+        ).explain()
+        self.assertIn('event_venue_end_idx', plan)
+
+    def test_report_pairs_and_blackouts(self):
+        first = self.event('First', 0, 3)
+        self.event('Second', 1, 1)
+        third = self.event('Third', 2, 2)
+        self.event('Later', 5, 1)
+        BlackoutDate.objects.create(date=timezone.localtime(self.start + timedelta(hours=5)).date(), reason='Holiday')
+        report = conflict_report(self.start - timedelta(days=1), self.start + timedelta(days=1))
+        self.assertEqual(
+            {(a.name, b.name) for a, b in report.clashes},
+            {('First', 'Second'), ('First', 'Third')},
+        )
+        self.assertIn('Later', {event.name for event, _ in report.blackouts})
+        self.assertIn(third.id, report.by_event())
+        warnings = slot_warnings('Main Hall', first.date_time, first.ends_at, exclude=first.pk)
+        self.assertEqual(len([w for w in warnings if 'already booked' in w]), 2)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.start = timezone.now() + timedelta(days=3)
+
+    def event(self, name, description='', status='APPROVED', days=0):
+        return Event.objects.create(
+            name=name, event_type='Workshop', venue='Lab 2', description=description, status=status,
+            date_time=self.start + timedelta(days=days),
+        )
+
+    def limit_results(self, limit):
+        self.addCleanup(setattr, search, 'MAX_RESULTS', search.MAX_RESULTS)
+        search.MAX_RESULTS = limit
+
+    def test_uses_the_fts_index(self):
+        self.assertIsInstance(get_backend(), SQLiteFTSBackend)
+
+    def test_every_word_matches_as_a_prefix(self):
+        expo = self.event('Robotics Expo', 'Build and race line followers')
+        self.event('Robotics Seminar', 'Talks on control theory')
+        self.assertEqual(list(search_events('robo exp')), [expo])
+        self.assertEqual(list(search_events('   ')), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        event = self.event('Quiz Night')
+        event.name = 'Trivia Night'
+        event.save()
+        self.assertEqual(list(search_events('quiz')), [])
+        self.assertEqual(list(search_events('trivia')), [event])
+        event.delete()
+        self.assertEqual(list(search_events('trivia')), [])
+
+    def test_name_matches_outrank_description_matches(self):
+        described = self.event('Open Day', 'robotics robotics robotics')
+        named = self.event('Robotics Club Orientation and Annual General Meeting', 'Agenda, elections and snacks')
+        self.assertEqual(list(search_events('robotics')), [named, described])
+        # The hits kept under the limit are the best by the weighted score too
+        self.limit_results(1)
+        self.assertEqual(list(search_events('robotics')), [named])
+
+    def test_result_limit_applies_after_the_callers_filters(self):
+        for _ in range(3):
+            self.event('Hackathon', status='PENDING')
+        # The weakest match of all, but the only one the caller can see
+        approved = self.event('Hackathon for first year students in the main auditorium', days=1)
+        self.limit_results(2)
+        self.assertEqual(list(search_events('hackathon', Event.objects.filter(status='APPROVED'))), [approved])
+        self.assertEqual(list(search_events('hackathon', Event.objects.none())), [])
+
+    def test_snippets_highlight_matches(self):
+        event = self.event('Film Screening', 'An evening of <short> films by students')
+        [event] = attach_snippets(search_events('films'), 'films')
+        self.assertIn('<mark>films</mark>', event.search_snippet)
+        self.assertIn('&lt;short&gt;', event.search_snippet)
+
+
+class SeriesTests(TestCase):
+    """Recurring series are created in bulk and edited with set-based updates."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='admin1', roles=['ADMIN'])
+        self.first = timezone.make_aware(timezone.datetime(2030, 1, 7, 17, 0))  # a Monday
+
+    def test_weekly_rule_on_several_days(self):
+        starts = occurrences(parse_rule('FREQ=WEEKLY;BYDAY=MO,TH;COUNT=4'), self.first)
+        self.assertEqual([timezone.localtime(start).day for start in starts], [7, 10, 14, 17])
+        with self.assertRaises(RuleError):
+            parse_rule('FREQ=WEEKLY;BYDAY=MO')
+
+    def test_create_series_notifies_once(self):
+        series, events = create_series(
+            rule='FREQ=WEEKLY;COUNT=12', first_start=self.first, duration=timedelta(hours=1),
+            organizers=[self.admin], with_attendance_sessions=True,
+            name='Meetup', event_type='Technical', venue='Lab 1',
+        )
+        self.assertEqual(series.occurrences.count(), 12)
+        self.assertEqual(Event.organizers.through.objects.filter(event__series=series).count(), 12)
+        self.assertEqual(Notification.objects.filter(user=self.admin).count(), 1)
+        self.assertEqual(events[-1].date_time - events[0].date_time, timedelta(weeks=11))
+
+    def test_update_following_shifts_later_occurrences(self):
+        _, events = create_series(
+            rule='FREQ=DAILY;COUNT=5', first_start=self.first, duration=timedelta(hours=1),
+            name='Workshop', event_type='Technical', venue='Lab 1',
+        )
+        update_following(events[2], shift=timedelta(hours=1), venue='Lab 2')
+        rows = list(Event.objects.order_by('date_time').values_list('venue', 'date_time', 'end_time'))
+        self.assertEqual([venue for venue, _, _ in rows], ['Lab 1', 'Lab 1', 'Lab 2', 'Lab 2', 'Lab 2'])
+        self.assertEqual(rows[2][1], events[2].date_time + timedelta(hours=1))
+        self.assertEqual(rows[2][2] - rows[2][1], timedelta(hours=1))
@@ -1,11 +1,28 @@
 
 from rest_framework import viewsets
+from rest_framework.response import Response
 from .models import Event, CollaborationRequest, EventReport
+from .search import attach_snippets, search_events
 from .serializers import EventSerializer, CollaborationRequestSerializer, EventReportSerializer
 
 class EventViewSet(viewsets.ModelViewSet):
 	queryset = Event.objects.all()
 	serializer_class = EventSerializer
+	
+	def get_queryset(self):
+		"""?search= runs a full-text search, best match first"""
+		queryset = super().get_queryset()
+		search_query = self.request.query_params.get('search', '').strip()
+		if search_query and self.action == 'list':
+			queryset = search_events(search_query, queryset)
+		return queryset
+	
+	def list(self, request, *args, **kwargs):
+		search_query = request.query_params.get('search', '').strip()
+		if not search_query:
+			return super().list(request, *args, **kwargs)
+		events = attach_snippets(self.filter_queryset(self.get_queryset()), search_query)
+		return Response(self.get_serializer(events, many=True).data)
 
 class CollaborationRequestViewSet(viewsets.ModelViewSet):
 	queryset = CollaborationRequest.objects.all()
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "task", "label", "status", "attempts", "created_by", "created_at", "finished_at")
+    list_filter = ("status", "task")
+    search_fields = ("label", "task", "created_by__username")
+    readonly_fields = ("locked_by", "locked_at", "started_at", "finished_at", "error")
@@ -0,0 +1,361 @@
+"""
+Export center: large downloads built by a background job.
+
+An export is a kind (``EXPORTS``: attendance, event registrations, club
+roster) plus parameters, written in one of ``FORMATS``:
+
+* ``csv``;
+* ``xlsx``, with openpyxl's write-only workbook, which streams rows to disk
+  instead of keeping every cell in memory;
+* ``parquet``, one row group per chunk (needs ``pyarrow``; the format is only
+  offered when it is installed).
+
+Rows are read in keyset chunks of ``CHUNK_SIZE`` (``id > last id``), so memory
+stays flat however large the export, and no read cursor is held open while the
+job writes its progress (on SQLite that can deadlock with other writers).
+
+Views build an export with ``Export.from_request``, which also checks that
+the user may see the data; the ``exports.generate`` task (``jobs.tasks``)
+writes the file and the owner is notified when it is ready. Old exports are
+removed by ``manage.py prune_jobs``.
+"""
+import csv
+import importlib.util
+from abc import ABC, abstractmethod
+from datetime import datetime, time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from attendance.models import Attendance
+from events.models import Event, EventRegistration
+from users.models import Club, Department, User
+
+CHUNK_SIZE = 2000
+
+
+class ExportError(Exception):
+    """An export request that is invalid or not allowed; the message is shown to the user."""
+
+
+def chunked(queryset, size=CHUNK_SIZE):
+    """Lists of up to ``size`` objects from ``queryset``, in primary key order."""
+    queryset = queryset.order_by('pk')
+    last = None
+    while True:
+        chunk = list((queryset if last is None else queryset.filter(pk__gt=last))[:size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1].pk
+
+
+# Writers. Columns are (header, type) pairs; type is 'str', 'int' or 'datetime'.
+
+class CsvWriter:
+    extension = 'csv'
+    mode = 'w'
+
+    def __init__(self, handle, columns):
+        self.writer = csv.writer(handle)
+        self.writer.writerow([name for name, _ in columns])
+
+    def write_rows(self, rows):
+        self.writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+
+    def close(self):
+        pass
+
+
+class XlsxWriter:
+    extension = 'xlsx'
+    mode = 'wb'
+
+    def __init__(self, handle, columns):
+        from openpyxl import Workbook
+
+        self.handle = handle
+        self.book = Workbook(write_only=True)
+        self.sheet = self.book.create_sheet('Export')
+        self.sheet.append([name for name, _ in columns])
+
+    def write_rows(self, rows):
+        for row in rows:
+            # Excel has no time zones: write local wall time
+            self.sheet.append([
+                timezone.localtime(value).replace(tzinfo=None) if isinstance(value, datetime) else value
+                for value in row
+            ])
+
+    def close(self):
+        self.book.save(self.handle)
+
+
+class ParquetWriter:
+    extension = 'parquet'
+    mode = 'wb'
+
+    def __init__(self, handle, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {'str': pa.string(), 'int': pa.int64(), 'datetime': pa.timestamp('us', tz=settings.TIME_ZONE)}
+        self.pa = pa
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        self.writer = pq.ParquetWriter(handle, self.schema)
+
+    def write_rows(self, rows):
+        pa = self.pa
+        self.writer.write_table(pa.Table.from_arrays(
+            [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(self.schema)],
+            schema=self.schema,
+        ))
+
+    def close(self):
+        self.writer.close()
+
+
+FORMATS = {'csv': CsvWriter, 'xlsx': XlsxWriter, 'parquet': ParquetWriter}
+
+
+def available_formats():
+    return [name for name in FORMATS if name != 'parquet' or importlib.util.find_spec('pyarrow')]
+
+
+# Permissions
+
+def _roles(user):
+    return user.roles or []
+
+
+def is_staff(user):
+    return bool({'ADMIN', 'SAC_COORDINATOR'} & set(_roles(user)))
+
+
+def can_manage_event(user, event):
+    """Event staff: admins, organizers, and the coordinators and advisor of the event's club."""
+    if is_staff(user) or event.organizers.filter(pk=user.pk).exists():
+        return True
+    club = event.club
+    return bool(club and (club.advisor_id == user.pk or club.coordinators.filter(pk=user.pk).exists()))
+
+
+def can_manage_club(user, club):
+    return is_staff(user) or club.advisor_id == user.pk or club.coordinators.filter(pk=user.pk).exists()
+
+
+def _int(data, name, required=True):
+    value = str(data.get(name) or '').strip()
+    if not value:
+        if required:
+            raise ExportError(f'Missing {name.replace("_", " ")}.')
+        return None
+    if not value.isdigit():
+        raise ExportError(f'Invalid {name.replace("_", " ")}.')
+    return int(value)
+
+
+# Exports
+
+class Export(ABC):
+    kind = None
+    title = None
+    columns = ()
+
+    def __init__(self, **params):
+        self.params = params
+
+    @classmethod
+    @abstractmethod
+    def from_request(cls, user, data):
+        """The export ``user`` asked for with ``data`` (request parameters); raises ExportError."""
+
+    def label(self):
+        return self.title
+
+    def filename(self):
+        return self.kind
+
+    @abstractmethod
+    def queryset(self):
+        """The objects to write, one row each."""
+
+    @abstractmethod
+    def row(self, obj):
+        """The values of ``obj`` in ``columns`` order."""
+
+
+def _student_name(student):
+    return student.get_full_name() or student.username
+
+
+class AttendanceExport(Export):
+    """Attendance of one event (or one of its sessions), or of every event in a date range."""
+    kind = 'attendance'
+    title = 'Attendance'
+    columns = (
+        ('Roll Number', 'str'), ('Full Name', 'str'), ('Department', 'str'), ('Status', 'str'),
+        ('Timestamp', 'datetime'), ('Session', 'str'), ('Reference', 'str'), ('Event', 'str'),
+        ('Event Date', 'datetime'),
+    )
+
+    @classmethod
+    def from_request(cls, user, data):
+        event_id = _int(data, 'event_id', required=False)
+        if event_id:
+            event = Event.objects.select_related('club').filter(id=event_id).first()
+            if event is None:
+                raise ExportError('Event not found.')
+            if not can_manage_event(user, event):
+                raise ExportError("You do not have permission to export this event's attendance.")
+            session_id = _int(data, 'session_id', required=False)
+            if session_id and not event.attendance_sessions.filter(id=session_id).exists():
+                session_id = None
+            return cls(event_id=event.id, session_id=session_id)
+
+        start, end = parse_date(data.get('start') or ''), parse_date(data.get('end') or '')
+        if not start or not end or end < start:
+            raise ExportError('Choose a start and end date.')
+        club_id = _int(data, 'club_id', required=False)
+        department_id = _int(data, 'department_id', required=False)
+        if not is_staff(user):
+            if club_id:
+                club = Club.objects.filter(id=club_id).first()
+                if club is None or not can_manage_club(user, club):
+                    raise ExportError("You do not have permission to export this club's attendance.")
+            elif not (department_id and 'DEPARTMENT_ADMIN' in _roles(user) and user.department_id == department_id):
+                raise ExportError('Choose a club or department you manage.')
+        return cls(start=start.isoformat(), end=end.isoformat(), club_id=club_id, department_id=department_id)
+
+    def label(self):
+        params = self.params
+        if params.get('event_id'):
+            event = Event.objects.filter(id=params['event_id']).values_list('name', flat=True).first()
+            return f"Attendance: {event}" + (f" (session {params['session_id']})" if params.get('session_id') else '')
+        scope = ''
+        if params.get('club_id'):
+            scope = f" - {Club.objects.filter(id=params['club_id']).values_list('name', flat=True).first()}"
+        elif params.get('department_id'):
+            scope = f" - {Department.objects.filter(id=params['department_id']).values_list('name', flat=True).first()}"
+        return f"Attendance {params['start']} to {params['end']}{scope}"
+
+    def filename(self):
+        params = self.params
+        if params.get('event_id'):
+            name = f"attendance_event_{params['event_id']}"
+            return name + (f"_session_{params['session_id']}" if params.get('session_id') else '')
+        return f"attendance_{params['start']}_{params['end']}"
+
+    def queryset(self):
+        params = self.params
+        records = Attendance.objects.all()
+        if params.get('event_id'):
+            records = records.filter(session__event_id=params['event_id'])
+            if params.get('session_id'):
+                records = records.filter(session_id=params['session_id'])
+        else:
+            start = timezone.make_aware(datetime.combine(parse_date(params['start']), time.min))
+            end = timezone.make_aware(datetime.combine(parse_date(params['end']), time.max))
+            records = records.filter(session__event__date_time__range=(start, end))
+            if params.get('club_id'):
+                records = records.filter(session__event__club_id=params['club_id'])
+            if params.get('department_id'):
+                records = records.filter(session__event__department_id=params['department_id'])
+        return records.select_related('student__department', 'session__event')
+
+    def row(self, att):
+        student, session = att.student, att.session
+        return (
+            student.roll_no or '', _student_name(student), student.department.name if student.department else '',
+            att.status, att.timestamp, session.label or str(session.id), att.ref_code,
+            session.event.name, session.event.date_time,
+        )
+
+
+class RegistrationExport(Export):
+    """Every registration of an event (registered, waitlisted and cancelled)."""
+    kind = 'registrations'
+    title = 'Registrations'
+    columns = (
+        ('Student Name', 'str'), ('Roll Number', 'str'), ('Email', 'str'), ('Contact Number', 'str'),
+        ('Department', 'str'), ('Year of Study', 'str'), ('Section', 'str'), ('Status', 'str'),
+        ('Registration Date', 'datetime'), ('Notes', 'str'),
+    )
+
+    @classmethod
+    def from_request(cls, user, data):
+        event = Event.objects.select_related('club').filter(id=_int(data, 'event_id')).first()
+        if event is None:
+            raise ExportError('Event not found.')
+        if not can_manage_event(user, event):
+            raise ExportError('You do not have permission to export event registrations.')
+        return cls(event_id=event.id)
+
+    def label(self):
+        return f"Registrations: {Event.objects.filter(id=self.params['event_id']).values_list('name', flat=True).first()}"
+
+    def filename(self):
+        return f"registrations_event_{self.params['event_id']}"
+
+    def queryset(self):
+        return EventRegistration.objects.filter(event_id=self.params['event_id']).select_related('student__department')
+
+    def row(self, registration):
+        student = registration.student
+        return (
+            _student_name(student), student.roll_no or '', student.email, student.contact_number or '',
+            student.department.name if student.department else '', student.year_of_study or '', student.section or '',
+            registration.get_status_display(), registration.registered_at, registration.notes,
+        )
+
+
+class ClubMemberExport(Export):
+    """A club's member roster."""
+    kind = 'club_members'
+    title = 'Club members'
+    columns = (
+        ('Full Name', 'str'), ('Roll Number', 'str'), ('Email', 'str'), ('Contact Number', 'str'),
+        ('Department', 'str'), ('Year of Study', 'str'), ('Section', 'str'), ('Roles', 'str'),
+    )
+
+    @classmethod
+    def from_request(cls, user, data):
+        club = Club.objects.filter(id=_int(data, 'club_id')).first()
+        if club is None:
+            raise ExportError('Club not found.')
+        if not can_manage_club(user, club):
+            raise ExportError("You do not have permission to export this club's members.")
+        return cls(club_id=club.id)
+
+    def label(self):
+        return f"Members: {Club.objects.filter(id=self.params['club_id']).values_list('name', flat=True).first()}"
+
+    def filename(self):
+        return f"club_{self.params['club_id']}_members"
+
+    def queryset(self):
+        return User.objects.filter(clubs__id=self.params['club_id']).select_related('department')
+
+    def row(self, member):
+        return (
+            _student_name(member), member.roll_no or '', member.email, member.contact_number or '',
+            member.department.name if member.department else '', member.year_of_study or '', member.section or '',
+            ', '.join(member.roles or []),
+        )
+
+
+EXPORTS = {export.kind: export for export in (AttendanceExport, RegistrationExport, ClubMemberExport)}
+
+
+def build_export(user, data):
+    """(export, format) requested by ``user`` with ``data``; raises ExportError."""
+    export_class = EXPORTS.get(data.get('kind'))
+    if export_class is None:
+        raise ExportError('Unknown export.')
+    fmt = data.get('format') or 'csv'
+    if fmt not in available_formats():
+        raise ExportError(f"Choose one of: {', '.join(available_formats())}.")
+    return export_class.from_request(user, data), fmt
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jobs.models import Job, JobStatus
+from jobs.queue import jobs_setting
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Delete finished background jobs older than JOBS['KEEP_DAYS'], with their result files (exports, ZIPs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep jobs finished within this many days (default from settings)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted')
+
+    def handle(self, *args, **options):
+        days = jobs_setting('KEEP_DAYS') if options['days'] is None else options['days']
+        old = Job.objects.filter(
+            status__in=[JobStatus.SUCCEEDED, JobStatus.FAILED], finished_at__lt=timezone.now() - timedelta(days=days),
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{old.count()} job(s) finished more than {days} day(s) ago would be deleted.')
+            return
+        deleted = files = 0
+        while True:
+            batch = list(old.order_by('pk').only('id', 'result_file')[:BATCH_SIZE])
+            if not batch:
+                break
+            for job in batch:
+                if job.result_file:
+                    job.result_file.delete(save=False)
+                    files += 1
+            deleted += Job.objects.filter(pk__in=[job.pk for job in batch]).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} job(s) and {files} result file(s).'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from jobs.queue import jobs_setting
+from jobs.worker import run_workers
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background job workers (see jobs.queue). SIGTERM or Ctrl-C lets each worker "
+        "finish its current job before exiting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Worker processes (default from settings)')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty (e.g. from cron)')
+        parser.add_argument('--poll', type=float, help='Seconds an idle worker waits between looks at the queue')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias holding the queue')
+
+    def handle(self, *args, **options):
+        count = options['workers'] or jobs_setting('WORKERS')
+        self.stdout.write(f"Starting {count} worker(s){' in burst mode' if options['burst'] else ''}.")
+        run_workers(count, burst=options['burst'], poll=options['poll'], using=options['database'])
+        self.stdout.write(self.style.SUCCESS('Workers stopped.'))
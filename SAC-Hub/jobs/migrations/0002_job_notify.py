@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='notify',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,317 @@
+"""
+A database-backed job queue.
+
+Slow work (certificate ZIPs, notification fan-out, exports) is registered as a
+task and enqueued from the view, which returns at once; ``manage.py
+run_workers`` runs the jobs in separate processes::
+
+    @task('certificate.bulk_zip')
+    def bulk_zip(ctx, *, rows, event):
+        for done, row in enumerate(rows, 1):
+            ...
+            ctx.progress(done, len(rows))
+        with ctx.open_result('certificates.zip') as handle:
+            ...
+
+    job = enqueue('certificate.bulk_zip', args={...}, created_by=request.user)
+
+Task arguments are stored as JSON, so pass ids and plain values, not model
+instances. Apps declare their tasks in a ``tasks`` module, imported when the
+jobs app is ready.
+
+Claiming a job is safe with several workers. Where the database supports it
+(PostgreSQL) a worker locks the oldest due row with ``SELECT ... FOR UPDATE
+SKIP LOCKED``, so workers never wait on each other. SQLite has no row locks,
+so there a worker flips the status with a conditional ``UPDATE ... WHERE
+status = 'QUEUED'``; SQLite serialises writes, only one worker sees a changed
+row, and the others try the next candidate.
+
+A job that raises is retried after ``BACKOFF_SECONDS * 2 ** (attempt - 1)``
+seconds (capped at ``MAX_BACKOFF_SECONDS``) until it has had
+``max_attempts`` attempts; ``PermanentError`` fails it at once. A retry runs
+the task again from the top, so a task with side effects that must not repeat
+(notifications, say) records how far it got with ``ctx.checkpoint`` inside
+the transaction that did the work, and skips that much on the next attempt::
+
+    for start in range(ctx.job.progress_done, len(ids), 500):
+        with transaction.atomic():
+            ...
+            ctx.checkpoint(start + 500, len(ids))
+ A running job
+whose worker stopped reporting for ``LOCK_TIMEOUT`` seconds is counted as a
+failed attempt (``requeue_stale``). Result files are written to
+``MEDIA_ROOT/jobs/`` and served to the job's owner by ``jobs.views``;
+``manage.py prune_jobs`` deletes finished jobs, and their files, after
+``KEEP_DAYS``.
+
+Configure with ``JOBS`` in settings.
+"""
+import logging
+import os
+import socket
+import tempfile
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connections, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from sac_project.metrics import JOB_DURATION, JOB_RUNS
+from users.models import Notification
+
+from .models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Processes started by run_workers
+    'WORKERS': 2,
+    # 'spawn' is safe to use from threaded servers; 'fork' starts faster
+    'START_METHOD': 'spawn',
+    # Seconds an idle worker waits before looking for a job again
+    'POLL_SECONDS': 1,
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF_SECONDS': 10,
+    'MAX_BACKOFF_SECONDS': 600,
+    # A running job that has not reported progress for this long is retried
+    'LOCK_TIMEOUT': 600,
+    # Minimum seconds between two progress writes of one job
+    'PROGRESS_SECONDS': 1,
+    # Run jobs in the enqueuing process once the transaction commits (no workers needed)
+    'EAGER': False,
+    # Finished jobs (and their result files) are kept this long
+    'KEEP_DAYS': 7,
+}
+
+# Due jobs a SQLite worker tries to claim before it gives up for this poll
+CLAIM_CANDIDATES = 10
+
+TASKS = {}
+
+
+class PermanentError(Exception):
+    """Raised by a task to fail its job without further attempts."""
+
+
+def jobs_setting(name):
+    return getattr(settings, 'JOBS', {}).get(name, DEFAULTS[name])
+
+
+def task(name):
+    """Register the decorated function as the task ``name``."""
+    def register(func):
+        if TASKS.get(name, func) is not func:
+            raise ValueError(f'Task {name!r} is already registered')
+        TASKS[name] = func
+        return func
+    return register
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(name, *, args=None, label='', created_by=None, notify=False, max_attempts=None, run_after=None,
+            using='default'):
+    """Queue the task ``name`` with keyword ``args`` and return its Job.
+
+    With ``notify``, ``created_by`` gets a notification linking to the job
+    once it has succeeded or failed for good.
+    """
+    if name not in TASKS:
+        raise ValueError(f'Unknown task {name!r}')
+    job = Job.objects.using(using).create(
+        task=name, label=label[:200], args=args or {}, created_by=created_by, notify=notify,
+        max_attempts=max_attempts or jobs_setting('MAX_ATTEMPTS'), run_after=run_after or timezone.now(),
+    )
+    if jobs_setting('EAGER'):
+        transaction.on_commit(lambda: _run_now(job.pk, using), using=using)
+    return job
+
+
+def _run_now(job_id, using):
+    name = worker_name()
+    if _take(Job.objects.using(using).filter(pk=job_id, status=JobStatus.QUEUED), name, timezone.now()):
+        run_job(Job.objects.using(using).get(pk=job_id), name)
+
+
+def _take(queryset, worker, now):
+    return queryset.update(
+        status=JobStatus.RUNNING, locked_by=worker, locked_at=now, started_at=now, attempts=F('attempts') + 1,
+    )
+
+
+def claim(worker, using='default'):
+    """Mark the oldest due job as running for ``worker`` and return it, or None."""
+    now = timezone.now()
+    due = Job.objects.using(using).filter(status=JobStatus.QUEUED, run_after__lte=now).order_by('run_after', 'id')
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            job_id = due.select_for_update(skip_locked=True).values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            _take(Job.objects.using(using).filter(pk=job_id), worker, now)
+    else:
+        for job_id in due.values_list('id', flat=True)[:CLAIM_CANDIDATES]:
+            # Another worker may have taken it since the SELECT
+            if _take(Job.objects.using(using).filter(pk=job_id, status=JobStatus.QUEUED), worker, now):
+                break
+        else:
+            return None
+    return Job.objects.using(using).get(pk=job_id)
+
+
+def backoff(attempts):
+    """Seconds to wait before attempt ``attempts + 1``."""
+    return min(jobs_setting('BACKOFF_SECONDS') * 2 ** max(0, attempts - 1), jobs_setting('MAX_BACKOFF_SECONDS'))
+
+
+def _record_failure(row, job, error, now, retry=True):
+    """Queue ``job`` for another attempt, or fail it for good; ``row`` selects its row."""
+    if retry and job.attempts < job.max_attempts:
+        row.update(
+            status=JobStatus.QUEUED, run_after=now + timedelta(seconds=backoff(job.attempts)),
+            locked_by='', locked_at=None, error=error,
+        )
+        outcome = 'retried'
+    else:
+        if row.update(status=JobStatus.FAILED, finished_at=now, locked_at=None, error=error):
+            _notify_owner(job, f"'{job.label or job.task}' failed: {error.strip().splitlines()[-1]}")
+        outcome = 'failed'
+    JOB_RUNS.inc(task=job.task, outcome=outcome)
+    return outcome
+
+
+def _notify_owner(job, message):
+    if job.notify and job.created_by_id:
+        Notification.objects.using(job._state.db).create(
+            user_id=job.created_by_id, message=f"{message}\n{reverse('jobs:job_detail', args=[job.pk])}",
+        )
+
+
+def requeue_stale(using='default'):
+    """Count jobs whose worker went silent for LOCK_TIMEOUT as failed attempts; returns how many."""
+    now = timezone.now()
+    stale = Job.objects.using(using).filter(
+        status=JobStatus.RUNNING, locked_at__lt=now - timedelta(seconds=jobs_setting('LOCK_TIMEOUT')),
+    )
+    jobs = list(stale.only('id', 'task', 'label', 'attempts', 'max_attempts', 'notify', 'created_by'))
+    for job in jobs:
+        # Still filtered on the lock, in case the worker finished in the meantime
+        _record_failure(stale.filter(pk=job.pk), job, 'The worker stopped while running this job.', now)
+    return len(jobs)
+
+
+class JobContext:
+    """What a task gets as its first argument: progress reporting and the result file."""
+
+    def __init__(self, job, worker):
+        self.job = job
+        self.worker = worker
+        self._reported = 0.0
+
+    @property
+    def _mine(self):
+        return Job.objects.using(self.job._state.db).filter(pk=self.job.pk, locked_by=self.worker)
+
+    def progress(self, done, total=None, message=''):
+        """Record progress; writes at most once per PROGRESS_SECONDS, and always at the end."""
+        job = self.job
+        job.progress_done = done
+        if total is not None:
+            job.progress_total = total
+        if message:
+            job.progress_message = message[:255]
+        now = time.monotonic()
+        if now - self._reported < jobs_setting('PROGRESS_SECONDS') and done != job.progress_total:
+            return
+        self._save_progress()
+
+    def checkpoint(self, done, total=None, message=''):
+        """Record progress now; a retry of the job starts with ``job.progress_done`` at ``done``.
+
+        Call it inside the transaction that did the work up to ``done``, so
+        the two are committed (or rolled back) together. Tasks that resume
+        this way report progress only through ``checkpoint``.
+        """
+        self.job.progress_done = done
+        if total is not None:
+            self.job.progress_total = total
+        if message:
+            self.job.progress_message = message[:255]
+        if not self._save_progress():
+            # The job was requeued and may be running elsewhere: roll this work back
+            raise PermanentError('This worker no longer holds the job.')
+
+    def _save_progress(self):
+        job = self.job
+        self._reported = time.monotonic()
+        # Also the heartbeat that keeps requeue_stale away from a long job
+        return self._mine.update(
+            progress_done=job.progress_done, progress_total=job.progress_total,
+            progress_message=job.progress_message, locked_at=timezone.now(),
+        )
+
+    @contextmanager
+    def open_result(self, filename, mode='wb'):
+        """Write the job's result file through a temporary file, kept only if the block succeeds."""
+        text = 'b' not in mode
+        with tempfile.TemporaryFile(
+            'w+' if text else 'w+b', newline='' if text else None, encoding='utf-8' if text else None,
+        ) as handle:
+            yield handle
+            handle.seek(0)
+            filename = get_valid_filename(filename)
+            self.job.result_file.save(filename, File(handle, name=filename), save=False)
+
+
+def run_job(job, worker):
+    """Run a claimed job and record its outcome."""
+    func = TASKS.get(job.task)
+    context = JobContext(job, worker)
+    try:
+        if func is None:
+            raise PermanentError(f'Unknown task {job.task!r}')
+        with JOB_DURATION.time(task=job.task):
+            result = func(context, **job.args)
+    except Exception as exc:
+        permanent = isinstance(exc, PermanentError)
+        if permanent:
+            logger.warning('Job %s (%s) failed: %s', job.pk, job.task, exc)
+            error = str(exc)
+        else:
+            logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.task, job.attempts)
+            error = traceback.format_exc(limit=20)
+        if job.result_file:
+            job.result_file.delete(save=False)
+        _record_failure(context._mine, job, error, timezone.now(), retry=not permanent)
+        return False
+    succeeded = context._mine.update(
+        status=JobStatus.SUCCEEDED, result=result, result_file=job.result_file.name or '',
+        progress_done=job.progress_total or job.progress_done, progress_message=job.progress_message,
+        finished_at=timezone.now(), locked_at=None, error='',
+    )
+    JOB_RUNS.inc(task=job.task, outcome='succeeded')
+    if succeeded:
+        _notify_owner(job, f"'{job.label or job.task}' is ready" + (' to download.' if job.result_file else '.'))
+    return True
+
+
+def run_pending(worker=None, limit=None, using='default'):
+    """Run due jobs in this process until none is left (or ``limit`` ran); returns the count."""
+    worker = worker or worker_name()
+    count = 0
+    while limit is None or count < limit:
+        job = claim(worker, using)
+        if job is None:
+            break
+        run_job(job, worker)
+        count += 1
+    return count
@@ -0,0 +1,24 @@
+"""Background tasks of the jobs app: the export center (see jobs.exports)."""
+from .exports import CHUNK_SIZE, EXPORTS, FORMATS, available_formats, chunked
+from .queue import PermanentError, task
+
+
+@task('exports.generate')
+def generate_export(ctx, *, kind, format, params):
+    if kind not in EXPORTS:
+        raise PermanentError(f'Unknown export {kind!r}.')
+    if format not in available_formats():
+        raise PermanentError(f'The {format} format is not available on this server.')
+    export = EXPORTS[kind](**params)
+    writer_class = FORMATS[format]
+    total = export.queryset().count()
+    done = 0
+    ctx.progress(0, total)
+    with ctx.open_result(f'{export.filename()}.{writer_class.extension}', writer_class.mode) as handle:
+        writer = writer_class(handle, export.columns)
+        for chunk in chunked(export.queryset(), CHUNK_SIZE):
+            writer.write_rows([export.row(obj) for obj in chunk])
+            done += len(chunk)
+            ctx.progress(done, max(total, done))
+        writer.close()
+    return {'rows': done, 'format': format}
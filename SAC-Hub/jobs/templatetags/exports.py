@@ -0,0 +1,19 @@
+from django import template
+
+from ..exports import available_formats
+
+register = template.Library()
+
+
+@register.inclusion_tag('jobs/export_form.html', takes_context=True)
+def export_form(context, kind, label='Export', **params):
+    """A small form that queues a ``kind`` export (see jobs.exports) with ``params``, in a chosen format."""
+    request = context.get('request')
+    return {
+        'kind': kind,
+        'label': label,
+        'params': params,
+        'formats': available_formats(),
+        'next': request.get_full_path() if request else '',
+        'csrf_token': context.get('csrf_token'),
+    }
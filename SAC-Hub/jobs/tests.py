@@ -0,0 +1,243 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import Attendance, AttendanceSession
+from events.models import Event, EventRegistration
+from sac_project.testing import TempMediaMixin
+from users.models import Club, Notification, User
+from .models import Job, JobStatus
+from .queue import PermanentError, claim, enqueue, requeue_stale, run_pending, task
+
+CALLS = []
+
+
+@task('tests.count_to')
+def count_to(ctx, *, n):
+    with ctx.open_result('numbers.txt', 'w') as handle:
+        for i in range(1, n + 1):
+            handle.write(f'{i}\n')
+            ctx.progress(i, n)
+    return {'last': n}
+
+
+@task('tests.flaky')
+def flaky(ctx, *, permanent=False):
+    CALLS.append(ctx.job.attempts)
+    if permanent:
+        raise PermanentError('Bad input')
+    raise RuntimeError('Try again')
+
+
+@task('tests.resumable')
+def resumable(ctx, *, user_ids, crash_after=None, steal_at=None):
+    for position in range(ctx.job.progress_done, len(user_ids)):
+        if position == steal_at:
+            # requeue_stale handed the job to another worker meanwhile
+            Job.objects.filter(pk=ctx.job.pk).update(locked_by='other-worker')
+        with transaction.atomic():
+            Notification.objects.create(user_id=user_ids[position], message='resumable')
+            ctx.checkpoint(position + 1, len(user_ids))
+        if position == crash_after and ctx.job.attempts == 1:
+            raise RuntimeError('Worker crashed')
+    return {'sent': len(user_ids)}
+
+
+class JobQueueTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        CALLS.clear()
+
+    def test_job_runs_with_progress_and_result_file(self):
+        job = enqueue('tests.count_to', args={'n': 5})
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.SUCCEEDED)
+        self.assertEqual(job.result, {'last': 5})
+        self.assertEqual((job.progress_done, job.progress_total, job.percent), (5, 5, 100))
+        with job.result_file.open('r') as handle:
+            self.assertEqual(handle.read().split(), ['1', '2', '3', '4', '5'])
+
+    def test_failed_attempts_back_off_then_fail(self):
+        job = enqueue('tests.flaky', max_attempts=2)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (JobStatus.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        # Not due yet: nothing runs
+        self.assertEqual(run_pending(), 0)
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (JobStatus.FAILED, 2))
+        self.assertIn('Try again', job.error)
+        self.assertEqual(CALLS, [1, 2])
+
+    def test_permanent_error_is_not_retried(self):
+        job = enqueue('tests.flaky', args={'permanent': True})
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (JobStatus.FAILED, 1, 'Bad input'))
+
+    def test_claim_takes_each_job_once(self):
+        first = enqueue('tests.count_to', args={'n': 1})
+        second = enqueue('tests.count_to', args={'n': 1})
+        self.assertEqual(claim('worker-a').pk, first.pk)
+        self.assertEqual(claim('worker-b').pk, second.pk)
+        self.assertIsNone(claim('worker-c'))
+
+    def test_stale_job_is_retried(self):
+        job = enqueue('tests.count_to', args={'n': 1})
+        claim('dead-worker')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (JobStatus.QUEUED, ''))
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertEqual(run_pending(), 1)
+
+    def test_retry_resumes_after_the_last_checkpoint(self):
+        user_ids = [User.objects.create(username=f'user{number}').pk for number in range(4)]
+        job = enqueue('tests.resumable', args={'user_ids': user_ids, 'crash_after': 1})
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress_done), (JobStatus.QUEUED, 2))
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.SUCCEEDED)
+        self.assertEqual(
+            sorted(Notification.objects.filter(message='resumable').values_list('user_id', flat=True)), user_ids,
+        )
+
+    def test_checkpoint_rolls_back_work_of_a_job_taken_over(self):
+        user_ids = [User.objects.create(username=f'user{number}').pk for number in range(3)]
+        job = enqueue('tests.resumable', args={'user_ids': user_ids, 'steal_at': 1})
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            run_pending()
+        job.refresh_from_db()
+        # The other worker owns the job now; this one kept only what it checkpointed
+        self.assertEqual((job.status, job.locked_by, job.progress_done), (JobStatus.RUNNING, 'other-worker', 1))
+        self.assertEqual(
+            list(Notification.objects.filter(message='resumable').values_list('user_id', flat=True)), user_ids[:1],
+        )
+
+    def test_attendance_export_is_queued_and_downloaded(self):
+        admin = User.objects.create(username='admin1', roles=['ADMIN'])
+        student = User.objects.create(username='21CS0001', roll_no='21CS0001', roles=['STUDENT'])
+        event = Event.objects.create(name='Hackathon', event_type='Technical', venue='Lab', date_time=timezone.now())
+        session = AttendanceSession.objects.create(event=event, label='Day 1')
+        Attendance.objects.create(session=session, student=student, status='PRESENT')
+        self.client.force_login(admin)
+
+        # The report posts one form per session, and the manage page one for the event, to the export center
+        form = f'<form method="post" action="{reverse("jobs:request_export")}"'
+        report = self.client.get(reverse('attendance_report', args=[event.id]))
+        self.assertContains(report, form)
+        self.assertContains(report, f'name="session_id" value="{session.id}"')
+        manage = self.client.get(reverse('attendance_manage', args=[event.id]))
+        self.assertContains(manage, form, count=1)
+        self.assertContains(manage, f'name="event_id" value="{event.id}"')
+        self.assertNotContains(manage, reverse('attendance_export', args=[event.id]))
+
+        url = reverse('attendance_export', args=[event.id])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertFalse(Job.objects.exists())
+
+        response = self.client.post(url, {'session_id': session.id})
+        job = Job.objects.get()
+        self.assertEqual(job.args['params']['session_id'], session.id)
+        self.assertRedirects(response, reverse('jobs:job_detail', args=[job.id]))
+        self.assertEqual(self.client.get(reverse('jobs:job_status', args=[job.id])).json()['status'], 'QUEUED')
+
+        run_pending()
+        state = self.client.get(reverse('jobs:job_status', args=[job.id])).json()
+        self.assertEqual(state['status'], 'SUCCEEDED')
+        response = self.client.get(state['download_url'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('21CS0001,'))
+
+        # Other users cannot see the job
+        self.client.force_login(student)
+        self.assertEqual(self.client.get(reverse('jobs:job_status', args=[job.id])).status_code, 404)
+
+
+class ExportTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.coordinator = User.objects.create(username='coord', roles=['STUDENT'])
+        self.club = Club.objects.create(name='Robotics')
+        self.club.coordinators.add(self.coordinator)
+        self.event = Event.objects.create(
+            name='Expo', event_type='Technical', venue='Hall', date_time=timezone.now(), club=self.club,
+        )
+        self.students = [
+            User.objects.create(username=f'21CS{n:04}', roll_no=f'21CS{n:04}', first_name=f'Student {n}', roles=['STUDENT'])
+            for n in range(1, 4)
+        ]
+        for student in self.students:
+            EventRegistration.objects.create(event=self.event, student=student)
+            student.clubs.add(self.club)
+
+    def export(self, **data):
+        return self.client.post(reverse('jobs:request_export'), data)
+
+    def test_registrations_export_as_xlsx(self):
+        from openpyxl import load_workbook
+
+        self.client.force_login(self.coordinator)
+        response = self.export(kind='registrations', event_id=self.event.id, format='xlsx')
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('jobs:job_detail', args=[job.id]), fetch_redirect_response=False)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (JobStatus.SUCCEEDED, {'rows': 3, 'format': 'xlsx'}))
+        self.assertTrue(job.result_file.name.endswith('.xlsx'))
+        with job.result_file.open('rb') as handle:
+            rows = list(load_workbook(handle, read_only=True).active.values)
+        self.assertEqual(rows[0][:2], ('Student Name', 'Roll Number'))
+        self.assertEqual(sorted(row[1] for row in rows[1:]), ['21CS0001', '21CS0002', '21CS0003'])
+        # The owner is told the file is ready
+        notification = Notification.objects.get(user=self.coordinator, message__contains='is ready')
+        self.assertIn(reverse('jobs:job_detail', args=[job.id]), notification.message)
+
+    def test_club_roster_needs_permission(self):
+        self.client.force_login(self.students[0])
+        response = self.export(kind='club_members', club_id=self.club.id, format='csv', next='/clubs/')
+        self.assertRedirects(response, '/clubs/', fetch_redirect_response=False)
+        self.assertFalse(Job.objects.exists())
+
+        self.client.force_login(self.coordinator)
+        self.export(kind='club_members', club_id=self.club.id, format='csv')
+        run_pending()
+        job = Job.objects.get()
+        with job.result_file.open('r') as handle:
+            lines = handle.read().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('Full Name,Roll Number'))
+
+    def test_unknown_format_is_rejected(self):
+        self.client.force_login(self.coordinator)
+        self.export(kind='registrations', event_id=self.event.id, format='pdf')
+        self.assertFalse(Job.objects.exists())
+
+    def test_prune_jobs_deletes_old_jobs_and_files(self):
+        old = enqueue('tests.count_to', args={'n': 1})
+        recent = enqueue('tests.count_to', args={'n': 1})
+        run_pending()
+        Job.objects.filter(pk=old.pk).update(finished_at=timezone.now() - timedelta(days=30))
+        old.refresh_from_db()
+        storage, name = old.result_file.storage, old.result_file.name
+        call_command('prune_jobs', days=7, stdout=StringIO())
+        self.assertEqual(list(Job.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertFalse(storage.exists(name))
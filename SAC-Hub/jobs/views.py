@@ -0,0 +1,120 @@
+import os
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
+
+from users.models import Club, Department
+from .exports import ExportError, available_formats, build_export, is_staff
+from .models import Job, JobStatus
+from .queue import enqueue
+
+# Jobs shown on the list page
+LIST_LIMIT = 50
+
+
+def _jobs_for(user):
+    """Jobs ``user`` may see: their own, or every job for admins."""
+    if 'ADMIN' in (user.roles or []):
+        return Job.objects.all()
+    return Job.objects.filter(created_by=user)
+
+
+def job_state(job):
+    """The JSON the status endpoint returns (and the page renders from)."""
+    return {
+        'id': job.id,
+        'label': job.label or job.task,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'done': job.progress_done,
+        'total': job.progress_total,
+        'percent': job.percent,
+        'message': job.progress_message,
+        'attempts': job.attempts,
+        'result': job.result,
+        'download_url': (
+            reverse('jobs:job_download', args=[job.id]) if job.result_file and job.status == JobStatus.SUCCEEDED else None
+        ),
+        'error': job.error.strip().splitlines()[-1] if job.error else '',
+    }
+
+
+@login_required
+def job_list(request):
+    jobs = _jobs_for(request.user).select_related('created_by')[:LIST_LIMIT]
+    return render(request, 'jobs/job_list.html', {'jobs': jobs})
+
+
+@login_required
+def job_detail(request, job_id):
+    job = get_object_or_404(_jobs_for(request.user), id=job_id)
+    return render(request, 'jobs/job_detail.html', {'job': job, 'state': job_state(job)})
+
+
+@login_required
+@require_GET
+def job_status(request, job_id):
+    job = get_object_or_404(_jobs_for(request.user), id=job_id)
+    return JsonResponse(job_state(job))
+
+
+@login_required
+def job_download(request, job_id):
+    job = get_object_or_404(_jobs_for(request.user), id=job_id)
+    if job.status != JobStatus.SUCCEEDED or not job.result_file:
+        messages.error(request, 'This job has no file to download yet.')
+        return redirect('jobs:job_detail', job_id=job.id)
+    try:
+        handle = job.result_file.open('rb')
+    except FileNotFoundError:
+        raise Http404('The result file has been removed.')
+    return FileResponse(handle, as_attachment=True, filename=os.path.basename(job.result_file.name))
+
+
+def start_export(request, data):
+    """Queue the export described by ``data`` for ``request.user``; returns the Job, or None after an error message."""
+    try:
+        export, fmt = build_export(request.user, data)
+    except ExportError as exc:
+        messages.error(request, str(exc))
+        return None
+    return enqueue(
+        'exports.generate', args={'kind': export.kind, 'format': fmt, 'params': export.params},
+        label=f'{export.label()} ({fmt.upper()})', created_by=request.user, notify=True,
+    )
+
+
+@login_required
+def export_center(request):
+    """The user's exports, and the form for attendance over a date range (e.g. a semester)."""
+    user = request.user
+    if is_staff(user):
+        clubs, departments = Club.objects.order_by('name'), Department.objects.order_by('name')
+    else:
+        clubs = (user.coordinated_clubs.all() | user.advised_clubs.all()).distinct().order_by('name')
+        departments = Department.objects.filter(
+            id=user.department_id if 'DEPARTMENT_ADMIN' in (user.roles or []) else None
+        )
+    context = {
+        'exports': Job.objects.filter(created_by=user, task='exports.generate')[:LIST_LIMIT],
+        'clubs': clubs,
+        'departments': departments,
+        'formats': available_formats(),
+        'can_export_range': is_staff(user) or clubs.exists() or departments.exists(),
+    }
+    return render(request, 'jobs/export_center.html', context)
+
+
+@login_required
+@require_POST
+def request_export(request):
+    job = start_export(request, request.POST)
+    if job is None:
+        return redirect(request.POST.get('next') or 'jobs:export_center')
+    messages.success(request, "Your export has started. You will get a notification when it is ready.")
+    return redirect('jobs:job_detail', job_id=job.id)
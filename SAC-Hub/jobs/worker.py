@@ -0,0 +1,93 @@
+"""
+Worker processes for the job queue (``manage.py run_workers``).
+
+Each worker claims one due job at a time (``jobs.queue.claim``), runs it, and
+sleeps ``POLL_SECONDS`` when the queue is empty. SIGTERM and SIGINT let the
+current job finish before the worker exits, so a deploy that stops workers
+gracefully never leaves half-run jobs; a worker that is killed outright is
+detected by ``requeue_stale`` once its job's lock times out.
+"""
+import logging
+import signal
+import time
+from multiprocessing import get_context
+
+import django
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two looks for jobs abandoned by a dead worker
+STALE_CHECK_SECONDS = 60
+
+
+class Worker:
+    def __init__(self, burst=False, poll=None, using='default'):
+        from .queue import jobs_setting, worker_name
+
+        self.burst = burst
+        self.poll = jobs_setting('POLL_SECONDS') if poll is None else poll
+        self.using = using
+        self.name = worker_name()
+        self.stopping = False
+        self.processed = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        """Run jobs until stopped; in burst mode, until the queue is empty."""
+        from .queue import claim, requeue_stale, run_job
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info('Worker %s started', self.name)
+        checked = 0.0
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() - checked > STALE_CHECK_SECONDS:
+                requeue_stale(self.using)
+                checked = time.monotonic()
+            job = claim(self.name, self.using)
+            if job is None:
+                if self.burst:
+                    break
+                time.sleep(self.poll)
+                continue
+            run_job(job, self.name)
+            self.processed += 1
+        logger.info('Worker %s stopped after %s job(s)', self.name, self.processed)
+        return self.processed
+
+
+def _work(burst, poll, using):
+    # A spawned process imports this module before Django is set up, which is
+    # why the queue (and its models) is only imported inside Worker
+    django.setup()
+    Worker(burst=burst, poll=poll, using=using).run()
+
+
+def run_workers(count, burst=False, poll=None, using='default'):
+    """Run ``count`` worker processes and wait for them; a single worker runs in this process."""
+    if count <= 1:
+        Worker(burst=burst, poll=poll, using=using).run()
+        return
+    from .queue import jobs_setting
+
+    context = get_context(jobs_setting('START_METHOD'))
+    processes = [
+        context.Process(target=_work, args=(burst, poll, using), name=f'jobs-worker-{number}')
+        for number in range(count)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()  # SIGTERM: finish the current job, then exit
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
@@ -1,10 +1,12 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from users.models import User, Club, Role, Department
+from users.directory import search_students
+from . import instrumentation, profiling
 import json
 
 def check_admin_permission(user):
@@ -201,32 +203,24 @@ def get_students_ajax(request):
         return JsonResponse({'error': 'Permission denied'}, status=403)
     
     search_term = request.GET.get('q', '')
-    # Filter students without club coordinator role (SQLite-compatible)
-    all_users = User.objects.all()
-    students = [
-        user for user in all_users 
-        if 'STUDENT' in (user.roles or []) and 'CLUB_COORDINATOR' not in (user.roles or [])
-    ]
-    
-    if search_term:
-        # Apply search filter to the Python-filtered list
-        students = [
-            student for student in students
-            if (search_term.lower() in (student.first_name or '').lower() or
-                search_term.lower() in (student.last_name or '').lower() or
-                search_term.lower() in (student.roll_no or '').lower())
+    if search_term.strip():
+        # Students without the club coordinator role, best prefix matches first
+        students_data = search_students(search_term, limit=20, exclude_coordinators=True)
+    else:
+        students = (
+            User.objects.filter(search_keys__is_student=True, search_keys__is_club_coordinator=False)
+            .distinct().order_by('pk')[:20]
+        )
+        students_data = [
+            {
+                'id': student.id,
+                'name': student.get_full_name(),
+                'roll_no': student.roll_no,
+                'email': student.email
+            }
+            for student in students
         ]
     
-    students_data = [
-        {
-            'id': student.id,
-            'name': student.get_full_name(),
-            'roll_no': student.roll_no,
-            'email': student.email
-        }
-        for student in students[:20]  # Limit to 20 results
-    ]
-    
     return JsonResponse({'students': students_data})
 
 @login_required
@@ -238,9 +232,19 @@ def event_approval_list(request):
         return redirect('student-dashboard')
     
     from events.models import Event
+    from events.conflicts import conflict_report
     
     # Get events by status
-    pending_events = Event.objects.filter(status='PENDING').order_by('-created_at')
+    pending_events = list(Event.objects.filter(status='PENDING').select_related('club', 'created_by').order_by('-created_at'))
+    
+    # Clashes with other pending or approved events, from one sweep over the queue's date range
+    if pending_events:
+        conflicts = conflict_report(
+            min(event.date_time for event in pending_events), max(event.ends_at for event in pending_events)
+        ).by_event()
+        for event in pending_events:
+            event.conflicts = conflicts.get(event.id, [])
+    
     recent_approvals = Event.objects.filter(status__in=['APPROVED', 'REJECTED']).order_by('-updated_at')[:10]
     
     context = {
@@ -286,4 +290,56 @@ def event_approve_reject(request):
     except Exception as e:
         messages.error(request, f'Error processing approval: {str(e)}')
     
-    return redirect('event_approval_list')
\ No newline at end of file
+    return redirect('event_approval_list')
+
+PERFORMANCE_SORTS = {
+    'total_ms': 'Total time',
+    'max_ms': 'Slowest request',
+    'avg_queries': 'Avg. queries',
+    'max_duplicates': 'Duplicate queries',
+}
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def performance_overview(request):
+    """Staff page listing the slowest and chattiest views seen by this process"""
+    if not (request.user.is_staff or 'ADMIN' in (request.user.roles or [])):
+        messages.error(request, 'You do not have permission to view performance data.')
+        return redirect('student-dashboard')
+    
+    if request.method == 'POST':
+        instrumentation.clear_records()
+        messages.success(request, 'Collected request data cleared.')
+        return redirect('performance_overview')
+    
+    sort = request.GET.get('sort')
+    if sort not in PERFORMANCE_SORTS:
+        sort = 'total_ms'
+    records = instrumentation.recent_records()
+    
+    context = {
+        'offenders': instrumentation.top_offenders(records, order_by=sort),
+        'slowest_requests': sorted(records, key=lambda record: record['wall_ms'], reverse=True)[:10],
+        'record_count': len(records),
+        'buffer_size': instrumentation.instrumentation_setting('BUFFER_SIZE'),
+        'enabled': instrumentation.instrumentation_setting('ENABLED'),
+        'sort': sort,
+        'sorts': PERFORMANCE_SORTS,
+        'profiling_enabled': profiling.profiling_setting('ENABLED'),
+        'profiles': profiling.list_profiles()[:20],
+    }
+    
+    return render(request, 'admin/performance.html', context)
+
+@login_required
+@require_http_methods(['GET'])
+def download_profile(request, filename):
+    """Download a stored request profile (.prof or collapsed stacks)"""
+    if not profiling.can_profile(request.user):
+        messages.error(request, 'You do not have permission to download profiles.')
+        return redirect('student-dashboard')
+    
+    path = profiling.profile_dir() / filename
+    if '/' in filename or not filename.endswith(profiling.SUFFIXES) or not path.is_file():
+        raise Http404('Profile not found')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
\ No newline at end of file
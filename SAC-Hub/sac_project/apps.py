@@ -4,4 +4,10 @@ from django.apps import AppConfig
 class SacProjectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sac_project'
-    verbose_name = 'SAC Project'
\ No newline at end of file
+    verbose_name = 'SAC Project'
+
+    def ready(self):
+        from . import images, instrumentation, metrics
+        instrumentation.install()
+        metrics.install()
+        images.install()
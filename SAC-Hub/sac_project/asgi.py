@@ -3,6 +3,10 @@ ASGI config for sac_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests for the notification stream are answered by ``sse_application``,
+which holds idle Server-Sent Events connections on the event loop alone;
+everything else goes through Django's regular ASGI handler.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +17,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sac_project.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.urls import reverse  # noqa: E402  (needs configured settings)
+
+from sac_project.stream_views import sse_application  # noqa: E402
+
+_stream_path = None
+
+
+async def application(scope, receive, send):
+    global _stream_path
+    if scope["type"] == "http":
+        if _stream_path is None:
+            _stream_path = reverse("notifications_stream")
+        if scope["path"] == _stream_path:
+            await sse_application(scope, receive, send)
+            return
+    await django_application(scope, receive, send)
@@ -4,27 +4,31 @@ from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
-import csv
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from datetime import datetime, timedelta
-import calendar
 import json
 from django.utils import timezone
 
 from events.models import Event
 from events.models import EventRegistration
+from events.registration import register as register_for_event
 from attendance.models import Attendance, AttendanceSession
+from calendar_app import engine as calendar_engine
+from calendar_app.feeds import user_token as calendar_feed_token
 from calendar_app.models import CalendarEntry
 from users.models import User, Club, Department
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from jobs.queue import enqueue
+from jobs.views import start_export
 
 def calendar_view(request):
     """Display calendar view with approved events - accessible to everyone"""
     # Get month and year from request
-    month = int(request.GET.get('month', timezone.localtime(timezone.now()).month))
-    year = int(request.GET.get('year', timezone.localtime(timezone.now()).year))
+    today = timezone.localdate()
+    month = int(request.GET.get('month', today.month))
+    year = int(request.GET.get('year', today.year))
     
     # Create date objects
     current_month = datetime(year, month, 1)
@@ -40,72 +44,39 @@ def calendar_view(request):
     else:
         next_month = datetime(year, month + 1, 1)
     
-    # Get approved events for the month (visible to everyone)
-    month_start = current_month
-    month_end = datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
-    
-    approved_events = Event.objects.filter(
-        date_time__range=[month_start, month_end],
-        status='APPROVED'
-    ).select_related('club', 'department').prefetch_related('organizers')
-    
-    # Add registration counts for authenticated users
-    if request.user.is_authenticated:
-        for event in approved_events:
-            event.registration_count = EventRegistration.objects.filter(event=event).count()
-            event.user_registered = EventRegistration.objects.filter(event=event, student=request.user).exists()
-    
-    # Create calendar structure
-    cal = calendar.monthcalendar(year, month)
-    calendar_weeks = []
-    
-    for week in cal:
-        calendar_week = []
-        for day in week:
-            if day == 0:
-                # Previous/next month day
-                calendar_week.append({
-                    'day': '',
-                    'is_other_month': True,
-                    'is_today': False,
-                    'events': []
-                })
-            else:
-                day_date = datetime(year, month, day)
-                is_today = day_date.date() == timezone.localtime(timezone.now()).date()
-                
-                # Get events for this day
-                day_events = [event for event in approved_events 
-                             if event.date_time.day == day]
-                
-                calendar_week.append({
-                    'day': day,
-                    'is_other_month': False,
-                    'is_today': is_today,
-                    'events': day_events
-                })
-        calendar_weeks.append(calendar_week)
+    # Month grid of approved events (visible to everyone), shared by all viewers
+    grid = calendar_engine.month_grid(year, month, 'public')
     
     # Get upcoming events for the next 30 days (for sidebar)
-    upcoming_events = Event.objects.filter(
-        date_time__gte=timezone.now(),
-        date_time__lt=timezone.now() + timedelta(days=30),
+    now = timezone.now()
+    upcoming_events = list(Event.objects.filter(
+        date_time__gte=now,
+        date_time__lt=now + timedelta(days=30),
         status='APPROVED'
-    ).select_related('club').order_by('date_time')[:10]
+    ).select_related('club').order_by('date_time')[:10])
     
-    # Add registration info to upcoming events
+    # Only the viewer's registrations are worked out per request, in one query
+    registered_ids = set()
     if request.user.is_authenticated:
+        registered_ids = set(EventRegistration.objects.filter(
+            student=request.user,
+            event_id__in=calendar_engine.month_event_ids(grid) + [event.id for event in upcoming_events],
+        ).values_list('event_id', flat=True))
         for event in upcoming_events:
-            event.registration_count = EventRegistration.objects.filter(event=event).count()
-            event.user_registered = EventRegistration.objects.filter(event=event, student=request.user).exists()
+            event.registration_count = event.registered_count
+            event.user_registered = event.id in registered_ids
     
     context = {
         'current_month': current_month,
         'prev_month': prev_month,
         'next_month': next_month,
-        'calendar_weeks': calendar_weeks,
+        'calendar_weeks': calendar_engine.overlay(grid['weeks'], year, month, registered_ids, today),
         'upcoming_events': upcoming_events,
-        'total_events_this_month': approved_events.count(),
+        'total_events_this_month': grid['total'],
+        'feed_url': request.build_absolute_uri(reverse('calendar_feed')),
+        'personal_feed_url': request.build_absolute_uri(
+            reverse('calendar_feed_user', args=[calendar_feed_token(request.user)])
+        ) if request.user.is_authenticated else None,
     }
     return render(request, 'calendar/calendar_view.html', context)
 
@@ -235,8 +206,8 @@ def attendance_manage(request, event_id):
             if session.close_at and now > session.close_at:
                 messages.error(request, 'Registration window closed for this attendance session.')
                 return redirect('attendance_manage', event_id=event.id)
-            # Create EventRegistration if not exists
-            reg, created = EventRegistration.objects.get_or_create(event=event, student=student, defaults={'status': 'REGISTERED'})
+            # Create EventRegistration if not exists; the student is here, so capacity does not apply
+            reg, created = register_for_event(event, student, override_capacity=True)
             if created:
                 messages.success(request, 'Student registered for the event.')
             else:
@@ -295,8 +266,9 @@ def attendance_manage(request, event_id):
 
 
 @login_required
+@require_POST
 def attendance_export(request, event_id):
-    """Export attendance CSV for an event/session."""
+    """Queue an attendance export for an event/session."""
     event = get_object_or_404(Event, id=event_id)
     # Permission as attendance_manage: organizers, club coordinators, club advisor, or admin
     user_roles = request.user.roles if isinstance(request.user.roles, list) else []
@@ -306,44 +278,14 @@ def attendance_export(request, event_id):
     if not (is_organizer or is_club_coordinator or is_club_advisor or 'ADMIN' in user_roles):
         return HttpResponse('Not authorized', status=403)
 
-    session_id = request.GET.get('session_id')
-    session = None
-    if session_id:
-        try:
-            session = event.attendance_sessions.get(id=session_id)
-        except AttendanceSession.DoesNotExist:
-            session = None
-
-    if session:
-        attendances = session.records.select_related('student').all()
-        filename = f"attendance_event_{event.id}_session_{session.id}.csv"
-    else:
-        attendances = Attendance.objects.filter(session__event=event).select_related('student', 'session')
-        filename = f"attendance_event_{event.id}.csv"
-
-    # Build CSV
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Roll Number', 'Full Name', 'Department', 'Status', 'Timestamp', 'Session', 'Reference'])
-    for att in attendances:
-        student = att.student
-        roll = getattr(student, 'roll_no', '')
-        # Call get_full_name() if it's a callable, otherwise fall back to first/last name
-        full_name_attr = getattr(student, 'get_full_name', None)
-        if callable(full_name_attr):
-            full = full_name_attr()
-        else:
-            full = f"{student.first_name} {student.last_name}"
-        dept = student.department.name if getattr(student, 'department', None) else ''
-        status = att.status
-        ts = att.timestamp.isoformat() if getattr(att, 'timestamp', None) else ''
-        sess = att.session.label if getattr(att, 'session', None) and att.session.label else (getattr(att, 'session', None) and str(att.session.id) or '')
-        ref = getattr(att, 'ref_code', '')
-        writer.writerow([roll, full, dept, status, ts, sess, ref])
-
-    return response
+    # Written by a background job (see jobs.exports), downloaded from its page
+    job = start_export(request, {
+        'kind': 'attendance', 'event_id': event.id, 'session_id': request.POST.get('session_id'),
+        'format': request.POST.get('format', 'csv'),
+    })
+    if job is None:
+        return redirect('attendance_manage', event_id=event.id)
+    return redirect('jobs:job_detail', job_id=job.id)
 
 
 def attendance_verify(request):
@@ -480,6 +422,8 @@ def notifications_list(request):
         'unread_count': unread_count,
         'read_count': read_count,
         'can_send_notifications': can_send,
+        # The live stream resumes after the newest notification rendered here
+        'stream_cursor': user.notifications.order_by('-id').values_list('id', flat=True).first() or 0,
     }
     return render(request, 'notifications/notifications_list.html', context)
 
@@ -514,7 +458,7 @@ def reports_dashboard(request):
 @login_required
 def send_notification(request):
     """Send notifications to user groups based on role permissions"""
-    from users.models import Notification, Department
+    from users.models import Department
     from django.db.models import Q
     
     user = request.user
@@ -706,16 +650,20 @@ def send_notification(request):
                 elif recipient_type == 'all_students':
                     recipient_qs = User.objects.filter(roles__contains=['STUDENT'])
             
-            # Create notifications for all recipient users (queryset)
-            recipient_qs = recipient_qs.distinct()
-            total = recipient_qs.count()
+            # Create notifications for all recipient users in a background job
+            recipient_ids = list(recipient_qs.distinct().values_list('id', flat=True))
+            total = len(recipient_ids)
             if total > 0:
-                created_count = 0
-                for recipient in recipient_qs:
-                    Notification.objects.create(user=recipient, message=message_text, important=bool(request.POST.get('important')))
-                    created_count += 1
-                messages.success(request, f'Notification sent to {created_count} user(s).')
-                return redirect('notifications_list')
+                job = enqueue('notifications.send', args={
+                    'user_ids': recipient_ids,
+                    'message': message_text,
+                    'important': bool(request.POST.get('important')),
+                    # Everyone is a recipient: push a single announcement to connected
+                    # clients instead of one stream event per created row.
+                    'broadcast': recipient_type in ('all', 'all_users'),
+                }, label=f'Notification to {total} user(s)', created_by=request.user)
+                messages.success(request, f'Sending notification to {total} user(s).')
+                return redirect('jobs:job_detail', job_id=job.id)
             else:
                 messages.warning(request, 'No users matched your criteria.')
                 return render(request, 'notifications/send_notification.html', context)
@@ -1,15 +1,18 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from events.models import Event, EventRegistration
+from events.models import Event
+from users.backends import role_profile
 from users.models import Club
 
 def home(request):
 
-    if request.user.is_authenticated:
-        if "SAC_COORDINATOR" in request.user.roles:
+    # The session role profile answers this without loading the user
+    profile = role_profile(request)
+    if profile is not None:
+        if "SAC_COORDINATOR" in profile['roles']:
             return redirect('admin-dashboard-template')
-        if "CLUB_COORDINATOR" in request.user.roles:
+        if "CLUB_COORDINATOR" in profile['roles']:
             return redirect('student-dashboard')
         return redirect('student-dashboard')
 
@@ -24,7 +27,7 @@ def home(request):
     
     # Add registration counts to upcoming events for display
     for event in upcoming_events:
-        event.registration_count = EventRegistration.objects.filter(event=event).count()
+        event.registration_count = event.registered_count
     
     # Completed events (events that have finished)
     completed_events = Event.objects.filter(
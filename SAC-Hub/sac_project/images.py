@@ -0,0 +1,194 @@
+"""
+Resized copies ("variants") of uploaded images: event thumbnails and club logos.
+
+When one of ``IMAGE_FIELDS`` gets a new file, a post_save receiver queues the
+``images.derive`` job, which writes a WebP and a JPEG copy at each of
+``IMAGES['WIDTHS']`` (never wider than the original) next to the original::
+
+    event_thumbnails/stage.jpg
+    event_thumbnails/stage.3f9a1c0e2b7d4a65.640w.webp
+    event_thumbnails/stage.3f9a1c0e2b7d4a65.640w.jpg
+
+The hash in the name is that of the original's content, so a variant's URL
+always means the same bytes and can be cached for ever, and deriving an
+unchanged file again writes nothing. The model's ``<field>_variants`` JSON
+records the source name, the hash and the widths written; the
+``{% responsive_image %}`` tag reads it to emit ``srcset`` and serves the
+original until the job has run.
+
+``manage.py derive_images`` backfills existing media with a process pool.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.db.models.signals import post_save
+
+DEFAULTS = {
+    'WIDTHS': (320, 640, 1280),
+    'QUALITY': 80,
+    # Backfill processes; None uses every core
+    'WORKERS': None,
+    'START_METHOD': 'spawn',
+}
+
+# (model, image field); the model has a JSONField named '<field>_variants'
+IMAGE_FIELDS = (
+    ('events.Event', 'thumbnail'),
+    ('users.Club', 'logo'),
+)
+
+# Format: (Pillow format, file extension, MIME type)
+FORMATS = {
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+}
+
+
+class VariantError(ValueError):
+    """The original cannot be read as an image."""
+
+
+def images_setting(name):
+    return getattr(settings, 'IMAGES', {}).get(name, DEFAULTS[name])
+
+
+def variants_field(field):
+    return f'{field}_variants'
+
+
+def variant_name(source, digest, width, fmt):
+    stem, _ = os.path.splitext(source)
+    return f'{stem}.{digest}.{width}w.{FORMATS[fmt][1]}'
+
+
+def variant_names(variants):
+    """Storage names of every file listed in ``variants``."""
+    return [
+        variant_name(variants['source'], variants['digest'], width, fmt)
+        for width in variants.get('widths', ())
+        for fmt in variants.get('formats', ())
+    ]
+
+
+def is_current(image, variants):
+    """Whether ``variants`` were made from the file ``image`` holds now."""
+    return bool(image and variants and variants.get('source') == image.name)
+
+
+def _flatten(image):
+    """An RGB copy of ``image``, with any transparency on white (JPEG has no alpha)."""
+    if image.mode == 'RGB':
+        return image
+    from PIL import Image
+
+    rgba = image.convert('RGBA')
+    background = Image.new('RGB', rgba.size, (255, 255, 255))
+    background.paste(rgba, mask=rgba.getchannel('A'))
+    return background
+
+
+def render_variants(storage, source, data, digest):
+    """Write the variants of the image ``data`` stored as ``source``; returns the widths written."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    largest = max(images_setting('WIDTHS'))
+    quality = images_setting('QUALITY')
+    try:
+        with Image.open(BytesIO(data)) as original:
+            # JPEGs decode straight at a reduced scale that still covers the largest width
+            original.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (UnidentifiedImageError, OSError) as error:
+        raise VariantError(f'{source} is not a readable image ({error}).')
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    width, height = image.size
+    widths = [w for w in images_setting('WIDTHS') if w < width] + ([width] if width <= largest else [])
+    # Largest first, each resized from the previous one
+    for target in sorted(widths, reverse=True):
+        if target != image.width:
+            image = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+        for fmt, (pillow_format, _, _) in FORMATS.items():
+            name = variant_name(source, digest, target, fmt)
+            if storage.exists(name):
+                continue
+            buffer = BytesIO()
+            if fmt == 'jpeg':
+                _flatten(image).save(buffer, pillow_format, quality=quality, optimize=True, progressive=True)
+            else:
+                image.save(buffer, pillow_format, quality=quality, method=4)
+            storage.save(name, ContentFile(buffer.getvalue()))
+    return sorted(widths)
+
+
+def delete_variants(storage, variants):
+    for name in variant_names(variants):
+        storage.delete(name)
+
+
+def derive(model_label, pk, field, using='default', force=False):
+    """Bring the variants of ``field`` on one row up to date; returns the new ``<field>_variants`` value.
+
+    Returns None if the row is gone; raises VariantError for an unreadable original.
+    """
+    model = apps.get_model(model_label)
+    rows = model._default_manager.using(using)
+    obj = rows.filter(pk=pk).only(field, variants_field(field)).first()
+    if obj is None:
+        return None
+    image, old = getattr(obj, field), getattr(obj, variants_field(field)) or {}
+    storage = model._meta.get_field(field).storage
+    if not image:
+        variants = {}
+    elif is_current(image, old) and not force:
+        return old
+    else:
+        try:
+            with image.open('rb') as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            raise VariantError(f'{image.name} is missing from storage.')
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        variants = {
+            'source': image.name,
+            'digest': digest,
+            'widths': render_variants(storage, image.name, data, digest),
+            'formats': list(FORMATS),
+        }
+    if image:
+        # Every row holding this file (not only ``pk``) can use them
+        rows.filter(**{field: image.name}).update(**{variants_field(field): variants})
+    else:
+        rows.filter(Q(**{field: ''}) | Q(**{f'{field}__isnull': True}), pk=pk).update(**{variants_field(field): {}})
+    replaced = (old.get('source'), old.get('digest')) != (variants.get('source'), variants.get('digest'))
+    if old.get('digest') and replaced and not rows.filter(**{field: old['source']}).exists():
+        delete_variants(storage, old)
+    return variants
+
+
+def _queue_variants(sender, instance, using, update_fields=None, **kwargs):
+    from jobs.queue import enqueue
+
+    for label, field in IMAGE_FIELDS:
+        if sender._meta.label != label or (update_fields is not None and field not in update_fields):
+            continue
+        image, variants = getattr(instance, field), getattr(instance, variants_field(field))
+        if is_current(image, variants) or not (image or variants):
+            continue
+        enqueue(
+            'images.derive', args={'model': label, 'pk': instance.pk, 'field': field},
+            label=f"Resize {image.name if image else 'removed image'}", using=using,
+        )
+
+
+def install():
+    """Queue variants whenever an image field is saved with a new file."""
+    for label in dict(IMAGE_FIELDS):
+        post_save.connect(_queue_variants, sender=apps.get_model(label), dispatch_uid=f'image-variants-{label}')
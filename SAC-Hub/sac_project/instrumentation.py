@@ -0,0 +1,276 @@
+"""
+Per-request query and latency instrumentation.
+
+``InstrumentationMiddleware`` opens a ``Collector`` for every request and
+records, once the response is ready:
+
+* the resolved view name, HTTP method, path and status,
+* wall time, number of database queries and time spent in them,
+* duplicate queries grouped by fingerprint (the SQL with its parameters
+  left out, so the same lookup for different ids counts as one shape;
+  a fingerprint seen many times in one request is usually an N+1),
+* time spent rendering templates and the response size.
+
+Records go into a bounded in-process ring buffer (``recent_records``) that
+the staff performance page aggregates, and optionally to the
+``sac_project.instrumentation`` logger as one JSON object per request.
+Latency and query counts also feed the aggregated histograms in
+``sac_project.metrics``.
+
+The collector is found through a context variable, so the database hook and
+the template hook are installed once per process and cost a single lookup
+when nothing is being collected. ``collect()`` is also used directly by the
+``assertMaxQueries`` test helper and by ``manage.py bench_views``.
+
+Configure with ``INSTRUMENTATION`` in settings.
+"""
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Requests kept in memory per process for the performance page
+    'BUFFER_SIZE': 2000,
+    # Emit one JSON log line per request (all requests, or only slow ones)
+    'LOG': False,
+    'LOG_SLOW_ONLY': True,
+    'SLOW_REQUEST_MS': 500,
+    # A query shape repeated at least this often in one request is reported
+    'DUPLICATE_THRESHOLD': 3,
+    'EXCLUDE_PATHS': ['/static/', '/media/', '/notifications/stream/'],
+}
+
+_current = contextvars.ContextVar('instrumentation_collector', default=None)
+_buffer_lock = threading.Lock()
+_buffer = None
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def instrumentation_setting(name):
+    return getattr(settings, 'INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(sql):
+    """Query shape: parameters are already placeholders, IN lists are collapsed."""
+    return _IN_LIST.sub('(%s, ...)', _WHITESPACE.sub(' ', sql).strip())
+
+
+class Collector:
+    """Accumulates what happens while it is the current collector."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.fingerprints = Counter()
+        self.statements = []
+        self._template_depth = 0
+
+    def record_query(self, sql, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        self.fingerprints[fingerprint(sql)] += 1
+        self.statements.append(sql)
+
+    def merge(self, other):
+        self.queries += other.queries
+        self.db_seconds += other.db_seconds
+        self.template_seconds += other.template_seconds
+        self.fingerprints.update(other.fingerprints)
+        self.statements.extend(other.statements)
+
+    def duplicates(self, threshold=None):
+        """[(fingerprint, count)] of query shapes repeated ``threshold`` times or more."""
+        if threshold is None:
+            threshold = instrumentation_setting('DUPLICATE_THRESHOLD')
+        return [(shape, count) for shape, count in self.fingerprints.most_common() if count >= threshold]
+
+
+@contextmanager
+def collect():
+    """Collect queries and template time for the enclosed block.
+
+    Collectors nest: an inner one sees only its own block, and its totals are
+    added to the enclosing collector when it closes (a test wrapping a request
+    still sees what the middleware collected for it).
+    """
+    parent = _current.get()
+    collector = Collector()
+    token = _current.set(collector)
+    try:
+        yield collector
+    finally:
+        _current.reset(token)
+        if parent is not None:
+            parent.merge(collector)
+
+
+def _execute_hook(execute, sql, params, many, context):
+    collector = _current.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.record_query(sql, time.perf_counter() - started)
+
+
+def _add_execute_hook(connection, **kwargs):
+    if _execute_hook not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_hook)
+
+
+def _timed_render(render):
+    def wrapper(self, *args, **kwargs):
+        collector = _current.get()
+        # Included templates render inside their parent: only time the outermost one
+        if collector is None or collector._template_depth:
+            return render(self, *args, **kwargs)
+        collector._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            collector.template_seconds += time.perf_counter() - started
+            collector._template_depth -= 1
+    wrapper.instrumented = True
+    return wrapper
+
+
+def install():
+    """Hook database cursors and template rendering (idempotent; called from ``AppConfig.ready``)."""
+    from django.template.backends.django import Template
+
+    connection_created.connect(_add_execute_hook, dispatch_uid='sac_project.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _add_execute_hook(connection)
+    if not getattr(Template.render, 'instrumented', False):
+        Template.render = _timed_render(Template.render)
+
+
+def _ring_buffer():
+    global _buffer
+    size = instrumentation_setting('BUFFER_SIZE')
+    with _buffer_lock:
+        if _buffer is None or _buffer.maxlen != size:
+            _buffer = deque(_buffer or (), maxlen=size)
+        return _buffer
+
+
+def recent_records():
+    """Snapshot of the buffered request records, oldest first."""
+    buffer = _ring_buffer()
+    with _buffer_lock:
+        return list(buffer)
+
+
+def clear_records():
+    buffer = _ring_buffer()
+    with _buffer_lock:
+        buffer.clear()
+
+
+def top_offenders(records=None, order_by='total_ms', limit=25):
+    """Per-view aggregates of the buffered records, worst first.
+
+    ``order_by`` is one of ``total_ms``, ``max_ms``, ``avg_ms``,
+    ``avg_queries``, ``max_queries`` or ``max_duplicates``.
+    """
+    views = {}
+    for record in recent_records() if records is None else records:
+        row = views.setdefault(record['view'], {
+            'view': record['view'], 'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'total_queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'template_ms': 0.0,
+            'max_duplicates': 0, 'worst_duplicate': None, 'bytes': 0,
+        })
+        row['requests'] += 1
+        row['total_ms'] += record['wall_ms']
+        row['max_ms'] = max(row['max_ms'], record['wall_ms'])
+        row['total_queries'] += record['queries']
+        row['max_queries'] = max(row['max_queries'], record['queries'])
+        row['db_ms'] += record['db_ms']
+        row['template_ms'] += record['template_ms']
+        row['bytes'] += record['response_bytes'] or 0
+        for shape, count in record['duplicates'][:1]:
+            if count > row['max_duplicates']:
+                row['max_duplicates'], row['worst_duplicate'] = count, shape
+    for row in views.values():
+        requests = row['requests']
+        row['avg_ms'] = row['total_ms'] / requests
+        row['avg_queries'] = row['total_queries'] / requests
+        row['avg_db_ms'] = row['db_ms'] / requests
+        row['avg_template_ms'] = row['template_ms'] / requests
+        row['avg_bytes'] = row['bytes'] // requests
+    return sorted(views.values(), key=lambda row: row[order_by], reverse=True)[:limit]
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        length = response.get('Content-Length')
+        return int(length) if length else None
+    return len(response.content)
+
+
+class InstrumentationMiddleware:
+    """Record timing and query statistics for each request (see module docstring)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not instrumentation_setting('ENABLED') or request.path.startswith(
+            tuple(instrumentation_setting('EXCLUDE_PATHS'))
+        ):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with collect() as collector:
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        record = {
+            'time': time.time(),
+            'view': _view_name(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'wall_ms': round(wall_ms, 3),
+            'queries': collector.queries,
+            'db_ms': round(collector.db_seconds * 1000, 3),
+            'template_ms': round(collector.template_seconds * 1000, 3),
+            'duplicates': collector.duplicates(),
+            'response_bytes': _response_size(response),
+        }
+        buffer = _ring_buffer()
+        with _buffer_lock:
+            buffer.append(record)
+        observe_request(record)
+        if instrumentation_setting('LOG'):
+            slow = wall_ms >= instrumentation_setting('SLOW_REQUEST_MS')
+            if slow or not instrumentation_setting('LOG_SLOW_ONLY'):
+                logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record))
+        return response
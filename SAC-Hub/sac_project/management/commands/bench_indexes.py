@@ -0,0 +1,128 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from attendance.models import Attendance, AttendanceSession
+from events.models import Event, EventRegistration
+from sac_project.seeding import CampusSpec, seed_campus
+from users.models import Notification
+
+# Models whose Meta indexes/constraints make up the hot-path index suite
+INDEXED_MODELS = (Event, EventRegistration, Attendance, AttendanceSession, Notification)
+
+
+def hot_queries(rng):
+    """(label, queryset, how it is evaluated) for the lookups the views issue most."""
+    now = timezone.now()
+    registrations = EventRegistration.objects.order_by('id')
+    sample = registrations[rng.randrange(registrations.count())]
+    event, student = sample.event, sample.student
+    session = AttendanceSession.objects.order_by('id')[rng.randrange(AttendanceSession.objects.count())]
+    return [
+        ('Upcoming approved events', Event.objects.filter(status='APPROVED', date_time__gte=now).order_by('date_time')[:20], list),
+        ("Club's approved events", Event.objects.filter(club_id=event.club_id, status='APPROVED'), 'count'),
+        ('Registration lookup', EventRegistration.objects.filter(event=event, student=student), 'exists'),
+        ("Student's registrations", EventRegistration.objects.filter(student=student, status='REGISTERED').order_by(), list),
+        ("Student's attended sessions", Attendance.objects.filter(student=student, status='PRESENT'), 'count'),
+        ('Session present count', Attendance.objects.filter(session=session, status='PRESENT'), 'count'),
+        ('Unread notifications', Notification.objects.filter(user=student, read=False), 'count'),
+        ('Latest notifications', Notification.objects.filter(user=student).order_by('-created_at')[:10], list),
+        ("Event's open sessions", AttendanceSession.objects.filter(event=event, locked=False).order_by('-created_at'), list),
+    ]
+
+
+def run_query(queryset, how):
+    if how == 'count':
+        return queryset.count()
+    if how == 'exists':
+        return queryset.exists()
+    return list(queryset)
+
+
+def measure(queries, repeat):
+    results = {}
+    for label, queryset, how in queries:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run_query(queryset.all(), how)
+            timings.append(time.perf_counter() - started)
+        results[label] = (statistics.median(timings) * 1000, queryset.explain())
+    return results
+
+
+def set_indexes(enabled):
+    """Drop or (re)create the suite.
+
+    On SQLite changing a constraint rebuilds the table together with every
+    index in ``Meta``, so constraints go first and indexes are only touched
+    when they are not already in the wanted state.
+    """
+    with connection.schema_editor() as editor:
+        for model in INDEXED_MODELS:
+            constraints, indexes = model._meta.constraints, model._meta.indexes
+            if not enabled:
+                # The rebuild must not recreate what is being dropped
+                model._meta.constraints, model._meta.indexes = [], []
+            try:
+                for constraint in constraints:
+                    (editor.add_constraint if enabled else editor.remove_constraint)(model, constraint)
+            finally:
+                model._meta.constraints, model._meta.indexes = constraints, indexes
+            with connection.cursor() as cursor:
+                existing = connection.introspection.get_constraints(cursor, model._meta.db_table)
+            for index in model._meta.indexes:
+                if enabled and index.name not in existing:
+                    editor.add_index(model, index)
+                elif not enabled and index.name in existing:
+                    editor.remove_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and compare query plans and timings of the hot "
+        "lookups with and without the composite index suite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--events', type=int, default=2000)
+        parser.add_argument('--notifications', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=50, help='Runs per query; the median is reported')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        # Never touch the real database: build a test database and drop it after.
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            started = time.perf_counter()
+            summary = seed_campus(CampusSpec(
+                students=options['students'], faculty=max(options['students'] // 25, 1),
+                departments=20, clubs=50, events=options['events'],
+                notifications=options['notifications'], seed=options['seed'],
+            ))
+            self.stdout.write(f'Seeded {summary} in {time.perf_counter() - started:.1f}s\n')
+            queries = hot_queries(random.Random(options['seed']))
+
+            set_indexes(False)
+            before = measure(queries, options['repeat'])
+            set_indexes(True)
+            after = measure(queries, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for label, _, _ in queries:
+            before_ms, before_plan = before[label]
+            after_ms, after_plan = after[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f'  without indexes: {before_ms:8.3f} ms   {before_plan.replace(chr(10), " | ")}')
+            self.stdout.write(f'  with indexes:    {after_ms:8.3f} ms   {after_plan.replace(chr(10), " | ")}')
+            speedup = before_ms / after_ms if after_ms else float('inf')
+            self.stdout.write(f'  speed-up: {speedup:.1f}x')
@@ -0,0 +1,145 @@
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .bench_views import git_revision
+
+# What a fresh process does before it can serve: each runs in its own interpreter
+TARGETS = {
+    'check': ['manage.py', 'check'],
+    'wsgi': ['-c', 'from sac_project.wsgi import application'],
+    # The URLconf (and so every view module) is imported on the first request
+    'wsgi+urls': [
+        '-c',
+        'from sac_project.wsgi import application\n'
+        'from django.urls import get_resolver\n'
+        'get_resolver().url_patterns',
+    ],
+}
+# Dependencies that only a few code paths need; they should not load at startup
+HEAVY_MODULES = ('pandas', 'numpy', 'PIL', 'openpyxl', 'pyarrow')
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(output):
+    """{module: (self us, cumulative us, depth)} from ``python -X importtime`` stderr."""
+    modules = {}
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules[name] = (int(own), int(cumulative), (len(indent) - 1) // 2)
+    return modules
+
+
+def run_target(argv, env):
+    """(wall ms, modules) for one fresh interpreter running ``argv``."""
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', *argv], cwd=settings.BASE_DIR, env=env,
+        capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if process.returncode:
+        raise CommandError(f"{' '.join(argv)} failed:\n{process.stderr[-2000:]}")
+    return wall_ms, parse_importtime(process.stderr)
+
+
+def _ms(us):
+    return round(us / 1000, 1)
+
+
+def summarize(runs, top):
+    """Median timings over ``runs`` (a list of ``run_target`` results)."""
+    modules = defaultdict(list)
+    for _, found in runs:
+        for name, (own, cumulative, depth) in found.items():
+            modules[name].append((own, cumulative, depth))
+    median = {
+        name: (statistics.median(t[0] for t in times), statistics.median(t[1] for t in times), times[0][2])
+        for name, times in modules.items()
+    }
+    packages = defaultdict(float)
+    for name, (own, _, _) in median.items():
+        packages[name.split('.')[0]] += own
+    roots = sorted(
+        ((name, cumulative) for name, (_, cumulative, depth) in median.items() if depth == 0),
+        key=lambda item: item[1], reverse=True,
+    )
+    return {
+        'wall_ms': round(statistics.median(wall for wall, _ in runs), 1),
+        'imports_ms': _ms(statistics.median(sum(t[0] for t in found.values()) for _, found in runs)),
+        'modules': len(median),
+        'heavy': [name for name in HEAVY_MODULES if name in median],
+        'top_imports': [{'module': name, 'cumulative_ms': _ms(us)} for name, us in roots[:top]],
+        'top_packages': [
+            {'package': name, 'self_ms': _ms(us)}
+            for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure process startup: wall time and `python -X importtime` breakdowns for "
+        "`manage.py check`, WSGI application load, and WSGI load plus URL resolution."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per target (the median is reported)')
+        parser.add_argument('--top', type=int, default=15, help='Imports and packages listed per target')
+        parser.add_argument('--only', action='append', choices=sorted(TARGETS), help='Run only this target (repeatable)')
+        parser.add_argument('--output', help='Also write the JSON report here')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        results = {}
+        for name, argv in TARGETS.items():
+            if options['only'] and name not in options['only']:
+                continue
+            # The first run compiles bytecode; it is not counted
+            run_target(argv, env)
+            runs = [run_target(argv, env) for _ in range(max(1, options['repeat']))]
+            results[name] = summary = summarize(runs, options['top'])
+            self.report(name, summary)
+
+        if options['output']:
+            report = {
+                'meta': {
+                    'created': datetime.now().isoformat(timespec='seconds'),
+                    'revision': git_revision(),
+                    'repeat': options['repeat'],
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                },
+                'results': results,
+            }
+            Path(options['output']).write_text(json.dumps(report, indent=2) + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def report(self, name, summary):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{name}: {summary['wall_ms']:.0f} ms wall, {summary['imports_ms']:.0f} ms importing "
+            f"{summary['modules']} modules"
+        ))
+        if summary['heavy']:
+            self.stdout.write(self.style.WARNING(f"  heavy modules imported: {', '.join(summary['heavy'])}"))
+        self.stdout.write(f"  {'slowest top-level imports':<40} {'cumulative ms':>14}")
+        for row in summary['top_imports']:
+            self.stdout.write(f"  {row['module']:<40} {row['cumulative_ms']:>14.1f}")
+        self.stdout.write(f"  {'by package':<40} {'self ms':>14}")
+        for row in summary['top_packages']:
+            self.stdout.write(f"  {row['package']:<40} {row['self_ms']:>14.1f}")
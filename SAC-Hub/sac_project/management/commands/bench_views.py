@@ -0,0 +1,250 @@
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from attendance.models import Attendance
+from events.models import Event
+from sac_project.instrumentation import collect
+from users.models import Notification, User
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a non-empty list."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+@contextmanager
+def sqlite_copy(path):
+    """Run against a throwaway copy so repeated runs start from the same data."""
+    source = Path(path)
+    if not source.exists():
+        raise CommandError(f'{source} does not exist (create one with: manage.py seed_campus --output {source}).')
+    with tempfile.TemporaryDirectory() as directory:
+        copy = Path(directory) / source.name
+        shutil.copyfile(source, copy)
+        connection.close()
+        original = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = str(copy)
+        try:
+            yield copy
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = original
+
+
+def pick_fixtures():
+    """Representative heavy users and events from the seeded dataset."""
+    admin = User.objects.filter(username='sac_admin').first() or next(
+        (user for user in User.objects.all() if 'ADMIN' in (user.roles or [])), None
+    )
+    if admin is None:
+        raise CommandError('The database has no ADMIN user; seed it with seed_campus.')
+    busiest = Event.objects.filter(status__in=['APPROVED', 'COMPLETED']).order_by('-registered_count').first()
+    attended = (
+        Attendance.objects.filter(status='PRESENT').values('session__event')
+        .annotate(rows=Count('id')).order_by('-rows').first()
+    )
+    if busiest is None or attended is None:
+        raise CommandError('The database has no registrations or attendance; seed it with seed_campus.')
+    past_event = Event.objects.get(pk=attended['session__event'])
+    # The attendee of that event with the most notifications
+    attendees = Attendance.objects.filter(session__event=past_event, status='PRESENT').values('student')
+    student = User.objects.filter(pk__in=attendees).annotate(rows=Count('notifications')).order_by('-rows').first()
+    registered = list(past_event.registrations.filter(status='REGISTERED').values_list('student_id', flat=True))
+    return {
+        'admin': admin, 'student': student, 'busiest_event': busiest, 'past_event': past_event,
+        'attendance_payload': json.dumps({str(student_id): 'PRESENT' for student_id in registered}),
+        'attendance_id': Attendance.objects.filter(student=student).values_list('id', flat=True).first(),
+        'notification_id': Notification.objects.filter(user=student).values_list('id', flat=True).first(),
+    }
+
+
+def scenarios(f):
+    """(name, user or None for anonymous, method, url, extra request kwargs) for every view."""
+    admin, student = f['admin'], f['student']
+    busiest, past = f['busiest_event'].id, f['past_event'].id
+    return [
+        ('event_list', student, 'get', reverse('event_list'), {}),
+        ('event_detail', admin, 'get', reverse('event_detail', args=[busiest]), {}),
+        ('calendar_view', student, 'get', reverse('calendar_view'), {}),
+        # Signed-in users are redirected to their dashboard; home is the public landing page
+        ('home', None, 'get', reverse('home'), {}),
+        ('student_dashboard', student, 'get', reverse('student-dashboard'), {}),
+        ('analytics_view', admin, 'get', reverse('analytics'), {}),
+        ('attendance_manage', admin, 'get', reverse('attendance_manage', args=[past]), {}),
+        ('attendance_manage_bulk_post', admin, 'post', reverse('attendance_manage', args=[past]),
+         {'data': f['attendance_payload'], 'content_type': 'application/json'}),
+        ('attendance_export', admin, 'post', reverse('attendance_export', args=[past]), {}),
+        ('notifications_list', student, 'get', reverse('notifications_list'), {}),
+        ('download_event_certificate', student, 'get', reverse('certificate:download_event_certificate', args=[past]), {}),
+        ('api_events', admin, 'get', '/api/events/', {}),
+        ('api_event_detail', admin, 'get', f'/api/events/{busiest}/', {}),
+        ('api_clubs', admin, 'get', '/api/clubs/', {}),
+        ('api_departments', admin, 'get', '/api/departments/', {}),
+        ('api_users', admin, 'get', '/api/users/', {}),
+        ('api_calendar_entries', admin, 'get', '/api/calendar-entries/', {}),
+        ('api_event_reports', admin, 'get', '/api/event-reports/', {}),
+        ('api_collaboration_requests', admin, 'get', '/api/collaboration-requests/', {}),
+        # These two tables are unpaginated and hold ~1M rows: detail routes only
+        ('api_attendance_detail', student, 'get', f"/api/attendance/{f['attendance_id']}/", {}),
+        ('api_notification_detail', student, 'get', f"/api/notifications/{f['notification_id']}/", {}),
+    ]
+
+
+def run_scenario(client, method, url, kwargs, repeat, budget):
+    timings, queries, template_ms = [], [], []
+    # One untimed warm-up request (template loading, first session creation, ...)
+    response = getattr(client, method)(url, **kwargs)
+    started = time.perf_counter()
+    while len(timings) < repeat and (len(timings) < 3 or time.perf_counter() - started < budget):
+        with collect() as collector:
+            begin = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            content = b''.join(response) if response.streaming else response.content
+            timings.append((time.perf_counter() - begin) * 1000)
+        queries.append(collector.queries)
+        template_ms.append(collector.template_seconds * 1000)
+    return {
+        'method': method.upper(), 'url': url, 'status': response.status_code, 'runs': len(timings),
+        'p50_ms': round(percentile(timings, 50), 3), 'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(statistics.fmean(timings), 3), 'max_ms': round(max(timings), 3),
+        'queries': int(statistics.median(queries)), 'queries_max': max(queries),
+        'duplicates': collector.duplicates(), 'template_ms': round(statistics.median(template_ms), 3),
+        'bytes': len(content),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot views with the Django test client against a seeded database "
+        "(see seed_campus) and write a JSON report with p50/p95 latency and query "
+        "counts; --compare diffs two reports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help='SQLite file produced by seed_campus --output (a copy is used)')
+        parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per view')
+        parser.add_argument('--budget', type=float, default=30.0,
+                            help='Stop repeating a view after this many seconds (at least 3 runs)')
+        parser.add_argument('--only', action='append', help='Run only this scenario (repeatable)')
+        parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help='Diff two JSON reports')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='With --compare: p50/p95 growth (in %%) reported as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='With --compare: exit with an error if anything regressed')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'], options['fail_on_regression'])
+        if not options['database']:
+            raise CommandError('Pass --database with a seeded SQLite file (manage.py seed_campus --output FILE).')
+
+        with sqlite_copy(options['database']), override_settings(DEBUG=False):
+            fixtures = pick_fixtures()
+            selected = [s for s in scenarios(fixtures) if not options['only'] or s[0] in options['only']]
+            results = {}
+            clients = {}
+            for name, user, method, url, kwargs in selected:
+                key = user.pk if user else None
+                client = clients.get(key)
+                if client is None:
+                    client = clients[key] = Client()
+                    if user:
+                        client.force_login(user)
+                self.stderr.write(f'{name} ...', ending='')
+                self.stderr.flush()
+                results[name] = run_scenario(client, method, url, kwargs, options['repeat'], options['budget'])
+                self.stderr.write(
+                    f" {results[name]['status']} p50 {results[name]['p50_ms']:.1f} ms, "
+                    f"{results[name]['queries']} queries"
+                )
+
+        report = {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'database': str(options['database']),
+                'revision': git_revision(),
+                'repeat': options['repeat'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': results,
+        }
+        payload = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(payload + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+    def compare(self, base_path, head_path, threshold, fail):
+        base = json.loads(Path(base_path).read_text())
+        head = json.loads(Path(head_path).read_text())
+        self.stdout.write(
+            f"{'view':<30} {'p50 ms':>20} {'p95 ms':>20} {'queries':>14}\n"
+            f"{'':<30} {base['meta'].get('revision') or 'base':>20} -> {head['meta'].get('revision') or 'head'}"
+        )
+        regressions = []
+        for name in sorted(set(base['results']) | set(head['results'])):
+            old, new = base['results'].get(name), head['results'].get(name)
+            if not old or not new:
+                self.stdout.write(f"{name:<30} only in {'head' if new else 'base'}")
+                continue
+
+            def delta(key):
+                change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                return f"{old[key]:.1f}->{new[key]:.1f} ({change:+.0f}%)", change
+
+            p50, p50_change = delta('p50_ms')
+            p95, p95_change = delta('p95_ms')
+            queries = f"{old['queries']}->{new['queries']}"
+            flags = []
+            if p50_change > threshold or p95_change > threshold:
+                flags.append('slower')
+            if new['queries'] > old['queries']:
+                flags.append('more queries')
+            if new['status'] != old['status']:
+                flags.append(f"status {old['status']}->{new['status']}")
+            line = f'{name:<30} {p50:>20} {p95:>20} {queries:>14}'
+            if flags:
+                regressions.append(name)
+                line = self.style.ERROR(f"{line}  REGRESSION: {', '.join(flags)}")
+            self.stdout.write(line)
+
+        if regressions:
+            message = f"{len(regressions)} regression(s): {', '.join(regressions)}"
+            if fail:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
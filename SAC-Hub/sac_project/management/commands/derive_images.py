@@ -0,0 +1,84 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from sac_project.images import IMAGE_FIELDS, derive, images_setting, variants_field
+
+
+def pending(using, force=False):
+    """``(model, pk, field)`` for one row per stored image whose variants are missing or stale."""
+    found = {}
+    for label, field in IMAGE_FIELDS:
+        model = apps.get_model(label)
+        rows = (
+            model._default_manager.using(using)
+            .exclude(Q(**{field: ''}) | Q(**{f'{field}__isnull': True}))
+            .values_list('pk', field, variants_field(field))
+        )
+        for pk, name, variants in rows.iterator():
+            # derive() updates every row holding the same file
+            if (force or (variants or {}).get('source') != name) and (label, name) not in found:
+                found[label, name] = (label, pk, field)
+    return list(found.values())
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the resized WebP/JPEG copies of existing event thumbnails and club logos "
+        "(see sac_project.images), in a process pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Processes (default from settings; 0 or 1 works in-process)')
+        parser.add_argument('--force', action='store_true', help='Also redo images whose variants are up to date')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        todo = pending(using, options['force'])
+        if not todo:
+            self.stdout.write('Every image already has its variants.')
+            return
+        workers = images_setting('WORKERS') if options['workers'] is None else options['workers']
+        workers = min((os.cpu_count() or 1) if workers is None else workers, len(todo))
+        self.stdout.write(f'Deriving {len(todo)} image(s) with {max(workers, 1)} worker(s) ...')
+
+        started = time.perf_counter()
+        done = failed = 0
+
+        def report(item, error):
+            nonlocal done, failed
+            done += 1
+            if error is not None:
+                failed += 1
+                self.stderr.write(f'  {item[0]} #{item[1]}: {error}')
+            if done % 50 == 0:
+                self.stdout.write(f'  ... {done}/{len(todo)}')
+
+        if workers <= 1:
+            for item in todo:
+                try:
+                    derive(*item, using=using, force=options['force'])
+                except Exception as error:
+                    report(item, error)
+                else:
+                    report(item, None)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=get_context(images_setting('START_METHOD')), initializer=django.setup,
+            ) as pool:
+                futures = {pool.submit(derive, *item, using=using, force=options['force']): item for item in todo}
+                for future in as_completed(futures):
+                    report(futures[future], future.exception())
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{done - failed} image(s) derived in {elapsed:.1f}s ({done / elapsed:.1f}/s), {failed} failed.'
+        ))
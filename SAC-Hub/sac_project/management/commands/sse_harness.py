@@ -0,0 +1,141 @@
+import asyncio
+import gc
+import os
+import resource
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from sac_project.asgi import application as asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from sac_project.realtime import get_broker, publish_announcement
+
+
+def current_rss_kib():
+    """Resident set size now (Linux), falling back to the peak elsewhere."""
+    gc.collect()
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many idle Server-Sent Events connections against the in-process ASGI "
+        "application, hold them, push one announcement and report fan-out latency "
+        "and memory use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--hold', type=float, default=5.0, help='Seconds to keep the connections idle')
+        parser.add_argument('--user', help='Username to authenticate as (defaults to the first user)')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Seconds to wait for connect and delivery')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user = (
+            User.objects.filter(username=options['user']).first()
+            if options['user'] else User.objects.order_by('id').first()
+        )
+        if user is None:
+            raise CommandError('No user available to authenticate the connections.')
+
+        session = import_string(settings.SESSION_ENGINE + '.SessionStore')()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0] if getattr(settings, 'AUTHENTICATION_BACKENDS', None) else 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        try:
+            asyncio.run(self._run(session.session_key, options))
+        finally:
+            session.delete()
+
+    async def _run(self, session_key, options):
+        app = asgi_application
+        broker = get_broker()
+        total = options['connections']
+        timeout = options['timeout']
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session_key}'.encode()
+
+        connected = asyncio.Semaphore(0)
+        delivered = asyncio.Semaphore(0)
+        disconnect = asyncio.Event()
+        statuses = []
+
+        async def connection():
+            sent_request = False
+
+            async def receive():
+                nonlocal sent_request
+                if not sent_request:
+                    sent_request = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            seen_announcement = False
+            first_chunk = True
+
+            async def send(message):
+                nonlocal seen_announcement, first_chunk
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif message['type'] == 'http.response.body' and message.get('body'):
+                    if first_chunk:
+                        first_chunk = False
+                        connected.release()
+                    elif not seen_announcement and b'event: announcement' in message['body']:
+                        seen_announcement = True
+                        delivered.release()
+
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': '/notifications/stream/',
+                'raw_path': b'/notifications/stream/', 'root_path': '', 'query_string': b'',
+                'headers': [(b'host', b'testserver'), (b'cookie', cookie), (b'accept', b'text/event-stream')],
+                'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            }
+            await app(scope, receive, send)
+
+        async def acquire_all(semaphore, label, count=total):
+            started = time.perf_counter()
+            for _ in range(count):
+                try:
+                    await asyncio.wait_for(semaphore.acquire(), timeout)
+                except asyncio.TimeoutError:
+                    raise CommandError(f'Timed out waiting for {label}; statuses seen: {sorted(set(statuses))}')
+            return time.perf_counter() - started
+
+        # Warm up with one connection so URLconf and view imports are not
+        # counted as per-connection memory.
+        tasks = [asyncio.create_task(connection())]
+        await asyncio.wait_for(connected.acquire(), timeout)
+        rss_before = current_rss_kib()
+        tasks += [asyncio.create_task(connection()) for _ in range(total - 1)]
+        connect_time = await acquire_all(connected, 'connections', total - 1)
+        rss_after = current_rss_kib()
+        self.stdout.write(
+            f'{total} connections open in {connect_time:.2f}s '
+            f'({broker.subscriber_count()} subscriptions, '
+            f'~{(rss_after - rss_before) / max(total - 1, 1):.0f} KiB RSS per connection)'
+        )
+
+        await asyncio.sleep(options['hold'])
+        self.stdout.write(f"Held idle for {options['hold']:.1f}s")
+
+        started = time.perf_counter()
+        publish_announcement('Load test announcement')
+        fanout_time = await acquire_all(delivered, 'announcement delivery')
+        self.stdout.write(f'Announcement delivered to {total} connections in {fanout_time * 1000:.1f}ms')
+
+        disconnect.set()
+        await asyncio.wait(tasks, timeout=timeout)
+        leaked = broker.subscriber_count()
+        if leaked:
+            raise CommandError(f'{leaked} subscriptions still registered after disconnect')
+        self.stdout.write(self.style.SUCCESS(f'All connections closed cleanly in {time.perf_counter() - started:.2f}s total'))
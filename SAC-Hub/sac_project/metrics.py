@@ -0,0 +1,474 @@
+"""
+Aggregated application metrics in the Prometheus text exposition format.
+
+Counters and histograms are defined once at import time (see the bottom of
+this module) and updated from request instrumentation, the cache backend,
+certificate rendering, notification sending, attendance marking and
+background jobs.
+``/metrics`` renders them together with a few gauges that are computed from
+the database at scrape time.
+
+Every sample is an additive number, so worker processes never have to agree
+on a value: each process adds to an in-memory buffer and the store merges the
+buffer into the shared total.
+
+* ``FileStore`` (the default) flushes each process's buffer into a shared
+  SQLite file every ``FLUSH_SECONDS`` with ``value = value + ?`` upserts,
+  from a background thread (and once more at exit), so a request never waits
+  for the file's lock. The worker that serves a scrape flushes its own buffer
+  first, so totals from all workers on the host are at most
+  ``FLUSH_SECONDS`` behind.
+* ``MemoryStore`` keeps the totals in-process (development and tests).
+
+Configure with ``METRICS`` in settings.
+"""
+import atexit
+import bisect
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'STORE': 'file',  # 'file' (shared between worker processes) or 'memory'
+    'PATH': None,  # defaults to BASE_DIR / 'metrics.sqlite3'
+    'FLUSH_SECONDS': 2,
+    # /metrics is served to these addresses, or to anyone sending "Authorization: Bearer TOKEN"
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'TOKEN': None,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+FANOUT_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+JOB_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800)
+
+_INF = float('inf')
+
+
+def metrics_setting(name):
+    return getattr(settings, 'METRICS', {}).get(name, DEFAULTS[name])
+
+
+class MemoryStore:
+    """Totals kept in this process only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+
+    def add(self, key, amount):
+        with self._lock:
+            self._values[key] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class FileStore(MemoryStore):
+    """Buffers in memory; a background thread merges the buffer into a SQLite file shared by all workers."""
+
+    def __init__(self, path, flush_seconds):
+        super().__init__()
+        self.path = str(path)
+        self.flush_seconds = flush_seconds
+        self._conn = None
+        # Serialises writers of this process; ``_lock`` is only held to swap the buffer
+        self._write_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS samples ('
+                'name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, '
+                'PRIMARY KEY (name, labels))'
+            )
+        return self._conn
+
+    def add(self, key, amount):
+        super().add(key, amount)
+        if self._flusher is None:
+            self._start_flusher()
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+                self._flusher.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_seconds):
+            self.flush()
+
+    def stop(self):
+        """Stop the background thread and flush what is left."""
+        self._stopped.set()
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._values = self._values, defaultdict(float)
+        if not pending:
+            return
+        with self._write_lock:
+            try:
+                conn = self._connection()
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT INTO samples (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                    [(name, labels, value) for (name, labels), value in pending.items()],
+                )
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                logger.exception('Could not flush metrics to %s', self.path)
+                if self._conn is not None and self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                # Keep the samples for the next attempt
+                with self._lock:
+                    for key, value in pending.items():
+                        self._values[key] += value
+
+    def snapshot(self):
+        self.flush()
+        with self._write_lock:
+            rows = self._connection().execute('SELECT name, labels, value FROM samples').fetchall()
+        return {(name, labels): value for name, labels, value in rows}
+
+    def reset(self):
+        with self._write_lock, self._lock:
+            self._values.clear()
+            self._connection().execute('DELETE FROM samples')
+
+    def after_fork(self):
+        # A forked worker must not flush what its parent had buffered, nor share its
+        # connection; the parent's flusher thread does not exist in the child
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._values = defaultdict(float)
+        self._conn = None
+        self._stopped = threading.Event()
+        self._flusher = None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if metrics_setting('STORE') == 'memory':
+                    _store = MemoryStore()
+                else:
+                    _store = FileStore(
+                        metrics_setting('PATH') or settings.BASE_DIR / 'metrics.sqlite3',
+                        metrics_setting('FLUSH_SECONDS'),
+                    )
+                    atexit.register(_store.stop)
+    return _store
+
+
+@receiver(setting_changed)
+def _reset_store(setting, **kwargs):
+    global _store
+    if setting == 'METRICS':
+        if isinstance(_store, FileStore):
+            _store.stop()
+        _store = None
+
+
+def _after_fork():
+    if isinstance(_store, FileStore):
+        _store.after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _label_key(labels):
+    return json.dumps(labels, sort_keys=True, separators=(',', ':'))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return {name: str(value) for name, value in labels.items()}
+
+    def _add(self, sample, labels, amount):
+        if metrics_setting('ENABLED'):
+            get_store().add((sample, _label_key(labels)), amount)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._add(f'{self.name}_total', self._labels(labels), amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (_INF,)
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        # Buckets are stored non-cumulative; exposition adds them up
+        bound = self.buckets[bisect.bisect_left(self.buckets, value)]
+        self._add(f'{self.name}_bucket', {**labels, 'le': _format_value(bound)}, 1)
+        self._add(f'{self.name}_sum', labels, value)
+        self._add(f'{self.name}_count', labels, 1)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class Gauge:
+    """Value computed when /metrics is scraped; ``func`` returns ``[(labels, value)]``."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, func):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        REGISTRY.append(self)
+
+
+def _format_value(value):
+    if value == _INF:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _sample_line(name, labels, value):
+    return f'{name}{_format_labels(labels)} {_format_value(value)}'
+
+
+def _histogram_lines(metric, samples):
+    series = defaultdict(dict)
+    for (name, labels), value in samples.items():
+        if name.startswith(metric.name + '_'):
+            labels = json.loads(labels)
+            bound = labels.pop('le', None)
+            series[_label_key(labels)][(name[len(metric.name):], bound)] = value
+    for key in sorted(series):
+        labels, values = json.loads(key), series[key]
+        cumulative = 0
+        for bound in metric.buckets:
+            cumulative += values.get(('_bucket', _format_value(bound)), 0)
+            yield _sample_line(f'{metric.name}_bucket', {**labels, 'le': _format_value(bound)}, cumulative)
+        yield _sample_line(f'{metric.name}_sum', labels, values.get(('_sum', None), 0))
+        yield _sample_line(f'{metric.name}_count', labels, values.get(('_count', None), 0))
+
+
+def render_metrics():
+    """All registered metrics in the Prometheus text format (version 0.0.4)."""
+    samples = get_store().snapshot()
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        if isinstance(metric, Histogram):
+            lines.extend(_histogram_lines(metric, samples))
+        elif isinstance(metric, Counter):
+            name = f'{metric.name}_total'
+            found = sorted((labels, value) for (sample, labels), value in samples.items() if sample == name)
+            if not found and not metric.labelnames:
+                found = [('{}', 0)]
+            lines.extend(_sample_line(name, json.loads(labels), value) for labels, value in found)
+        else:
+            try:
+                values = metric.func()
+            except Exception:
+                logger.exception('Gauge %s failed', metric.name)
+                continue
+            lines.extend(
+                _sample_line(metric.name, labels, value) for labels, value in values
+                if not (isinstance(value, float) and math.isnan(value))
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    get_store().reset()
+
+
+class MeteredCacheMixin:
+    """Counts the hits and misses of a cache backend.
+
+    Mixed into each of Django's backends below; pick one in ``CACHES``. The
+    ``cache`` label is the entry's ``METRICS_NAME`` ('default' if unset).
+    ``LocMemCache`` is private to each process, so deployments with several
+    worker processes should use a shared one (file, database or Redis).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.metrics_name = params.get('METRICS_NAME') or 'default'
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing_key, version)
+        if value is self._missing_key:
+            CACHE_REQUESTS.inc(cache=self.metrics_name, result='miss')
+            return default
+        CACHE_REQUESTS.inc(cache=self.metrics_name, result='hit')
+        return value
+
+
+class MeteredLocMemCache(MeteredCacheMixin, LocMemCache):
+    pass
+
+
+class MeteredFileBasedCache(MeteredCacheMixin, FileBasedCache):
+    pass
+
+
+class MeteredDatabaseCache(MeteredCacheMixin, DatabaseCache):
+    pass
+
+
+class MeteredRedisCache(MeteredCacheMixin, RedisCache):
+    pass
+
+
+def observe_request(record):
+    """Called by ``InstrumentationMiddleware`` with each finished request's record."""
+    view = record['view']
+    REQUEST_LATENCY.observe(record['wall_ms'] / 1000, view=view, method=record['method'])
+    REQUEST_QUERIES.observe(record['queries'], view=view)
+    REQUESTS.inc(view=view, method=record['method'], status=record['status'])
+
+
+def _attendance_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is None or 'status' in update_fields:
+        ATTENDANCE_MARKS.inc(status=instance.status)
+
+
+def _pending_approvals():
+    from events.models import Event
+    return [({}, Event.objects.filter(status='PENDING').count())]
+
+
+def _open_attendance_sessions():
+    from django.db.models import Q
+    from django.utils import timezone
+    from attendance.models import AttendanceSession
+    now = timezone.now()
+    open_sessions = AttendanceSession.objects.filter(locked=False).filter(
+        Q(open_at__isnull=True) | Q(open_at__lte=now), Q(close_at__isnull=True) | Q(close_at__gt=now)
+    )
+    return [({}, open_sessions.count())]
+
+
+def _queued_jobs():
+    from django.utils import timezone
+    from jobs.models import Job
+    due = Job.objects.filter(status='QUEUED', run_after__lte=timezone.now())
+    return [({}, due.count())]
+
+
+def _realtime_spool_backlog():
+    from .realtime import realtime_setting
+    if not realtime_setting('BACKEND').endswith('.SQLiteSpoolBackend'):
+        return []
+    path = realtime_setting('OPTIONS').get('path') or settings.BASE_DIR / 'realtime_spool.sqlite3'
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=1)
+    try:
+        return [({}, conn.execute('SELECT COUNT(*) FROM spool').fetchone()[0])]
+    finally:
+        conn.close()
+
+
+def install():
+    """Connect the model signal handlers (called from ``AppConfig.ready``)."""
+    from django.db.models.signals import post_save
+    post_save.connect(_attendance_saved, sender='attendance.Attendance', dispatch_uid='sac_project.metrics')
+
+
+REGISTRY = []
+
+REQUESTS = Counter('sac_http_requests', 'Requests handled, by URL name.', ['view', 'method', 'status'])
+REQUEST_LATENCY = Histogram(
+    'sac_http_request_duration_seconds', 'Request wall time, by URL name.', ['view', 'method'],
+)
+REQUEST_QUERIES = Histogram(
+    'sac_http_request_db_queries', 'Database queries per request, by URL name.', ['view'], buckets=QUERY_BUCKETS,
+)
+CACHE_REQUESTS = Counter('sac_cache_requests', 'Cache lookups, by cache and hit/miss.', ['cache', 'result'])
+CERTIFICATE_RENDER = Histogram(
+    'sac_certificate_render_seconds', 'Time to render one certificate PDF.', ['source'],
+)
+NOTIFICATION_FANOUT = Histogram(
+    'sac_notification_fanout_recipients', 'Recipients per sent notification.', ['kind'], buckets=FANOUT_BUCKETS,
+)
+ATTENDANCE_MARKS = Counter(
+    'sac_attendance_marks', 'Attendance records saved, by status (rate of PRESENT = check-ins).', ['status'],
+)
+JOB_RUNS = Counter('sac_jobs', 'Background job attempts, by task and outcome.', ['task', 'outcome'])
+JOB_DURATION = Histogram(
+    'sac_job_duration_seconds', 'Wall time of one background job attempt.', ['task'], buckets=JOB_BUCKETS,
+)
+Gauge('sac_events_pending_approval', 'Events waiting for approval.', _pending_approvals)
+Gauge('sac_attendance_sessions_open', 'Attendance sessions currently accepting check-ins.', _open_attendance_sessions)
+Gauge('sac_jobs_due', 'Background jobs waiting for a worker.', _queued_jobs)
+Gauge('sac_realtime_spool_events', 'Events in the shared realtime spool (SQLiteSpoolBackend only).', _realtime_spool_backlog)
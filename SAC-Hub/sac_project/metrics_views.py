@@ -0,0 +1,26 @@
+import hmac
+
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from .metrics import metrics_setting, render_metrics
+
+
+def _scrape_allowed(request):
+    token = metrics_setting('TOKEN')
+    if token:
+        header = request.headers.get('Authorization', '')
+        if hmac.compare_digest(header, f'Bearer {token}'):
+            return True
+    if request.META.get('REMOTE_ADDR') in metrics_setting('ALLOWED_IPS'):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and (user.is_staff or 'ADMIN' in (user.roles or [])))
+
+
+@require_GET
+def metrics_view(request):
+    """Prometheus scrape endpoint (text exposition format)."""
+    if not _scrape_allowed(request):
+        return HttpResponseForbidden('Metrics are not available from this address.')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
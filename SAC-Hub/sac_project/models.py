@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class DataVersion(models.Model):
+    """A counter bumped whenever some derived data (cached grids, feeds, ...) goes stale.
+
+    Kept in the database so every web and job worker sees the same value;
+    read and bumped through ``sac_project.versions``.
+    """
+
+    key = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=1)
+    modified = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.key} v{self.version}'
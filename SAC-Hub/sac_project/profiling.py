@@ -0,0 +1,237 @@
+"""
+On-demand profiling of single requests.
+
+With ``PROFILING['ENABLED']`` on, a staff member (or a user with one of
+``PROFILING['ROLES']``) can add ``?_profile=1`` to a URL, or send the
+``X-Profile: 1`` header, to have that one request profiled:
+
+* ``cprofile`` (the default, also selected by ``1``): deterministic cProfile.
+  Writes ``<name>.prof`` (load it with ``pstats``, snakeviz, ...) and
+  ``<name>.collapsed.txt``, collapsed stacks derived from the cProfile call
+  graph, weighted in microseconds.
+* ``sample``: a background thread samples the request thread's stack every
+  ``SAMPLE_INTERVAL`` seconds. Much lower overhead; writes
+  ``<name>.collapsed.txt`` weighted in samples.
+
+Collapsed stack files feed straight into ``flamegraph.pl`` or speedscope.
+Only the newest ``KEEP`` profiles are kept in ``DIR``. The response carries the
+profile name in ``X-Profile-Name``; staff can download the files from the
+performance page.
+
+When profiling is disabled the middleware removes itself from the stack at
+start-up (``MiddlewareNotUsed``), so it costs nothing.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+DEFAULTS = {
+    'ENABLED': False,
+    'DIR': None,  # defaults to BASE_DIR / 'profiles'
+    'KEEP': 50,
+    'QUERY_PARAM': '_profile',
+    'HEADER': 'X-Profile',
+    # Besides staff, users with any of these roles may profile requests
+    'ROLES': ['ADMIN'],
+    'SAMPLE_INTERVAL': 0.001,
+}
+
+MODES = ('cprofile', 'sample')
+SUFFIXES = ('.prof', '.collapsed.txt')
+
+_UNSAFE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+def profiling_setting(name):
+    return getattr(settings, 'PROFILING', {}).get(name, DEFAULTS[name])
+
+
+def profile_dir():
+    return Path(profiling_setting('DIR') or settings.BASE_DIR / 'profiles')
+
+
+def can_profile(user):
+    if not user.is_authenticated:
+        return False
+    return user.is_staff or any(role in (user.roles or []) for role in profiling_setting('ROLES'))
+
+
+@lru_cache(maxsize=8192)
+def _frame_label(filename, lineno, function):
+    for prefix in sorted({str(settings.BASE_DIR), *sys.path}, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    # ';' separates frames in the collapsed format
+    return f'{function} ({filename}:{lineno})'.replace(';', ':')
+
+
+def collapse_cprofile(stats, max_depth=60):
+    """Collapsed stacks from a cProfile call graph.
+
+    cProfile only records caller -> callee edges, so a callee's children are
+    scaled by the share of its time spent on behalf of each caller (the usual
+    approximation of flameprof and gprof2dot).
+    """
+    entries = stats.stats
+    callees = {}
+    incoming = Counter()
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge))
+            incoming[func] += edge[3]
+    # Share of each function's calls that came from outside the profile (roots)
+    external = {}
+    for func, (primitive_calls, calls, _, _, callers) in entries.items():
+        outside = calls - sum(edge[1] for edge in callers.values())
+        external[func] = min(outside / primitive_calls, 1.0) if outside > 0 and primitive_calls else 0.0
+    stacks = Counter()
+
+    def walk(func, path, seen, share):
+        # share: fraction of func's time spent below this path; the shares
+        # of all paths to a function add up to at most 1
+        path = path + (_frame_label(*func),)
+        stacks[';'.join(path)] += entries[func][2] * share
+        if len(path) >= max_depth:
+            return
+        for callee, edge in callees.get(func, ()):
+            if callee in seen or not incoming[callee]:
+                continue
+            callee_share = share * edge[3] / incoming[callee] * (1 - external[callee])
+            # Recursion is folded into the first frame; negligible branches are dropped
+            if entries[callee][3] * callee_share >= 1e-5:
+                walk(callee, path, seen | {callee}, callee_share)
+
+    for func, share in external.items():
+        if share:
+            walk(func, (), {func}, share)
+    return [(stack, round(seconds * 1_000_000)) for stack, seconds in stacks.items() if seconds > 0]
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a helper thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(_frame_label(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _write_collapsed(path, stacks):
+    with open(path, 'w') as fh:
+        for stack, weight in sorted(stacks):
+            if weight:
+                fh.write(f'{stack} {weight}\n')
+
+
+def enforce_retention(directory, keep):
+    """Delete the oldest profiles beyond ``keep`` (a profile is its .prof/.collapsed.txt pair)."""
+    names = {}
+    for path in directory.iterdir():
+        for suffix in SUFFIXES:
+            if path.name.endswith(suffix):
+                name = path.name[:-len(suffix)]
+                names[name] = max(names.get(name, 0), path.stat().st_mtime)
+    for name in sorted(names, key=names.get, reverse=True)[keep:]:
+        for suffix in SUFFIXES:
+            (directory / f'{name}{suffix}').unlink(missing_ok=True)
+
+
+def list_profiles():
+    """[(name, [file names], modified datetime)] for the stored profiles, newest first."""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = {}
+    for path in directory.iterdir():
+        for suffix in SUFFIXES:
+            if path.name.endswith(suffix):
+                name = path.name[:-len(suffix)]
+                files, modified = profiles.get(name, ([], 0))
+                profiles[name] = (files + [path.name], max(modified, path.stat().st_mtime))
+    return [
+        (name, sorted(files), datetime.fromtimestamp(modified))
+        for name, (files, modified) in sorted(profiles.items(), key=lambda item: item[1][1], reverse=True)
+    ]
+
+
+class ProfilingMiddleware:
+    """Profile a request when asked to by an authorised user (see module docstring).
+
+    Must come after ``AuthenticationMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        if not profiling_setting('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        flag = request.GET.get(profiling_setting('QUERY_PARAM')) or request.headers.get(profiling_setting('HEADER'))
+        if not flag or not can_profile(request.user):
+            return self.get_response(request)
+        mode = 'cprofile' if flag in ('1', 'true') else flag
+        if mode not in MODES:
+            return self.get_response(request)
+
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        if mode == 'cprofile':
+            # Imported here: profiling is rare and pstats is slow to import
+            import cProfile
+            import pstats
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        else:
+            with StackSampler(threading.get_ident(), profiling_setting('SAMPLE_INTERVAL')) as sampler:
+                response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        view = match.view_name if match else request.path.strip('/') or 'root'
+        name = _UNSAFE.sub('-', f"{datetime.now():%Y%m%d-%H%M%S-%f}-{view}-{mode}-{elapsed_ms:.0f}ms")
+        if mode == 'cprofile':
+            stats = pstats.Stats(profiler)
+            stats.dump_stats(directory / f'{name}.prof')
+            _write_collapsed(directory / f'{name}.collapsed.txt', collapse_cprofile(stats))
+        else:
+            _write_collapsed(directory / f'{name}.collapsed.txt', sampler.samples.items())
+        enforce_retention(directory, profiling_setting('KEEP'))
+        response['X-Profile-Name'] = name
+        return response
@@ -0,0 +1,310 @@
+"""
+In-process publish/subscribe used to push notifications to connected clients.
+
+Subscribers are Server-Sent Events connections (see ``stream_views``). Publishers
+are the ``Notification`` post_save hook and broadcast announcements. The backend
+decides how a published event reaches the brokers of the running processes:
+
+* ``LocalBackend`` delivers it inside the publishing process only.
+* ``SQLiteSpoolBackend`` (the default) appends it to a shared SQLite file that
+  every worker tails, so several ASGI workers on one host, and the job workers
+  that send notifications (``manage.py run_workers``), reach every client
+  without an external message broker.
+
+Pick the backend with ``REALTIME['BACKEND']`` in settings.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_CHANNEL = 'broadcast'
+
+DEFAULTS = {
+    # Shared, since job workers publish notifications too
+    'BACKEND': 'sac_project.realtime.SQLiteSpoolBackend',
+    'OPTIONS': {},
+    # Events buffered per connection before it is treated as a slow consumer
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT_SECONDS': 20,
+    'RETRY_MILLISECONDS': 3000,
+    # Maximum rows re-sent when a client reconnects with Last-Event-ID
+    'REPLAY_LIMIT': 200,
+}
+
+
+def realtime_setting(name):
+    return getattr(settings, 'REALTIME', {}).get(name, DEFAULTS[name])
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """Bounded mailbox for a single connected client.
+
+    ``deliver`` always runs on the subscriber's own event loop. When the mailbox
+    is full the buffered events are dropped and ``overflowed`` is set; the
+    stream then resynchronises from the database instead of letting a slow
+    client grow memory without bound.
+    """
+
+    def __init__(self, channels, maxsize, loop):
+        self.channels = tuple(channels)
+        self.maxsize = maxsize
+        self.loop = loop
+        self.queue = deque()
+        self.overflowed = False
+        self._ready = asyncio.Event()
+
+    def deliver(self, event):
+        if len(self.queue) >= self.maxsize:
+            self.queue.clear()
+            self.overflowed = True
+        else:
+            self.queue.append(event)
+        self._ready.set()
+
+    async def wait(self, timeout=None):
+        """Wait until something is pending. Returns False on timeout."""
+        if self.queue or self.overflowed:
+            return True
+        self._ready.clear()
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def take_overflow(self):
+        overflowed, self.overflowed = self.overflowed, False
+        return overflowed
+
+    def drain(self):
+        while self.queue:
+            yield self.queue.popleft()
+
+
+def _deliver_all(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.deliver(event)
+
+
+class Broker:
+    """Fans published events out to the subscriptions of this process."""
+
+    def __init__(self, backend, queue_size):
+        self.backend = backend
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, channels):
+        """Register a subscription; must be called from a running event loop."""
+        subscription = Subscription(channels, self.queue_size, asyncio.get_running_loop())
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].add(subscription)
+        self.backend.start(self)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({sub for subs in self._subscriptions.values() for sub in subs})
+
+    def publish(self, channel, event):
+        self.backend.publish(self, channel, event)
+
+    def dispatch(self, channel, event):
+        """Hand ``event`` to every local subscriber of ``channel``.
+
+        Safe to call from any thread. Subscriptions are grouped per event loop
+        so a broadcast costs one wake-up per loop, not one per connection.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        by_loop = defaultdict(list)
+        for subscription in subscriptions:
+            by_loop[subscription.loop].append(subscription)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver_all, group, event)
+            except RuntimeError:
+                # The loop has shut down; its connections are gone.
+                for subscription in group:
+                    self.unsubscribe(subscription)
+        return len(subscriptions)
+
+
+class LocalBackend:
+    """Deliver events to subscribers in the publishing process only."""
+
+    def __init__(self, **options):
+        pass
+
+    def start(self, broker):
+        pass
+
+    def publish(self, broker, channel, event):
+        broker.dispatch(channel, event)
+
+
+class SQLiteSpoolBackend:
+    """Share events between worker processes through a SQLite spool file.
+
+    ``publish`` appends a row; each process that has subscribers runs one
+    tailing thread that reads new rows and dispatches them locally. This is a
+    stand-in for a network pub/sub server when all workers share one host.
+    """
+
+    def __init__(self, path=None, poll_interval=0.25, retention_seconds=300, **options):
+        self.path = str(path or settings.BASE_DIR / 'realtime_spool.sqlite3')
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._published = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS spool ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, '
+                'payload TEXT NOT NULL, created REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def publish(self, broker, channel, event):
+        conn = self._connection()
+        conn.execute(
+            'INSERT INTO spool (channel, payload, created) VALUES (?, ?, ?)',
+            (channel, json.dumps(event), time.time()),
+        )
+        self._published += 1
+        if self._published % 500 == 0:
+            conn.execute('DELETE FROM spool WHERE created < ?', (time.time() - self.retention_seconds,))
+
+    def start(self, broker):
+        with self._lock:
+            if self._thread is not None:
+                return
+            row = self._connection().execute('SELECT COALESCE(MAX(id), 0) FROM spool').fetchone()
+            self._thread = threading.Thread(
+                target=self._tail, args=(broker, row[0]), name='realtime-spool', daemon=True
+            )
+            self._thread.start()
+
+    def _tail(self, broker, cursor):
+        conn = self._connection()
+        while True:
+            try:
+                rows = conn.execute(
+                    'SELECT id, channel, payload FROM spool WHERE id > ? ORDER BY id LIMIT 500', (cursor,)
+                ).fetchall()
+            except sqlite3.Error:
+                logger.exception('Realtime spool read failed')
+                rows = []
+            for row_id, channel, payload in rows:
+                cursor = row_id
+                broker.dispatch(channel, json.loads(payload))
+            if not rows:
+                time.sleep(self.poll_interval)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend_class = import_string(realtime_setting('BACKEND'))
+                backend = backend_class(**realtime_setting('OPTIONS'))
+                _broker = Broker(backend, realtime_setting('QUEUE_SIZE'))
+    return _broker
+
+
+@receiver(setting_changed)
+def _reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'REALTIME':
+        _broker = None
+
+
+_suppressed = threading.local()
+
+
+@contextlib.contextmanager
+def suppress_notification_push():
+    """Skip per-row pushes, e.g. while a broadcast fans out one row per user."""
+    previous = getattr(_suppressed, 'active', False)
+    _suppressed.active = True
+    try:
+        yield
+    finally:
+        _suppressed.active = previous
+
+
+def push_suppressed():
+    return getattr(_suppressed, 'active', False)
+
+
+def notification_event(notification):
+    return {
+        'type': 'notification',
+        'id': notification.id,
+        'message': notification.message,
+        'important': notification.important,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+    }
+
+
+def publish_notification(notification):
+    get_broker().publish(user_channel(notification.user_id), notification_event(notification))
+
+
+def publish_announcement(message, important=False, last_id=None):
+    """Push one event to every connected user.
+
+    ``last_id`` is the highest ``Notification`` id written for the announcement;
+    clients store it as their Last-Event-ID so a reconnect does not replay the
+    per-user copies of the same message. Inside a transaction the push waits
+    for the commit, so clients never hear of rows that were rolled back.
+    """
+    event = {
+        'type': 'announcement',
+        'id': last_id,
+        'message': message,
+        'important': important,
+    }
+    transaction.on_commit(lambda: get_broker().publish(BROADCAST_CHANNEL, event))
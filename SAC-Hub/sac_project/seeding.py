@@ -0,0 +1,449 @@
+"""
+Deterministic synthetic campus data for benchmarks (``manage.py seed_campus``).
+
+Everything is drawn from one ``random.Random(seed)`` and timestamps are laid
+out around a fixed anchor date, so the same spec always produces the same
+rows. The shape follows what the real deployment sees:
+
+* department and club sizes are heavy-tailed (a few very large clubs, a long
+  tail of small ones);
+* events cluster around fest weeks, and registrations arrive in a rush soon
+  after an event opens, not evenly over time;
+* about one event in a hundred is a campus-wide event with 2,000+ registrations,
+  and capacity-limited events overflow into a waitlist;
+* past events have one or more locked attendance sessions;
+* notifications favour active users, and old ones have mostly been read.
+
+Rows are written with ``bulk_create`` in chunks inside a single transaction.
+Model ``save()`` methods and signals do not run.
+"""
+import math
+import random
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.utils import timezone
+
+from attendance.models import Attendance, AttendanceSession
+from calendar_app.engine import invalidate as invalidate_calendar
+from events.models import Event, EventRegistration
+from events.search import get_backend as get_search_backend
+from users.directory import rebuild_keys as rebuild_user_search_keys
+from users.models import Club, Department, Notification, User
+
+DISCIPLINES = [
+    'Computer Science', 'Information Technology', 'Electronics & Communication', 'Electrical Engineering',
+    'Mechanical Engineering', 'Civil Engineering', 'Chemical Engineering', 'Biotechnology', 'Aerospace Engineering',
+    'Artificial Intelligence', 'Data Science', 'Cyber Security', 'Mathematics', 'Physics', 'Chemistry',
+    'Economics', 'Commerce', 'Management Studies', 'English', 'Psychology', 'Architecture', 'Design',
+    'Pharmacy', 'Law', 'Media Studies', 'Agricultural Engineering', 'Biomedical Engineering', 'Statistics',
+    'Environmental Science', 'Metallurgy',
+]
+CLUB_THEMES = [
+    'Robotics', 'Coding', 'Music', 'Dance', 'Drama', 'Photography', 'Literary', 'Quiz', 'Debate', 'Entrepreneurship',
+    'Astronomy', 'Eco', 'Film', 'Fine Arts', 'Gaming', 'AI', 'Cyber', 'Chess', 'Yoga', 'Fitness', 'Rotaract',
+    'NSS', 'Design', 'Electronics', 'Aero', 'Automotive', 'Finance', 'Heritage', 'Culinary', 'Social Outreach',
+]
+EVENT_TYPES = ['Workshop', 'Seminar', 'Hackathon', 'Competition', 'Cultural', 'Sports', 'Guest Lecture', 'Fest']
+# (venue, seats)
+VENUES = [
+    ('Main Auditorium', 1200), ('Open Air Theatre', 3000), ('Seminar Hall 1', 250), ('Seminar Hall 2', 180),
+    ('SRB-308', 60), ('WB310', 80), ('Library Hall', 120), ('Sports Complex', 2500), ('Lab Block 2', 70),
+]
+NOTIFICATION_TEMPLATES = [
+    "Your registration for '{event}' is confirmed.",
+    "Reminder: '{event}' starts tomorrow.",
+    "Attendance for '{event}' has been recorded.",
+    "Status of event '{event}' changed to Approved.",
+    "New event '{event}' has been submitted for your club.",
+    "Certificates for '{event}' are now available.",
+]
+
+
+@dataclass
+class CampusSpec:
+    students: int = 20000
+    faculty: int = 800
+    departments: int = 60
+    clubs: int = 150
+    events: int = 5000
+    notifications: int = 1_000_000
+    # Share of events that draw a campus-wide crowd (2k+ registrations)
+    mega_event_rate: float = 0.01
+    # Median registrations of an ordinary event
+    median_registrations: int = 60
+    seed: int = 1
+    # Day the timeline is built around (defaults to today)
+    anchor: datetime = None
+    chunk_size: int = 5000
+    # Raw password for every generated account; None leaves them unusable
+    password: str = None
+
+
+@dataclass
+class CampusSummary:
+    counts: dict = field(default_factory=dict)
+
+    def __str__(self):
+        return ', '.join(f'{count} {name}' for name, count in self.counts.items())
+
+
+def use_sqlite_file(path, alias='campus'):
+    """Register ``path`` as database ``alias`` (same engine settings as default) and migrate it."""
+    connections.databases[alias] = {**connections.databases['default'], 'NAME': str(path)}
+    call_command('migrate', database=alias, verbosity=0)
+    return alias
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Keep generated values for auto_now/auto_now_add fields during bulk inserts."""
+    fields = [
+        f for model in models for f in model._meta.concrete_fields
+        if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)
+    ]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+class CampusGenerator:
+    def __init__(self, spec, using='default', log=None):
+        self.spec = spec
+        self.using = using
+        self.log = log or (lambda message: None)
+        self.rng = random.Random(spec.seed)
+        anchor = spec.anchor or timezone.localdate()
+        if not isinstance(anchor, datetime):
+            anchor = datetime.combine(anchor, dt_time(9, 0))
+        self.anchor = timezone.make_aware(anchor) if timezone.is_naive(anchor) else anchor
+        self.password = make_password(spec.password) if spec.password else '!'
+        self.summary = CampusSummary()
+
+    # -- helpers -----------------------------------------------------------
+
+    def insert(self, model, objects, name=None):
+        """bulk_create an iterable in chunks; returns the created objects."""
+        created = []
+        objects = iter(objects)
+        while True:
+            chunk = list(islice(objects, self.spec.chunk_size))
+            if not chunk:
+                break
+            created.extend(model.objects.using(self.using).bulk_create(chunk))
+        self.summary.counts[name or str(model._meta.verbose_name_plural)] = len(created)
+        return created
+
+    def insert_streamed(self, model, objects, name):
+        """Like ``insert`` but keeps nothing in memory (for the big tables)."""
+        total = 0
+        objects = iter(objects)
+        while True:
+            chunk = list(islice(objects, self.spec.chunk_size))
+            if not chunk:
+                break
+            model.objects.using(self.using).bulk_create(chunk)
+            total += len(chunk)
+        self.summary.counts[name] = total
+        return total
+
+    def heavy_tailed_weights(self, count, alpha):
+        return [self.rng.paretovariate(alpha) for _ in range(count)]
+
+    def cumulative(self, weights):
+        total, cumulative = 0.0, []
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        return cumulative
+
+    # -- generation --------------------------------------------------------
+
+    def run(self):
+        connection = connections[self.using]
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+        with transaction.atomic(using=self.using), explicit_timestamps(
+            Event, EventRegistration, AttendanceSession, Attendance, Notification
+        ):
+            self.make_departments()
+            self.make_clubs()
+            self.make_people()
+            self.make_events()
+            self.make_registrations()
+            self.make_attendance()
+            self.make_notifications()
+            # bulk_create skips the signals that maintain the search indexes
+            get_search_backend(self.using).rebuild()
+            rebuild_user_search_keys(self.using)
+        invalidate_calendar(using=self.using)
+        return self.summary
+
+    def make_departments(self):
+        names = []
+        for index in range(self.spec.departments):
+            base = DISCIPLINES[index % len(DISCIPLINES)]
+            names.append(base if index < len(DISCIPLINES) else f'{base} {index // len(DISCIPLINES) + 1}')
+        self.departments = self.insert(Department, (Department(name=name) for name in names))
+        self.department_codes = [f'{index:02d}' for index in range(len(self.departments))]
+        self.department_weights = self.cumulative(self.heavy_tailed_weights(len(self.departments), 1.5))
+        self.log(f'{len(self.departments)} departments')
+
+    def make_clubs(self):
+        names = []
+        for index in range(self.spec.clubs):
+            theme = CLUB_THEMES[index % len(CLUB_THEMES)]
+            names.append(f'{theme} Club' if index < len(CLUB_THEMES) else f'{theme} Society {index // len(CLUB_THEMES) + 1}')
+        self.clubs = self.insert(Club, (Club(name=name, description=f'{name} of the campus') for name in names))
+        # Very skewed popularity: a handful of clubs attract most members
+        self.club_weights = self.heavy_tailed_weights(len(self.clubs), 0.9)
+        self.log(f'{len(self.clubs)} clubs')
+
+    def make_people(self):
+        rng, spec = self.rng, self.spec
+        club_cumulative = self.cumulative(self.club_weights)
+        memberships = []  # (student index, club index)
+        for student in range(spec.students):
+            joined = min(int(rng.expovariate(0.9)), 6)
+            for club in set(rng.choices(range(len(self.clubs)), cum_weights=club_cumulative, k=joined)):
+                memberships.append((student, club))
+        self.members = [[] for _ in self.clubs]
+        for student, club in memberships:
+            self.members[club].append(student)
+        coordinators = {}
+        for club, members in enumerate(self.members):
+            pool = members or [rng.randrange(spec.students)]
+            for student in rng.sample(pool, min(2, len(pool))):
+                coordinators.setdefault(student, []).append(club)
+
+        departments = rng.choices(range(len(self.departments)), cum_weights=self.department_weights, k=spec.students)
+        serials = {}
+        students = []
+        for index in range(spec.students):
+            year = rng.choices([1, 2, 3, 4], weights=[30, 27, 23, 20])[0]
+            admitted = self.anchor.year - year + (1 if self.anchor.month >= 7 else 0)
+            department = departments[index]
+            key = (admitted, department)
+            serials[key] = serials.get(key, 0) + 1
+            roll_no = f'{admitted % 100:02d}{self.department_codes[department]}{serials[key]:05d}'
+            students.append(User(
+                username=roll_no, roll_no=roll_no, email=f'{roll_no.lower()}@campus.example',
+                first_name=f'Student{index}', last_name=self.departments[department].name.split()[0],
+                password=self.password, department_id=self.departments[department].id,
+                roles=['STUDENT', 'CLUB_COORDINATOR'] if index in coordinators else ['STUDENT'],
+                year_of_study=f"{year}{['st', 'nd', 'rd', 'th'][year - 1]} Year", section=rng.choice('ABCDEF'),
+                date_joined=self.anchor.replace(year=admitted, month=7, day=1),
+            ))
+        self.students = self.insert(User, students, 'students')
+
+        faculty = [
+            User(
+                username=f'faculty{index:04d}', email=f'faculty{index:04d}@campus.example',
+                first_name=f'Faculty{index}', last_name='Member', password=self.password,
+                department_id=rng.choice(self.departments).id,
+                roles=['FACULTY', 'CLUB_ADVISOR'] if index < len(self.clubs) else ['FACULTY'],
+                # Staff accounts are one to ten years old
+                date_joined=self.anchor - timedelta(days=365 * (1 + index % 10)),
+            )
+            for index in range(spec.faculty)
+        ]
+        faculty.append(User(username='sac_admin', email='sac_admin@campus.example', password=self.password,
+                            first_name='SAC', last_name='Admin', roles=['ADMIN', 'SAC_COORDINATOR'],
+                            date_joined=self.anchor - timedelta(days=365 * 10)))
+        self.faculty = self.insert(User, faculty, 'staff')
+
+        for index, club in enumerate(self.clubs):
+            club.advisor_id = self.faculty[index % len(self.faculty)].id
+        Club.objects.using(self.using).bulk_update(self.clubs, ['advisor'])
+        self.insert(User.clubs.through, (
+            User.clubs.through(user_id=self.students[student].id, club_id=self.clubs[club].id)
+            for student, club in memberships
+        ), 'club memberships')
+        self.insert(Club.coordinators.through, (
+            Club.coordinators.through(club_id=self.clubs[club].id, user_id=self.students[student].id)
+            for student, clubs in coordinators.items() for club in clubs
+        ), 'club coordinators')
+        self.coordinators = {club: [] for club in range(len(self.clubs))}
+        for student, clubs in coordinators.items():
+            for club in clubs:
+                self.coordinators[club].append(student)
+        self.log(f'{len(self.students)} students, {len(self.faculty)} staff, {len(memberships)} club memberships')
+
+    def event_date(self):
+        """Event times over the last 18 months and the next 4, with fest-week peaks."""
+        rng = self.rng
+        if rng.random() < 0.25:
+            # Fest weeks: mid-February, mid-September, mid-December of each year
+            year = self.anchor.year - rng.randint(0, 1)
+            month = rng.choice([2, 9, 12])
+            start = timezone.make_aware(datetime(year, month, 10, 9, 0))
+            moment = start + timedelta(days=rng.uniform(0, 7))
+            if -540 <= (moment - self.anchor).days <= 120:
+                return moment.replace(minute=0, second=0, microsecond=0)
+        moment = self.anchor + timedelta(days=rng.uniform(-540, 120))
+        return moment.replace(hour=rng.choice([9, 10, 11, 14, 15, 16, 18]), minute=0, second=0, microsecond=0)
+
+    def make_events(self):
+        rng, spec = self.rng, self.spec
+        club_cumulative = self.cumulative([weight ** 0.7 for weight in self.club_weights])
+        events = []
+        self.event_meta = []  # (club index or None, is mega event)
+        for index in range(spec.events):
+            date_time = self.event_date()
+            past = date_time < self.anchor
+            mega = rng.random() < spec.mega_event_rate
+            club = None if rng.random() < 0.15 else rng.choices(range(len(self.clubs)), cum_weights=club_cumulative)[0]
+            if past:
+                status = rng.choices(['COMPLETED', 'APPROVED', 'REJECTED'], weights=[60, 35, 5])[0]
+            else:
+                status = rng.choices(['APPROVED', 'PENDING', 'DRAFT', 'REJECTED'], weights=[70, 20, 5, 5])[0]
+            venue, seats = rng.choice(VENUES[:2] + VENUES[7:8]) if mega else rng.choice(VENUES)
+            created_at = date_time - timedelta(days=rng.uniform(10, 40))
+            events.append(Event(
+                name=f"{'Campus Fest' if mega else rng.choice(EVENT_TYPES)} {index + 1}"
+                     f"{'' if club is None else ' - ' + self.clubs[club].name}",
+                event_type='Fest' if mega else rng.choice(EVENT_TYPES),
+                description='Synthetic event generated for benchmarking.',
+                date_time=date_time, venue=venue,
+                end_time=date_time + (timedelta(days=rng.choice([1, 2, 3])) if mega else timedelta(hours=rng.choice([1, 2, 3]))),
+                club_id=None if club is None else self.clubs[club].id,
+                department_id=rng.choice(self.departments).id if club is None else None,
+                status=status, capacity=seats if rng.random() < 0.4 else None,
+                created_by_id=self.faculty[rng.randrange(len(self.faculty))].id,
+                created_at=created_at, updated_at=created_at,
+            ))
+            self.event_meta.append((club, mega))
+        self.events = self.insert(Event, events)
+        self.insert(Event.organizers.through, (
+            Event.organizers.through(event_id=event.id, user_id=self.students[student].id)
+            for event, (club, _) in zip(self.events, self.event_meta) if club is not None
+            for student in self.coordinators[club]
+        ), 'event organizers')
+        self.log(f'{len(self.events)} events')
+
+    def make_registrations(self):
+        rng, spec = self.rng, self.spec
+        self.registered = {}  # event index -> student indexes holding a seat
+        mu = math.log(spec.median_registrations)
+
+        def rows():
+            for index, event in enumerate(self.events):
+                if event.status not in ('APPROVED', 'COMPLETED'):
+                    continue
+                club, mega = self.event_meta[index]
+                if mega:
+                    wanted = rng.randint(2000, 4000)
+                else:
+                    wanted = int(rng.lognormvariate(mu, 0.9))
+                wanted = min(wanted, spec.students)
+                # Club members sign up first, then the rest of campus
+                chosen = list(rng.sample(self.members[club], min(len(self.members[club]), int(wanted * 0.6)))) if club is not None else []
+                seen = set(chosen)
+                while len(chosen) < wanted:
+                    student = rng.randrange(spec.students)
+                    if student not in seen:
+                        seen.add(student)
+                        chosen.append(student)
+                # Registration rush: most sign-ups within hours of opening
+                opens = event.created_at + timedelta(days=rng.uniform(1, 5))
+                window = max((event.date_time - opens).total_seconds(), 3600)
+                moments = sorted(min(rng.expovariate(1 / 21600), window * 0.98) for _ in chosen)
+                seats, holders = 0, []
+                for student, offset in zip(chosen, moments):
+                    registered_at = opens + timedelta(seconds=offset)
+                    if rng.random() < 0.05:
+                        status = 'CANCELLED'
+                    elif event.capacity is not None and seats >= event.capacity:
+                        status = 'WAITLISTED'
+                    else:
+                        status = 'REGISTERED'
+                        seats += 1
+                        holders.append(student)
+                    yield EventRegistration(
+                        event_id=event.id, student_id=self.students[student].id, status=status,
+                        registered_at=registered_at, updated_at=registered_at,
+                    )
+                event.registered_count = seats
+                self.registered[index] = holders
+
+        total = self.insert_streamed(EventRegistration, rows(), 'registrations')
+        Event.objects.using(self.using).bulk_update(self.events, ['registered_count'], batch_size=self.spec.chunk_size)
+        self.log(f'{total} registrations')
+
+    def make_attendance(self):
+        rng = self.rng
+        sessions, plan = [], []
+        for index, holders in self.registered.items():
+            event = self.events[index]
+            if event.date_time >= self.anchor or not holders:
+                continue
+            count = 1 if rng.random() < 0.7 else rng.randint(2, 4)
+            for number in range(count):
+                started = event.date_time + timedelta(hours=2 * number)
+                sessions.append(AttendanceSession(
+                    event_id=event.id, label=f'Session {number + 1}', created_at=started,
+                    open_at=started, close_at=started + timedelta(hours=1), submitted_at=started + timedelta(hours=1),
+                    locked=True, attendance_code=f'S{len(sessions):011d}',
+                ))
+                plan.append(index)
+        sessions = self.insert(AttendanceSession, sessions, 'attendance sessions')
+
+        def rows():
+            serial = 0
+            turned_up = {}
+            for session, index in zip(sessions, plan):
+                if index not in turned_up:
+                    # Whether each student came at all is decided once per event
+                    turned_up[index] = {student for student in self.registered[index] if rng.random() < 0.85}
+                for student in self.registered[index]:
+                    present = student in turned_up[index] and rng.random() < 0.92
+                    serial += 1
+                    yield Attendance(
+                        session_id=session.id, student_id=self.students[student].id,
+                        status='PRESENT' if present else 'ABSENT', ref_code=f'R{serial:011d}',
+                        timestamp=session.created_at + timedelta(minutes=rng.randint(0, 50)),
+                    )
+
+        total = self.insert_streamed(Attendance, rows(), 'attendance records')
+        self.log(f'{len(sessions)} attendance sessions, {total} attendance records')
+
+    def make_notifications(self):
+        rng, spec = self.rng, self.spec
+        recipients = self.students + self.faculty
+        cumulative = self.cumulative(self.heavy_tailed_weights(len(recipients), 1.2))
+        event_names = [event.name for event in self.events]
+
+        def rows():
+            remaining = spec.notifications
+            while remaining:
+                batch = min(remaining, spec.chunk_size)
+                remaining -= batch
+                for user in rng.choices(recipients, cum_weights=cumulative, k=batch):
+                    # More recent days see more traffic
+                    age = timedelta(days=540 * rng.random() ** 1.6)
+                    yield Notification(
+                        user_id=user.id,
+                        message=rng.choice(NOTIFICATION_TEMPLATES).format(event=rng.choice(event_names)),
+                        important=rng.random() < 0.05,
+                        read=rng.random() < (0.95 if age.days > 30 else 0.5),
+                        created_at=self.anchor - age,
+                    )
+
+        total = self.insert_streamed(Notification, rows(), 'notifications')
+        self.log(f'{total} notifications')
+
+
+def seed_campus(spec=None, using='default', log=None):
+    """Generate a campus described by ``spec`` into database ``using``."""
+    return CampusGenerator(spec or CampusSpec(), using=using, log=log).run()
@@ -56,16 +56,21 @@ INSTALLED_APPS = [
     "attendance",
     "calendar_app",
     "certificate",
+    "jobs",
     # Third-party
     "rest_framework",  # Temporarily disabled
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the middleware stack
+    "sac_project.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # Removes itself unless PROFILING['ENABLED']; needs request.user
+    "sac_project.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -108,6 +113,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # A file (not the default in-memory database) so that tests can
+        # exercise concurrent connections
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 # Custom user model
@@ -168,3 +176,142 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
+
+# Log in with a username, email or roll number (users.backends)
+AUTHENTICATION_BACKENDS = ['users.backends.IdentifierBackend']
+LOGIN_IDENTITY = {
+    'ROLL_NO_PATTERN': r'^[A-Za-z]{0,5}\d{3,}$',
+    # Seconds before the session's cached roles are re-read
+    'ROLE_PROFILE_MAX_AGE': 300,
+}
+
+# Real-time notification push (Server-Sent Events at /notifications/stream/).
+# The stream stays open only when served by the ASGI application, e.g.
+#   uvicorn sac_project.asgi:application --workers 4
+# Notifications are also published by job workers (manage.py run_workers), so
+# events go through a spool file that every process on this host reads.
+# LocalBackend only reaches clients of the publishing process.
+REALTIME = {
+    'BACKEND': 'sac_project.realtime.SQLiteSpoolBackend',
+    'OPTIONS': {'path': BASE_DIR / 'realtime_spool.sqlite3'},
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT_SECONDS': 20,
+    'RETRY_MILLISECONDS': 3000,
+    'REPLAY_LIMIT': 200,
+}
+
+# Notification retention (python manage.py prune_notifications [--dry-run]).
+# Matching rows are archived in batches, then removed from the live table.
+NOTIFICATION_RETENTION = {
+    'POLICIES': [
+        {'name': 'read-90d', 'read': True, 'older_than_days': 90},
+        {'name': 'unread-365d', 'read': False, 'older_than_days': 365, 'important': False},
+    ],
+    'ARCHIVE': 'file',  # 'file' (gzip JSON lines per month) or 'table' (ArchivedNotification)
+    'ARCHIVE_DIR': BASE_DIR / 'archive' / 'notifications',
+    'BATCH_SIZE': 1000,
+}
+
+# Per-request latency/query instrumentation (sac_project.instrumentation).
+# The staff page at /admin/performance/ shows the slowest and chattiest views.
+INSTRUMENTATION = {
+    'ENABLED': True,
+    'BUFFER_SIZE': 2000,
+    'LOG': False,  # JSON line per request on the 'sac_project.instrumentation' logger
+    'LOG_SLOW_ONLY': True,
+    'SLOW_REQUEST_MS': 500,
+    'DUPLICATE_THRESHOLD': 3,
+    'EXCLUDE_PATHS': ['/static/', '/media/', '/notifications/stream/'],
+}
+
+# Prometheus metrics served at /metrics (sac_project.metrics). The 'file' store
+# sums the samples of all worker processes on this host in one SQLite file.
+METRICS = {
+    'ENABLED': True,
+    'STORE': 'file',
+    'PATH': BASE_DIR / 'metrics.sqlite3',
+    'FLUSH_SECONDS': 2,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'TOKEN': None,  # scrapers from other hosts send "Authorization: Bearer <TOKEN>"
+}
+
+# Opt-in per-request profiling (sac_project.profiling): when enabled, staff add
+# ?_profile=1 (cProfile) or ?_profile=sample to a URL, or send "X-Profile: 1".
+PROFILING = {
+    'ENABLED': False,
+    'DIR': BASE_DIR / 'profiles',
+    'KEEP': 50,
+    'ROLES': ['ADMIN'],
+}
+
+# Student autocomplete (users.directory)
+STUDENT_DIRECTORY = {
+    'LIMIT': 20,
+    # Serve autocomplete from an in-process prefix index instead of SQL
+    'IN_PROCESS_INDEX': False,
+    'INDEX_MAX_AGE': 300,
+}
+
+# Event calendar month grids (calendar_app.engine)
+CALENDAR = {
+    'GRID_TIMEOUT': 3600,
+    # Longest window /api/calendar/ serves
+    'MAX_RANGE_DAYS': 366,
+    # ICS feeds (calendar_app.feeds) leave out events older than this
+    'FEED_PAST_DAYS': 90,
+    'FEED_TIMEOUT': 3600,
+}
+
+# Bulk user import (users.bulk_import)
+USER_IMPORT = {
+    'CHUNK_SIZE': 1000,
+    # Password hashing processes; None uses every core
+    'WORKERS': None,
+    # Set e.g. 100_000 to hash initial passwords cheaply; they are upgraded
+    # to the full PBKDF2 cost at first login
+    'PASSWORD_ITERATIONS': None,
+    'REPORT_DIR': BASE_DIR / 'imports',
+}
+
+# Background jobs (jobs.queue): certificate ZIPs, notification fan-out and
+# exports are queued by the views and run by
+#   python manage.py run_workers [--workers N]
+# Workers are separate processes, so their real-time pushes only reach
+# browsers with REALTIME['BACKEND'] set to SQLiteSpoolBackend.
+JOBS = {
+    'WORKERS': 2,
+    'POLL_SECONDS': 1,
+    'MAX_ATTEMPTS': 3,
+    # Retry n waits BACKOFF_SECONDS * 2 ** (n - 1), at most MAX_BACKOFF_SECONDS
+    'BACKOFF_SECONDS': 10,
+    'MAX_BACKOFF_SECONDS': 600,
+    # A job whose worker has not reported for this long is retried
+    'LOCK_TIMEOUT': 600,
+    # Run jobs in the web process after the request commits (no workers needed)
+    'EAGER': False,
+    # Finished jobs (and their files) are deleted after this many days by
+    # `manage.py prune_jobs`, which should run daily from cron
+    'KEEP_DAYS': 7,
+}
+
+# Resized copies of event thumbnails and club logos (sac_project.images);
+# `manage.py derive_images` backfills existing uploads
+IMAGES = {
+    'WIDTHS': (320, 640, 1280),
+    'QUALITY': 80,
+}
+
+# Cache lookups are counted in the sac_cache_requests metric. The cache is
+# shared by all worker processes on this host; with several hosts use
+# MeteredDatabaseCache (after `manage.py createcachetable`) or MeteredRedisCache.
+CACHES = {
+    'default': {
+        'BACKEND': 'sac_project.metrics.MeteredFileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# `manage.py test` swaps the stores shared through files on this host (cache,
+# metrics, realtime spool) for per-process ones; see sac_project.testing
+TEST_RUNNER = 'sac_project.testing.TestRunner'
@@ -0,0 +1,181 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.decorators import login_required
+from django.http import QueryDict, StreamingHttpResponse
+from django.http.cookie import parse_cookie
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from users.models import Notification
+from .realtime import (
+    BROADCAST_CHANNEL, get_broker, notification_event, realtime_setting, user_channel
+)
+
+
+def format_sse(event):
+    """Serialise an event dict in the text/event-stream wire format."""
+    lines = []
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event.get('type', 'message')}")
+    lines.append(f"data: {json.dumps(event)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def _parse_last_event_id(request):
+    raw = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(raw) if raw else None
+    except ValueError:
+        return None
+
+
+async def _fetch_since(user_id, cursor=None, since=None):
+    """Notifications the client has not seen yet, oldest first (capped)."""
+    qs = Notification.objects.filter(user_id=user_id)
+    if cursor is not None:
+        qs = qs.filter(id__gt=cursor)
+    elif since is not None:
+        qs = qs.filter(created_at__gte=since)
+    qs = qs.order_by('id')[:realtime_setting('REPLAY_LIMIT')]
+    return [notification async for notification in qs]
+
+
+async def _event_stream(user_id, cursor):
+    broker = get_broker()
+    subscription = broker.subscribe([user_channel(user_id), BROADCAST_CHANNEL])
+    connected_at = timezone.now()
+    heartbeat = realtime_setting('HEARTBEAT_SECONDS')
+    # Live events with an id at or below this were already sent by a replay
+    replayed_upto = None
+    try:
+        yield f"retry: {realtime_setting('RETRY_MILLISECONDS')}\n\n"
+        if cursor is not None:
+            for notification in await _fetch_since(user_id, cursor=cursor):
+                yield format_sse(notification_event(notification))
+                cursor = replayed_upto = notification.id
+
+        while True:
+            if not await subscription.wait(heartbeat):
+                yield ': keep-alive\n\n'
+                continue
+            if subscription.take_overflow():
+                # Too slow to keep up: the database is the source of truth.
+                for notification in await _fetch_since(user_id, cursor=cursor, since=connected_at):
+                    yield format_sse(notification_event(notification))
+                    cursor = replayed_upto = notification.id
+            for event in subscription.drain():
+                event_id = event.get('id')
+                if event_id is not None and replayed_upto is not None and event_id <= replayed_upto:
+                    continue
+                yield format_sse(event)
+                if event_id is not None:
+                    cursor = max(cursor or 0, event_id)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def _replay_once(user_id, cursor):
+    yield f"retry: {realtime_setting('RETRY_MILLISECONDS')}\n\n"
+    if cursor is None:
+        # Start from the newest notification; the id-only event makes the reconnect carry it
+        latest = Notification.objects.filter(user_id=user_id).order_by('-id').values_list('id', flat=True).first()
+        yield f"id: {latest or 0}\n\n"
+        return
+    pending = Notification.objects.filter(user_id=user_id, id__gt=cursor).order_by('id')
+    for notification in pending[:realtime_setting('REPLAY_LIMIT')]:
+        yield format_sse(notification_event(notification))
+
+
+@login_required
+def notifications_stream(request):
+    """Replay notifications pending since Last-Event-ID and end the response.
+
+    A connection without a cursor gets only the id of the user's newest
+    notification, which EventSource sends back as Last-Event-ID on reconnect.
+
+    Under ASGI this path never reaches Django: ``sse_application`` (mounted in
+    ``asgi.py``) keeps the stream open and pushes events live. A WSGI worker
+    cannot be parked on an idle client, so here EventSource simply reconnects
+    after the advertised retry delay.
+    """
+    response = StreamingHttpResponse(
+        _replay_once(request.user.id, _parse_last_event_id(request)),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _session_user_id(session_key):
+    """Resolve the authenticated user id for a session cookie value."""
+    store = import_string(settings.SESSION_ENGINE + '.SessionStore')(session_key)
+    user = get_user(SimpleNamespace(session=store))
+    return user.pk if user.is_authenticated else None
+
+
+async def _send_plain(send, status, body):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def sse_application(scope, receive, send):
+    """Long-lived notification stream served directly by the ASGI application.
+
+    Django's ASGI handler keeps a dedicated sync thread (and database
+    connection) alive for each in-flight request, which is far too much for
+    thousands of idle streams. This handler authenticates from the session
+    cookie once, then waits on the broker using only the event loop.
+    """
+    if scope['method'] != 'GET':
+        await _send_plain(send, 405, b'Method not allowed')
+        return
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    session_key = parse_cookie(headers.get('cookie', '')).get(settings.SESSION_COOKIE_NAME)
+    user_id = await sync_to_async(_session_user_id)(session_key) if session_key else None
+    if user_id is None:
+        await _send_plain(send, 403, b'Authentication required')
+        return
+
+    raw_cursor = headers.get('last-event-id') or QueryDict(scope.get('query_string', b'')).get('last_event_id')
+    try:
+        cursor = int(raw_cursor) if raw_cursor else None
+    except ValueError:
+        cursor = None
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+    ]})
+    stream = _event_stream(user_id, cursor)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        while True:
+            next_chunk = asyncio.ensure_future(stream.__anext__())
+            await asyncio.wait({next_chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_chunk.done():
+                # Client went away while the stream was idle; cancelling the
+                # pending step runs the generator's cleanup (unsubscribe).
+                next_chunk.cancel()
+                await asyncio.wait({next_chunk})
+                break
+            try:
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                break
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+    finally:
+        disconnected.cancel()
+        await stream.aclose()
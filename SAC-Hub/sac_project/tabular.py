@@ -0,0 +1,106 @@
+"""
+Streaming reader for uploaded spreadsheets (CSV and XLSX).
+
+``read_table`` yields one ``(row number, row)`` pair at a time, where the row
+is a namedtuple with one field per expected column, so an import never holds
+the whole file (or a DataFrame of it) in memory:
+
+* XLSX is read with openpyxl in read-only mode, which parses the sheet as it
+  is iterated instead of building every cell first;
+* CSV is decoded and split line by line (UTF-8, with or without a BOM).
+
+Headers are matched case-insensitively, with spaces and dashes read as
+underscores ("Roll Number" is ``roll_number``), then through the caller's
+aliases. Columns the caller did not ask for are ignored, missing ones are
+blank, and blank rows are skipped. Row numbers are those a spreadsheet shows
+(the header is row 1).
+
+Used by the bulk user import (``users.bulk_import``) and bulk certificate
+generation.
+"""
+import csv
+import io
+from collections import namedtuple
+from functools import lru_cache
+
+XLSX_EXTENSIONS = ('.xlsx', '.xlsm')
+
+
+class TabularError(ValueError):
+    """The file cannot be read as a table with the expected columns; the message is shown to the user."""
+
+
+def normalize_header(header, aliases=None):
+    name = '_'.join(str(header or '').strip().lower().replace('-', ' ').split())
+    return (aliases or {}).get(name, name)
+
+
+def cell(value):
+    """A cell as stripped text ('' for empty)."""
+    if value is None:
+        return ''
+    # Spreadsheets store roll numbers as numbers
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+@lru_cache(maxsize=None)
+def row_type(columns):
+    return namedtuple('Row', columns)
+
+
+def _csv_rows(handle):
+    text = io.TextIOWrapper(handle, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except UnicodeDecodeError:
+        raise TabularError('The file is not a UTF-8 CSV or an Excel (.xlsx) workbook.')
+    finally:
+        # Leave the underlying upload open for its owner
+        text.detach()
+
+
+def _xlsx_rows(handle):
+    from openpyxl import load_workbook
+
+    try:
+        workbook = load_workbook(handle, read_only=True, data_only=True)
+    except Exception as error:
+        raise TabularError(f'The file could not be opened as an Excel workbook ({error}).')
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_table(handle, name='', columns=(), aliases=None, required=()):
+    """Yield ``(row number, row)`` from a binary CSV or XLSX file (chosen by ``name``'s extension).
+
+    ``row`` has the fields ``columns``. Raises TabularError, before the first
+    row, if a ``required`` column has no header.
+    """
+    columns = tuple(columns)
+    rows = _xlsx_rows(handle) if name.lower().endswith(XLSX_EXTENSIONS) else _csv_rows(handle)
+    header = [normalize_header(title, aliases) for title in next(rows, ())]
+    missing = [column for column in required if column not in header]
+    if missing:
+        rows.close()
+        raise TabularError(f"Missing column(s): {', '.join(missing)}.")
+    # Position in the file of each expected column (None when absent)
+    positions = [header.index(column) if column in header else None for column in columns]
+    make = row_type(columns)._make
+    return _rows(rows, positions, make)
+
+
+def _rows(rows, positions, make):
+    try:
+        for number, values in enumerate(rows, start=2):
+            values = [cell(value) for value in values]
+            if not any(values):
+                continue
+            yield number, make(
+                values[position] if position is not None and position < len(values) else '' for position in positions
+            )
+    finally:
+        rows.close()
@@ -0,0 +1,14 @@
+"""Background tasks of the project app (see jobs.queue)."""
+from jobs.queue import PermanentError, task
+
+from .images import VariantError, derive
+
+
+@task('images.derive')
+def derive_variants(ctx, *, model, pk, field):
+    """Write the resized copies of one uploaded image (see sac_project.images)."""
+    try:
+        variants = derive(model, pk, field)
+    except VariantError as error:
+        raise PermanentError(str(error))
+    return {'widths': (variants or {}).get('widths', [])}
@@ -0,0 +1,37 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from ..images import FORMATS, is_current, variant_name, variants_field
+
+register = template.Library()
+
+
+def _srcset(image, variants, fmt):
+    return ', '.join(
+        f"{image.storage.url(variant_name(variants['source'], variants['digest'], width, fmt))} {width}w"
+        for width in variants['widths']
+    )
+
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', **attrs):
+    """An <img> for an uploaded image (e.g. ``event.thumbnail``) with ``srcset`` of its resized copies.
+
+    WebP is offered through <picture>, JPEG is the fallback. Until the copies
+    exist (see sac_project.images), the original is served. Other keyword
+    arguments (``alt``, ``class``, ...) become attributes of the <img>.
+    """
+    attrs.setdefault('alt', '')
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    variants = getattr(image.instance, variants_field(image.field.name), None)
+    if not is_current(image, variants) or not variants.get('widths'):
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+    largest = variant_name(variants['source'], variants['digest'], variants['widths'][-1], 'jpeg')
+    return format_html(
+        '<picture class="contents"><source type="{}" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        FORMATS['webp'][2], _srcset(image, variants, 'webp'), sizes,
+        image.storage.url(largest), _srcset(image, variants, 'jpeg'), sizes, flatatt(attrs),
+    )
@@ -0,0 +1,96 @@
+"""Test helpers shared by the apps' test suites."""
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+from django.urls import reverse
+
+from .instrumentation import collect
+
+
+def test_settings():
+    """Overrides that keep a test run from reading or leaving files next to the project."""
+    return {
+        'CACHES': {'default': {'BACKEND': 'sac_project.metrics.MeteredLocMemCache', 'LOCATION': 'default'}},
+        'METRICS': {**settings.METRICS, 'STORE': 'memory'},
+        'REALTIME': {**settings.REALTIME, 'BACKEND': 'sac_project.realtime.LocalBackend', 'OPTIONS': {}},
+    }
+
+
+class TestRunner(DiscoverRunner):
+    """``DiscoverRunner`` with ``test_settings()`` applied for the whole run."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._overrides = override_settings(**test_settings())
+        self._overrides.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._overrides.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+class QueryBudgetMixin:
+    """Adds ``assertMaxQueries`` to a Django ``TestCase``.
+
+    It uses the same collector as the request instrumentation, so a failure
+    lists the repeated query shapes the performance page would show.
+    """
+
+    def assertMaxQueries(self, view, n, *, args=None, kwargs=None, method='get', data=None,
+                         client=None, **extra):
+        """Request ``view`` (a URL name) and fail if it runs more than ``n`` queries.
+
+        Returns the response so the caller can make further assertions.
+        """
+        client = client or self.client
+        url = reverse(view, args=args, kwargs=kwargs)
+        with collect() as collector:
+            response = getattr(client, method)(url, data, **extra)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if collector.queries > n:
+            lines = [f'{view} ran {collector.queries} queries, expected at most {n}.']
+            repeated = collector.duplicates(threshold=2)
+            if repeated:
+                lines.append('Repeated query shapes:')
+                lines.extend(f'  {count}x {shape}' for shape, count in repeated)
+            lines.append('Queries:')
+            lines.extend(f'  {index}. {sql}' for index, sql in enumerate(collector.statements, 1))
+            self.fail('\n'.join(lines))
+        return response
+
+
+class TempDirMixin:
+    """Temporary directories and settings overrides undone when the test ends."""
+
+    def tempdir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        return directory
+
+    def use_settings(self, **settings):
+        override = override_settings(**settings)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class TempMediaMixin(TempDirMixin):
+    """Points MEDIA_ROOT at an empty directory for each test, and adds ``upload``."""
+
+    def setUp(self):
+        super().setUp()
+        self.media = self.tempdir()
+        self.use_settings(MEDIA_ROOT=self.media)
+
+    def upload(self, name, size, mode='RGB', fmt='PNG'):
+        """An uploaded ``fmt`` image; RGBA ones are fully transparent, others white."""
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new(mode, size, (0, 0, 0, 0) if mode == 'RGBA' else 'white').save(buffer, fmt)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{fmt.lower()}')
@@ -0,0 +1,412 @@
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from jobs.models import Job, JobStatus
+from jobs.queue import run_pending
+from users.models import Club, Notification, User
+from . import realtime
+from .images import variant_names
+from .management.commands.bench_startup import TARGETS, run_target
+from .metrics import (
+    CACHE_REQUESTS, JOB_DURATION, FileStore, MeteredLocMemCache, get_store, render_metrics, reset_metrics,
+)
+from .profiling import ProfilingMiddleware, enforce_retention, list_profiles
+from .realtime import (
+    BROADCAST_CHANNEL, Broker, LocalBackend, SQLiteSpoolBackend, get_broker, publish_announcement, user_channel,
+)
+from .stream_views import _event_stream, format_sse
+from .testing import TempDirMixin, TempMediaMixin
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_url_resolution_does_not_import_heavy_dependencies(self):
+        # A fresh interpreter: this test process may have imported them already
+        env = dict(os.environ)  # with DJANGO_SETTINGS_MODULE; overridden settings have no module
+        _, modules = run_target(TARGETS['wsgi+urls'], env)
+        self.assertIn('certificate.views', modules)
+        self.assertEqual([name for name in ('pandas', 'PIL') if name in modules], [])
+
+
+
+# Runs seed_campus --output in a fresh interpreter whose default database is an empty file
+SEED_SCRIPT = """
+import sys
+import django
+from django.conf import settings
+from django.core.management import call_command
+
+settings.DATABASES['default']['NAME'] = sys.argv[1]
+django.setup()
+call_command(
+    'seed_campus', '--output', sys.argv[2], '--anchor', sys.argv[3], '--students', '60', '--faculty', '8',
+    '--departments', '3', '--clubs', '5', '--events', '12', '--notifications', '200',
+    '--median-registrations', '6', '--seed', '7', verbosity=0,
+)
+"""
+
+
+class SeedingTests(TempDirMixin, SimpleTestCase):
+    def seed(self, name, anchor='2026-01-15'):
+        directory = Path(self.tempdir())
+        output = directory / name
+        env = dict(os.environ)  # with DJANGO_SETTINGS_MODULE; overridden settings have no module
+        process = subprocess.run(
+            [sys.executable, '-c', SEED_SCRIPT, str(directory / 'default.sqlite3'), str(output), anchor],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        self.assertEqual(process.returncode, 0, process.stderr[-2000:])
+        return directory / 'default.sqlite3', output
+
+    def dump(self, path):
+        # Rows written by migrations, and version stamps, say when the file was made, not what was generated
+        skipped = tuple(
+            f'INSERT INTO "{table}"'
+            for table in ('django_migrations', 'certificate_certificatetemplate', 'sac_project_dataversion')
+        )
+        with sqlite3.connect(path) as db:
+            return [line for line in db.iterdump() if not line.startswith(skipped)]
+
+    def test_same_spec_and_anchor_give_identical_databases(self):
+        _, first = self.seed('first.sqlite3')
+        _, second = self.seed('second.sqlite3')
+        first, second = self.dump(first), self.dump(second)
+        self.assertGreater(len(first), 500)
+        self.assertEqual(first, second)
+
+    def test_output_database_is_invalidated_not_default(self):
+        default, output = self.seed('campus.sqlite3')
+        with sqlite3.connect(output) as db:
+            self.assertEqual(
+                db.execute("SELECT version FROM sac_project_dataversion WHERE key = 'calendar'").fetchall(), [(2,)],
+            )
+        with sqlite3.connect(default) as db:
+            self.assertEqual(db.execute("SELECT name FROM sqlite_master").fetchall(), [])
+
+
+class RecordingBackend(LocalBackend):
+    """Keeps what is published instead of delivering it."""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, broker, channel, event):
+        self.published.append((channel, event))
+
+
+class RealtimeTests(TempDirMixin, SimpleTestCase):
+    def test_format_sse(self):
+        self.assertEqual(
+            format_sse({'type': 'notification', 'id': 7, 'message': 'Hi'}),
+            'id: 7\nevent: notification\ndata: {"type": "notification", "id": 7, "message": "Hi"}\n\n',
+        )
+        self.assertEqual(format_sse({'type': 'announcement', 'id': None}).splitlines()[0], 'event: announcement')
+
+    def test_broker_delivers_by_channel(self):
+        async def scenario():
+            broker = Broker(LocalBackend(), queue_size=10)
+            alice = broker.subscribe([user_channel(1), BROADCAST_CHANNEL])
+            bob = broker.subscribe([user_channel(2), BROADCAST_CHANNEL])
+            broker.publish(user_channel(1), {'id': 1})
+            broker.publish(BROADCAST_CHANNEL, {'id': 2})
+            self.assertTrue(await alice.wait(1))
+            # Deliveries are scheduled on the loop; let them all run
+            await asyncio.sleep(0)
+            received = list(alice.drain()), list(bob.drain())
+            broker.unsubscribe(alice)
+            broker.unsubscribe(bob)
+            self.assertEqual(broker.dispatch(BROADCAST_CHANNEL, {'id': 3}), 0)
+            return received
+
+        self.assertEqual(asyncio.run(scenario()), ([{'id': 1}, {'id': 2}], [{'id': 2}]))
+
+    def test_slow_subscriber_overflows_instead_of_growing(self):
+        async def scenario():
+            broker = Broker(LocalBackend(), queue_size=2)
+            subscription = broker.subscribe([BROADCAST_CHANNEL])
+            for event_id in range(3):
+                broker.publish(BROADCAST_CHANNEL, {'id': event_id})
+            await subscription.wait(1)
+            await asyncio.sleep(0)
+            return subscription.take_overflow(), list(subscription.drain())
+
+        self.assertEqual(asyncio.run(scenario()), (True, []))
+
+    def test_spool_reaches_brokers_of_other_processes(self):
+        path = os.path.join(self.tempdir(), 'spool.sqlite3')
+
+        async def scenario():
+            listener = Broker(SQLiteSpoolBackend(path, poll_interval=0.05), queue_size=10)
+            subscription = listener.subscribe([BROADCAST_CHANNEL])
+            # Another worker: its own backend and connection to the same file
+            Broker(SQLiteSpoolBackend(path), queue_size=10).publish(BROADCAST_CHANNEL, {'id': 5})
+            self.assertTrue(await subscription.wait(5))
+            await asyncio.sleep(0)
+            return list(subscription.drain())
+
+        self.assertEqual(asyncio.run(scenario()), [{'id': 5}])
+
+    def test_event_stream_pushes_live_events(self):
+        async def scenario():
+            stream = _event_stream(42, None)
+            first = await stream.__anext__()
+            get_broker().publish(user_channel(42), {'type': 'notification', 'id': 3, 'message': 'Hi'})
+            second = await asyncio.wait_for(stream.__anext__(), 5)
+            await stream.aclose()
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        self.assertTrue(first.startswith('retry: '))
+        self.assertTrue(second.startswith('id: 3\nevent: notification\n'))
+
+
+class RealtimePublishTests(TestCase):
+    def setUp(self):
+        self.backend = RecordingBackend()
+        previous, realtime._broker = realtime._broker, Broker(self.backend, queue_size=10)
+        self.addCleanup(setattr, realtime, '_broker', previous)
+        self.user = User.objects.create(username='21CS0001', roles=['STUDENT'])
+
+    def test_pushes_wait_for_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = Notification.objects.create(user=self.user, message='Seat confirmed')
+            publish_announcement('Exams postponed', important=True, last_id=notification.id)
+            self.assertEqual(self.backend.published, [])
+        self.assertEqual(
+            [(channel, event['type'], event['id']) for channel, event in self.backend.published],
+            [(user_channel(self.user.id), 'notification', notification.id),
+             (BROADCAST_CHANNEL, 'announcement', notification.id)],
+        )
+
+    def test_stream_replays_after_last_event_id(self):
+        first, second, third = (
+            Notification.objects.create(user=self.user, message=f'Message {number}') for number in range(3)
+        )
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notifications_stream'), HTTP_LAST_EVENT_ID=str(first.id))
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertNotIn(f'id: {first.id}\n', body)
+        self.assertIn(f'id: {second.id}\n', body)
+        self.assertIn(f'id: {third.id}\n', body)
+
+    def test_polling_delivers_notifications_created_after_connect(self):
+        seen = Notification.objects.create(user=self.user, message='Seen')
+        self.client.force_login(self.user)
+        page = self.client.get(reverse('notifications_list'))
+        self.assertContains(page, f'?last_event_id={seen.id}')
+
+        # A cursorless connection is given one to reconnect with
+        url = reverse('notifications_stream')
+        body = b''.join(self.client.get(url).streaming_content).decode()
+        self.assertIn(f'id: {seen.id}\n\n', body)
+        self.assertNotIn('event: notification', body)
+
+        fresh = Notification.objects.create(user=self.user, message='Fresh')
+        body = b''.join(self.client.get(url, HTTP_LAST_EVENT_ID=str(seen.id)).streaming_content).decode()
+        self.assertIn(f'id: {fresh.id}\nevent: notification\n', body)
+        self.assertNotIn(f'id: {seen.id}\n', body)
+
+
+class MetricsTests(TempDirMixin, TestCase):
+    def setUp(self):
+        reset_metrics()
+
+    def test_counters_and_cumulative_histogram_buckets(self):
+        CACHE_REQUESTS.inc(cache='default', result='hit')
+        CACHE_REQUESTS.inc(2, cache='default', result='hit')
+        JOB_DURATION.observe(0.3, task='demo')
+        JOB_DURATION.observe(7, task='demo')
+        text = render_metrics()
+        self.assertIn('# TYPE sac_cache_requests counter', text)
+        self.assertIn('sac_cache_requests_total{cache="default",result="hit"} 3', text)
+        self.assertIn('sac_job_duration_seconds_bucket{task="demo",le="0.1"} 0', text)
+        self.assertIn('sac_job_duration_seconds_bucket{task="demo",le="0.5"} 1', text)
+        self.assertIn('sac_job_duration_seconds_bucket{task="demo",le="10"} 2', text)
+        self.assertIn('sac_job_duration_seconds_bucket{task="demo",le="+Inf"} 2', text)
+        self.assertIn('sac_job_duration_seconds_count{task="demo"} 2', text)
+        self.assertIn('sac_job_duration_seconds_sum{task="demo"} 7.3', text)
+
+    def test_labels_must_match(self):
+        with self.assertRaises(ValueError):
+            CACHE_REQUESTS.inc(cache='default')
+
+    def test_file_store_sums_the_samples_of_every_process(self):
+        path = os.path.join(self.tempdir(), 'metrics.sqlite3')
+        first, second = FileStore(path, 60), FileStore(path, 60)
+        self.addCleanup(first.stop)
+        self.addCleanup(second.stop)
+        first.add(('sac_jobs_total', '{}'), 2)
+        second.add(('sac_jobs_total', '{}'), 3)
+        # Buffered until flushed; a snapshot flushes its own process first
+        self.assertEqual(first.snapshot(), {('sac_jobs_total', '{}'): 2})
+        self.assertEqual(second.snapshot(), {('sac_jobs_total', '{}'): 5})
+
+    def stored(self, path):
+        with sqlite3.connect(path) as db:
+            return dict(db.execute('SELECT name, value FROM samples').fetchall())
+
+    def test_recording_never_waits_for_the_file(self):
+        path = os.path.join(self.tempdir(), 'metrics.sqlite3')
+        store = FileStore(path, 0.05)
+        self.addCleanup(store.stop)
+        store.snapshot()
+        # Another worker holds the write lock: the flusher thread waits for it, requests do not
+        blocker = sqlite3.connect(path, isolation_level=None)
+        self.addCleanup(blocker.close)
+        blocker.execute('BEGIN IMMEDIATE')
+        store.add(('sac_jobs_total', '{}'), 2)
+        time.sleep(0.2)
+        started = time.perf_counter()
+        store.add(('sac_jobs_total', '{}'), 3)
+        self.assertLess(time.perf_counter() - started, 0.1)
+        self.assertEqual(self.stored(path), {})
+
+        blocker.execute('COMMIT')
+        deadline = time.monotonic() + 5
+        while self.stored(path) != {'sac_jobs_total': 5} and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.stored(path), {'sac_jobs_total': 5})
+
+    def test_metered_cache_counts_hits_and_misses(self):
+        cache = MeteredLocMemCache('metrics-test', {'METRICS_NAME': 'test'})
+        cache.set('present', 1)
+        self.assertEqual(cache.get('present'), 1)
+        self.assertIsNone(cache.get('absent'))
+        self.assertEqual(cache.get('absent', 'fallback'), 'fallback')
+        samples = get_store().snapshot()
+        self.assertEqual(samples[('sac_cache_requests_total', '{"cache":"test","result":"hit"}')], 1)
+        self.assertEqual(samples[('sac_cache_requests_total', '{"cache":"test","result":"miss"}')], 2)
+
+    @override_settings(METRICS={'STORE': 'memory', 'ALLOWED_IPS': ['10.0.0.5'], 'TOKEN': 's3cret'})
+    def test_scrape_access(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.9').status_code, 403)
+        self.assertEqual(
+            self.client.get(url, REMOTE_ADDR='10.0.0.9', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403,
+        )
+        response = self.client.get(url, REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertEqual(
+            self.client.get(url, REMOTE_ADDR='10.0.0.9', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200,
+        )
+        self.client.force_login(User.objects.create(username='admin', roles=['ADMIN']))
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+
+class ProfilingTests(TempDirMixin, TestCase):
+    def setUp(self):
+        self.directory = self.tempdir()
+        self.use_settings(PROFILING={'ENABLED': True, 'DIR': self.directory, 'KEEP': 2})
+        self.middleware = ProfilingMiddleware(self.view)
+        self.staff = User.objects.create(username='staff', is_staff=True)
+
+    @staticmethod
+    def view(request):
+        sorted(str(number) for number in range(20000))
+        return HttpResponse('ok')
+
+    def get(self, path, user, **extra):
+        request = RequestFactory().get(path, **extra)
+        request.user = user
+        return self.middleware(request)
+
+    def test_disabled_middleware_removes_itself(self):
+        with override_settings(PROFILING={'ENABLED': False}):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(self.view)
+
+    def test_cprofile_writes_stats_and_collapsed_stacks(self):
+        response = self.get('/events/?_profile=1', self.staff)
+        name = response['X-Profile-Name']
+        self.assertIn('cprofile', name)
+        [(listed, files, _)] = list_profiles()
+        self.assertEqual((listed, files), (name, [f'{name}.collapsed.txt', f'{name}.prof']))
+        with open(os.path.join(self.directory, f'{name}.collapsed.txt')) as fh:
+            lines = fh.read().splitlines()
+        self.assertTrue(any('view (' in line for line in lines))
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+
+    def test_sample_mode_from_header(self):
+        response = self.get('/events/', self.staff, HTTP_X_PROFILE='sample')
+        self.assertIn('sample', response['X-Profile-Name'])
+        self.assertEqual(list_profiles()[0][1], [f"{response['X-Profile-Name']}.collapsed.txt"])
+
+    def test_only_authorised_users_and_known_modes_are_profiled(self):
+        student = User.objects.create(username='21CS0001', roles=['STUDENT'])
+        admin = User.objects.create(username='admin', roles=['ADMIN'])
+        self.assertNotIn('X-Profile-Name', self.get('/?_profile=1', AnonymousUser()))
+        self.assertNotIn('X-Profile-Name', self.get('/?_profile=1', student))
+        self.assertNotIn('X-Profile-Name', self.get('/?_profile=bogus', self.staff))
+        self.assertNotIn('X-Profile-Name', self.get('/', self.staff))
+        self.assertEqual(list_profiles(), [])
+        self.assertIn('X-Profile-Name', self.get('/?_profile=1', admin))
+
+    def test_retention_keeps_the_newest_profiles(self):
+        directory = Path(self.directory)
+        for age, name in enumerate(['newest', 'middle', 'oldest']):
+            for suffix in ('.prof', '.collapsed.txt'):
+                path = directory / f'{name}{suffix}'
+                path.write_text('')
+                os.utime(path, (1000 - age, 1000 - age))
+        enforce_retention(directory, 2)
+        self.assertEqual([name for name, _, _ in list_profiles()], ['newest', 'middle'])
+
+
+class ImageVariantTests(TempMediaMixin, TestCase):
+    def render(self, club):
+        return Template('{% load images %}{% responsive_image club.logo alt=club.name class="logo" %}').render(
+            Context({'club': club})
+        )
+
+    def test_upload_queues_variants_and_tag_emits_srcset(self):
+        club = Club.objects.create(name='Robotics', logo=self.upload('logo.png', (2000, 1000), 'RGBA'))
+        # Until the job runs, the original is served
+        self.assertIn(f'src="{club.logo.url}"', self.render(club))
+        self.assertNotIn('srcset', self.render(club))
+
+        self.assertEqual(run_pending(), 1)
+        club.refresh_from_db()
+        variants = club.logo_variants
+        self.assertEqual((variants['source'], variants['widths']), (club.logo.name, [320, 640, 1280]))
+        storage = club.logo.storage
+        for name in variant_names(variants):
+            self.assertTrue(storage.exists(name), name)
+        html = self.render(club)
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(f".{variants['digest']}.640w.webp 640w", html)
+        self.assertIn('class="logo"', html)
+        self.assertIn('alt="Robotics"', html)
+
+        # Saving without a new file queues nothing; a new logo replaces the old variants
+        club.save()
+        self.assertFalse(Job.objects.filter(status=JobStatus.QUEUED).exists())
+        old = variant_names(variants)
+        club.logo = self.upload('new.png', (500, 500))
+        club.save()
+        run_pending()
+        club.refresh_from_db()
+        self.assertEqual(club.logo_variants['widths'], [320, 500])
+        self.assertFalse(any(storage.exists(name) for name in old))
+
+    def test_backfill_command(self):
+        club = Club.objects.create(name='Robotics', logo=self.upload('logo.png', (800, 400)))
+        Job.objects.all().delete()
+        call_command('derive_images', workers=0, stdout=StringIO())
+        club.refresh_from_db()
+        self.assertEqual(club.logo_variants['widths'], [320, 640, 800])
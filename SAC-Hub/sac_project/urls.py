@@ -19,7 +19,8 @@ from django.contrib import admin
 from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, include
-from users.admin_bulk_upload import bulk_upload_view
+from users.admin_bulk_upload import bulk_upload_report, bulk_upload_view
+from calendar_app.views import calendar_feed
 from .dashboard_views import (
     SACDashboardView, ClubCoordinatorDashboardView, DepartmentAdminDashboardView,
     PresidentDashboardView, SVPDashboardView, SecretaryDashboardView, TreasurerDashboardView, ClubAdvisorDashboardView
@@ -33,6 +34,8 @@ from .role_dashboards import (
 )
 from .role_dashboards import dashboard_redirect
 from .auth_views import login_view, logout_view
+from .stream_views import notifications_stream
+from .metrics_views import metrics_view
 
 # Import frontend views
 from events.frontend_views import (
@@ -55,7 +58,7 @@ from .frontend_views import (
 )
 from .admin_views import (
     assign_club_coordinator, get_students_ajax, event_approval_list, event_approve_reject,
-    api_clubs_crud, api_departments_crud, api_users_crud
+    api_clubs_crud, api_departments_crud, api_users_crud, performance_overview, download_profile
 )
 
 urlpatterns = [
@@ -63,6 +66,7 @@ urlpatterns = [
     path("logout/", logout_view, name="logout"),
     path("", home, name="home"),
     path("about/", about, name="about"),
+    path("metrics", metrics_view, name="metrics"),
     path("dashboard/", student_dashboard, name="student-dashboard"),
     
     # Custom Admin functions (must come before admin.site.urls)
@@ -70,6 +74,8 @@ urlpatterns = [
     path("admin/event-approvals/", event_approval_list, name="event_approval_list"),
     path("admin/event-approve-reject/", event_approve_reject, name="event_approve_reject"),
     path("admin/ajax/students/", get_students_ajax, name="get_students_ajax"),
+    path("admin/performance/", performance_overview, name="performance_overview"),
+    path("admin/performance/profiles/<str:filename>", download_profile, name="download_profile"),
     
     # Admin API endpoints
     path("api/admin/clubs/", api_clubs_crud, name="api_clubs_crud"),
@@ -79,6 +85,7 @@ urlpatterns = [
     # Django Admin (must come after custom admin URLs)
     path("admin/", admin.site.urls),
     path("bulk-upload/", bulk_upload_view, name="bulk-upload"),
+    path("bulk-upload/reports/<str:filename>", bulk_upload_report, name="bulk-upload-report"),
     
     # API endpoints
     path("api/", include("users.api_urls")),
@@ -142,6 +149,10 @@ urlpatterns = [
     
     # Calendar and Attendance
     path("calendar/", calendar_view, name="calendar_view"),
+    path("calendar/feeds/all.ics", calendar_feed, name="calendar_feed"),
+    path("calendar/feeds/club/<int:club_id>.ics", calendar_feed, name="calendar_feed_club"),
+    path("calendar/feeds/department/<int:department_id>.ics", calendar_feed, name="calendar_feed_department"),
+    path("calendar/feeds/user/<str:token>.ics", calendar_feed, name="calendar_feed_user"),
     path("events/<int:event_id>/attendance/", attendance_manage, name="attendance_manage"),
     path("events/<int:event_id>/attendance/export/", attendance_export, name="attendance_export"),
     path("events/<int:event_id>/attendance/report/", attendance_report, name="attendance_report"),
@@ -152,6 +163,7 @@ urlpatterns = [
     path("profile/", profile_view, name="profile"),
     path("notifications/", notifications_list, name="notifications_list"),
     path("notifications/send/", send_notification, name="send_notification"),
+    path("notifications/stream/", notifications_stream, name="notifications_stream"),
     path("notifications/<int:notification_id>/mark-read/", mark_notification_read, name="mark_notification_read"),
     path("notifications/<int:notification_id>/mark-unread/", mark_notification_unread, name="mark_notification_unread"),
     path("notifications/<int:notification_id>/delete/", delete_notification, name="delete_notification"),
@@ -166,6 +178,9 @@ urlpatterns = [
     
     # Certificate generation
     path("certificates/", include("certificate.urls")),
+
+    # Background jobs (progress and result downloads)
+    path("jobs/", include("jobs.urls")),
 ]
 
 # Serve media files in development
@@ -0,0 +1,44 @@
+"""
+Shared version counters for cached data.
+
+A cache entry built from some data is keyed with that data's version; code
+that changes the data calls ``bump``, so every process reads the new version
+on its next lookup and stops using (and eventually evicts) the old entries::
+
+    grid = cache.get(f'calendar:grid:{month}:v{versions.current("calendar").version}')
+
+The counters live in ``DataVersion`` rows: one indexed lookup per read, and a
+bump inside a transaction takes effect when (and only if) it commits.
+"""
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+
+Version = namedtuple('Version', 'version modified')
+
+
+def current(key, using='default'):
+    """(version, modified) of ``key`` in database ``using``, created at version 1 on first use."""
+    rows = DataVersion.objects.using(using)
+    row = rows.filter(key=key).values_list('version', 'modified').first()
+    if row is None:
+        row = rows.get_or_create(key=key, defaults={'modified': timezone.now()})[0]
+        row = (row.version, row.modified)
+    return Version(*row)
+
+
+def bump(key, using='default'):
+    """Mark everything derived from ``key`` in database ``using`` stale."""
+    now, rows = timezone.now(), DataVersion.objects.using(using)
+    if rows.filter(key=key).update(version=F('version') + 1, modified=now):
+        return
+    try:
+        with transaction.atomic(using=using):
+            # Above 1, which a reader may have seen from a row that was rolled back
+            rows.create(key=key, version=2, modified=now)
+    except IntegrityError:
+        rows.filter(key=key).update(version=F('version') + 1, modified=now)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Club, Department, Notification
+from .models import User, Club, Department, Notification, ArchivedNotification
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
 	list_display = ("user", "message", "created_at", "read")
@@ -7,6 +7,14 @@ class NotificationAdmin(admin.ModelAdmin):
 	search_fields = ("user__username", "message")
 
 
+@admin.register(ArchivedNotification)
+class ArchivedNotificationAdmin(admin.ModelAdmin):
+	list_display = ("original_id", "user_id", "message", "created_at", "archived_at")
+	list_filter = ("read", "important")
+	search_fields = ("message",)
+	readonly_fields = ("original_id", "user_id", "message", "important", "read", "created_at", "archived_at")
+
+
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
 	list_display = ("email", "username", "get_roles", "is_staff", "is_active")
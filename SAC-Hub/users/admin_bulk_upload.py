@@ -3,9 +3,10 @@ from django.urls import path
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+from sac_project.tabular import TabularError
+from .bulk_import import COLUMNS, REPORT_SUFFIX, import_users, report_dir
 from .forms import BulkUploadForm
-import csv
-import io
 
 @staff_member_required
 def bulk_upload_view(request):
@@ -13,25 +14,33 @@ def bulk_upload_view(request):
         form = BulkUploadForm(request.POST, request.FILES)
         if form.is_valid():
             file = form.cleaned_data['file']
-            decoded_file = file.read().decode('utf-8')
-            reader = csv.DictReader(io.StringIO(decoded_file))
-            # Example: handle user data upload
-            from .models import User
-            created, errors = 0, 0
-            for row in reader:
-                try:
-                    User.objects.create(
-                        username=row.get('username'),
-                        email=row.get('email'),
-                        roll_no=row.get('roll_no'),
-                        # Add more fields as needed
-                    )
-                    created += 1
-                except Exception as e:
-                    errors += 1
-            messages.success(request, f"Bulk upload complete: {created} created, {errors} errors.")
-            return redirect('admin:bulk-upload')
+            dry_run = form.cleaned_data['dry_run']
+            # Streams the upload row by row; see users.bulk_import
+            try:
+                result = import_users(file, file.name, dry_run=dry_run)
+            except TabularError as error:
+                messages.error(request, str(error))
+                return redirect('bulk-upload')
+            if dry_run:
+                messages.success(request, f"Checked {result.rows} rows: {result.rows - result.failed_rows} valid, {result.failed_rows} with errors.")
+            else:
+                messages.success(request, f"Bulk upload complete: {result.created} created, {result.failed_rows} errors ({result.seconds:.1f}s).")
+            if result.report:
+                request.session['bulk_upload_report'] = result.report
+            return redirect('bulk-upload')
     else:
         form = BulkUploadForm()
-    return render(request, 'admin/bulk_upload.html', {'form': form})
+    context = {
+        'form': form,
+        'columns': COLUMNS,
+        'report': request.session.pop('bulk_upload_report', None),
+    }
+    return render(request, 'admin/bulk_upload.html', context)
 
+@staff_member_required
+def bulk_upload_report(request, filename):
+    """Download the per-row error report of an import"""
+    path = report_dir() / filename
+    if '/' in filename or not filename.endswith(REPORT_SUFFIX) or not path.is_file():
+        raise Http404('Report not found')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
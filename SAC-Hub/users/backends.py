@@ -0,0 +1,134 @@
+"""
+Login by username, email or roll number, and the session role profile.
+
+``IdentifierBackend`` looks at the shape of what was typed and queries the one
+column it most likely names, an equality match on a unique index:
+
+* contains ``@``: ``email``;
+* matches ``LOGIN_IDENTITY['ROLL_NO_PATTERN']``: ``roll_no``;
+* anything else: ``username`` (students' usernames are their roll numbers).
+
+Only when that lookup misses is the next likely column tried, so every
+account that could log in before still can. The old ``username OR email OR
+roll_no`` query could not use one index and raised
+``MultipleObjectsReturned`` when two accounts matched different columns.
+
+At login the user's roles, dashboard and coordinated clubs are stored in the
+session (``role_profile``), so redirects and the sidebar need no user or club
+queries. The profile is rebuilt from the database after
+``ROLE_PROFILE_MAX_AGE`` seconds, which bounds how long a role change takes
+to show up in an existing session.
+"""
+import re
+import time
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+DEFAULTS = {
+    # Letters followed by digits, e.g. ST2024001 or 240100001
+    'ROLL_NO_PATTERN': r'^[A-Za-z]{0,5}\d{3,}$',
+    'ROLE_PROFILE_MAX_AGE': 300,
+}
+
+ROLE_PROFILE_SESSION_KEY = '_role_profile'
+
+# Dashboard per role, in priority order
+DASHBOARDS = [
+    ('ADMIN', 'admin-dashboard-template'),
+    ('SAC_COORDINATOR', 'admin-dashboard-template'),
+    ('CLUB_COORDINATOR', 'club-coordinator-dashboard-template'),
+    ('SVP', 'svp-dashboard-template'),
+    ('SECRETARY', 'secretary-dashboard-template'),
+    ('TREASURER', 'treasurer-dashboard-template'),
+    ('DEPARTMENT_ADMIN', 'department-admin-dashboard-template'),
+    ('CLUB_ADVISOR', 'club-advisor-dashboard-template'),
+    ('EVENT_ORGANIZER', 'event-organizer-dashboard-template'),
+    ('STUDENT_VOLUNTEER', 'student-volunteer-dashboard-template'),
+    ('FACULTY', 'faculty-dashboard-template'),
+]
+DEFAULT_DASHBOARD = 'student-dashboard'
+
+
+def identity_setting(name):
+    return getattr(settings, 'LOGIN_IDENTITY', {}).get(name, DEFAULTS[name])
+
+
+def lookup_order(identifier):
+    """Columns to try for ``identifier``, most likely first."""
+    if '@' in identifier:
+        # Usernames may contain @ too
+        return ['email', 'username']
+    if re.match(identity_setting('ROLL_NO_PATTERN'), identifier):
+        return ['roll_no', 'username']
+    return ['username', 'roll_no']
+
+
+class IdentifierBackend(ModelBackend):
+    """``ModelBackend`` that accepts a username, email or roll number as the username."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if not username or password is None:
+            return None
+        identifier = username.strip()
+        user = None
+        for column in lookup_order(identifier):
+            user = UserModel._default_manager.filter(**{column: identifier}).first()
+            if user is not None:
+                break
+        if user is None:
+            # Same hashing cost as a wrong password, so timing does not reveal which accounts exist
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+def dashboard_for(roles):
+    """URL name of the dashboard for a list of roles."""
+    for role, view_name in DASHBOARDS:
+        if role in roles:
+            return view_name
+    return DEFAULT_DASHBOARD
+
+
+def build_role_profile(user):
+    roles = list(user.roles or [])
+    return {
+        'user_id': str(user.pk),
+        'roles': roles,
+        'dashboard': dashboard_for(roles),
+        'coordinated_clubs': list(user.coordinated_clubs.values('id', 'name'))
+        if 'CLUB_COORDINATOR' in roles or 'CO_COORDINATOR' in roles else [],
+        'refreshed': time.time(),
+    }
+
+
+def store_role_profile(request, user):
+    request.session[ROLE_PROFILE_SESSION_KEY] = build_role_profile(user)
+
+
+def role_profile(request):
+    """The logged-in user's cached role profile, or None for anonymous requests.
+
+    Reads only the session while the profile is fresh; ``request.user`` is
+    loaded just to rebuild a missing or expired one.
+    """
+    session = getattr(request, 'session', None)
+    if session is None or SESSION_KEY not in session:
+        return None
+    profile = session.get(ROLE_PROFILE_SESSION_KEY)
+    if (
+        profile and profile['user_id'] == str(session[SESSION_KEY])
+        and time.time() - profile['refreshed'] < identity_setting('ROLE_PROFILE_MAX_AGE')
+    ):
+        return profile
+    if not request.user.is_authenticated:
+        return None
+    store_role_profile(request, request.user)
+    return session[ROLE_PROFILE_SESSION_KEY]
@@ -0,0 +1,319 @@
+"""
+Bulk user import (the admin bulk upload page and ``manage.py import_users``).
+
+Rows are streamed from a CSV or XLSX file (``sac_project.tabular``) and
+handled in chunks of ``CHUNK_SIZE``:
+
+1. each row is validated against sets loaded once per import (existing
+   usernames, emails and roll numbers, department names) and against the rows
+   accepted earlier in the same file;
+2. initial passwords are hashed in a process pool: PBKDF2 is by far the most
+   expensive part of an import and is CPU-bound, so it scales with cores;
+3. the chunk is inserted with one ``bulk_create`` in its own transaction, and
+   the new users get their directory search keys.
+
+Rows that fail go to a CSV error report (row number, column, message and the
+row's values, never the password), which the upload page offers for download.
+
+Columns (header names are case-insensitive): ``username``, ``email``,
+``roll_no``, ``first_name``, ``last_name``, ``roles`` (separated by ``;`` or
+``|``, default ``STUDENT``), ``department`` (name), ``year_of_study``,
+``section``, ``contact_number`` and ``password``. Students use their roll
+number as username, as ``User.save`` does. A blank password leaves the
+account with an unusable password until it is reset.
+
+Django's default PBKDF2 costs about half a second per password.
+``USER_IMPORT['PASSWORD_ITERATIONS']`` hashes initial passwords with fewer
+iterations instead; Django re-hashes them at full strength the first time the
+user logs in.
+"""
+import csv
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import repeat
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher, make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from sac_project.tabular import read_table
+from .directory import add_users
+from .models import Department, Role, User
+
+DEFAULTS = {
+    'CHUNK_SIZE': 1000,
+    # Hashing processes; None uses every core, 0 or 1 hashes in-process
+    'WORKERS': None,
+    # 'spawn' is safe to use from threaded servers; 'fork' starts faster
+    'START_METHOD': 'spawn',
+    # PBKDF2 iterations for initial passwords (None: the hasher's default)
+    'PASSWORD_ITERATIONS': None,
+    'REPORT_DIR': None,  # defaults to BASE_DIR / 'imports'
+    'KEEP_REPORTS': 20,
+}
+
+COLUMNS = (
+    'username', 'email', 'roll_no', 'first_name', 'last_name', 'roles', 'department',
+    'year_of_study', 'section', 'contact_number', 'password',
+)
+ALIASES = {
+    'roll_number': 'roll_no',
+    'rollno': 'roll_no',
+    'year': 'year_of_study',
+    'phone': 'contact_number',
+    'contact': 'contact_number',
+    'role': 'roles',
+}
+REPORT_SUFFIX = '-errors.csv'
+VALID_ROLES = set(Role.values)
+
+
+def import_setting(name):
+    return getattr(settings, 'USER_IMPORT', {}).get(name, DEFAULTS[name])
+
+
+def report_dir():
+    return Path(import_setting('REPORT_DIR') or settings.BASE_DIR / 'imports')
+
+
+def read_rows(handle, name=''):
+    """Yield ``(row number, row)`` from a binary CSV or XLSX file, one row at a time; ``row`` has the fields COLUMNS."""
+    return read_table(handle, name, COLUMNS, ALIASES)
+
+
+def hash_password(password, iterations=None):
+    """``make_password``, optionally with fewer PBKDF2 iterations (runs in the pool)."""
+    if not password:
+        return make_password(None)
+    hasher = get_hasher()
+    if iterations and isinstance(hasher, PBKDF2PasswordHasher):
+        return hasher.encode(password, hasher.salt(), iterations)
+    return make_password(password)
+
+
+@dataclass
+class RowError:
+    row: int
+    column: str
+    message: str
+    values: dict
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    chunks: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+    hash_seconds: float = 0.0
+    report: str = None
+
+    @property
+    def failed_rows(self):
+        return len({error.row for error in self.errors})
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class UserImporter:
+    """Validate and insert users from ``read_rows`` output (see module docstring)."""
+
+    def __init__(self, using='default', chunk_size=None, workers=None, dry_run=False):
+        self.using = using
+        self.chunk_size = chunk_size or import_setting('CHUNK_SIZE')
+        workers = import_setting('WORKERS') if workers is None else workers
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.dry_run = dry_run
+        self.iterations = import_setting('PASSWORD_ITERATIONS')
+        self._pool = None
+
+    def preload(self):
+        self.usernames = set()
+        self.emails = set()
+        self.roll_numbers = set()
+        for username, email, roll_no in User.objects.using(self.using).values_list('username', 'email', 'roll_no'):
+            self.usernames.add(username)
+            if email:
+                self.emails.add(email.lower())
+            if roll_no:
+                self.roll_numbers.add(roll_no.upper())
+        self.departments = {
+            name.lower(): pk for pk, name in Department.objects.using(self.using).values_list('pk', 'name')
+        }
+
+    def validate(self, row):
+        """``(User, password, [(column, message)])`` for one row; the user is None if invalid."""
+        problems = []
+        roles = [role.strip().upper() for role in row.roles.replace('|', ';').split(';') if role.strip()]
+        roles = roles or [Role.STUDENT.value]
+        unknown = [role for role in roles if role not in VALID_ROLES]
+        if unknown:
+            problems.append(('roles', f"Unknown role(s): {', '.join(unknown)}"))
+
+        roll_no = row.roll_no
+        is_student = Role.STUDENT in roles
+        roll_no_problem = None
+        if is_student and not roll_no:
+            roll_no_problem = 'Roll number is required for students'
+        elif roll_no and roll_no.upper() in self.roll_numbers:
+            roll_no_problem = f'Roll number {roll_no} already exists'
+        if roll_no_problem:
+            problems.append(('roll_no', roll_no_problem))
+
+        username = roll_no if is_student and roll_no else row.username
+        if is_student and roll_no_problem:
+            # The username is the roll number; already reported
+            pass
+        elif not username:
+            problems.append(('username', 'Username is required'))
+        elif username in self.usernames:
+            problems.append(('username', f'Username {username} already exists'))
+        else:
+            try:
+                User.username_validator(username)
+            except ValidationError as error:
+                problems.append(('username', error.messages[0]))
+
+        email = BaseUserManager.normalize_email(row.email)
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                problems.append(('email', f'{email} is not a valid email address'))
+            else:
+                if email.lower() in self.emails:
+                    problems.append(('email', f'Email {email} already exists'))
+
+        department_id = None
+        if row.department:
+            department_id = self.departments.get(row.department.lower())
+            if department_id is None:
+                problems.append(('department', f"Unknown department: {row.department}"))
+
+        for column in ('first_name', 'last_name', 'year_of_study', 'section', 'contact_number', 'roll_no'):
+            max_length = User._meta.get_field(column).max_length
+            if len(getattr(row, column)) > max_length:
+                problems.append((column, f'At most {max_length} characters'))
+
+        if problems:
+            return None, None, problems
+        # Later rows must not reuse these
+        self.usernames.add(username)
+        if email:
+            self.emails.add(email.lower())
+        if roll_no:
+            self.roll_numbers.add(roll_no.upper())
+        user = User(
+            username=username, email=email or None, roll_no=roll_no or None, roles=roles,
+            first_name=row.first_name, last_name=row.last_name,
+            department_id=department_id, year_of_study=row.year_of_study or None,
+            section=row.section or None, contact_number=row.contact_number or None,
+        )
+        return user, row.password, []
+
+    def hash_passwords(self, passwords):
+        if self.workers <= 1 or sum(1 for password in passwords if password) < 2:
+            return [hash_password(password, self.iterations) for password in passwords]
+        if self._pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            from multiprocessing import get_context
+
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=get_context(import_setting('START_METHOD')),
+                initializer=django.setup,
+            )
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._pool.map(hash_password, passwords, repeat(self.iterations), chunksize=chunksize))
+
+    def insert(self, pending, result):
+        started = time.perf_counter()
+        hashes = self.hash_passwords([password for _, _, password in pending])
+        result.hash_seconds += time.perf_counter() - started
+        users = []
+        for (_, user, _), encoded in zip(pending, hashes):
+            user.password = encoded
+            users.append(user)
+        try:
+            with transaction.atomic(using=self.using):
+                created = User.objects.using(self.using).bulk_create(users)
+                add_users(created, self.using)
+            result.created += len(created)
+        except IntegrityError:
+            # Someone else took a username or email meanwhile: find the rows one by one
+            for number, user, _ in pending:
+                user.pk = None
+                try:
+                    with transaction.atomic(using=self.using):
+                        user.save(using=self.using)
+                    result.created += 1
+                except IntegrityError as error:
+                    result.errors.append(RowError(number, '', f'Could not be saved: {error}', self.rows[number]._asdict()))
+        result.chunks += 1
+
+    def run(self, rows, on_chunk=None):
+        """Import ``(row number, row)`` pairs from ``read_rows``; returns an ``ImportResult``."""
+        started = time.perf_counter()
+        result = ImportResult()
+        self.preload()
+        self.rows = {}
+        pending = []
+        try:
+            for number, row in rows:
+                result.rows += 1
+                user, password, problems = self.validate(row)
+                if problems:
+                    result.errors.extend(RowError(number, column, message, row._asdict()) for column, message in problems)
+                    continue
+                if self.dry_run:
+                    continue
+                self.rows[number] = row
+                pending.append((number, user, password))
+                if len(pending) >= self.chunk_size:
+                    self.insert(pending, result)
+                    pending, self.rows = [], {}
+                    if on_chunk:
+                        on_chunk(result)
+            if pending:
+                self.insert(pending, result)
+                if on_chunk:
+                    on_chunk(result)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+        result.seconds = time.perf_counter() - started
+        if result.errors:
+            result.report = write_report(result.errors)
+        return result
+
+
+def write_report(errors):
+    """Write the per-row error report; returns its file name."""
+    directory = report_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f'users-import-{datetime.now():%Y%m%d-%H%M%S-%f}{REPORT_SUFFIX}'
+    extra = [column for column in dict.fromkeys(key for error in errors for key in error.values) if column != 'password']
+    with open(directory / name, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(['row', 'column', 'error', *extra])
+        for error in errors:
+            writer.writerow([error.row, error.column, error.message, *(error.values.get(column, '') for column in extra)])
+    reports = sorted(directory.glob(f'*{REPORT_SUFFIX}'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in reports[import_setting('KEEP_REPORTS'):]:
+        path.unlink(missing_ok=True)
+    return name
+
+
+def import_users(handle, name='', **kwargs):
+    """Import users from a binary CSV/XLSX file object (see ``UserImporter``)."""
+    return UserImporter(**kwargs).run(read_rows(handle, name))
@@ -0,0 +1,343 @@
+"""
+Student directory search (autocomplete and member search).
+
+Every user has a few ``UserSearchKey`` rows holding normalised keys
+(lower-cased, accents removed, punctuation dropped):
+
+* the roll number,
+* each word of the first and last name,
+* the email local part and the username.
+
+A query is normalised the same way and each of its words must be a prefix of
+one of the user's keys. Prefix matching is a range scan on the key index
+(``key >= 'ram' AND key < 'ram\\U0010ffff'``) on the (kind, key) index;
+``LIKE``/``icontains`` cannot use an index on SQLite. Results are ranked
+exact roll number, roll number prefix, name, then account, and the top-k is
+taken by reading the index in key order, a page at a time, until enough
+users are found.
+
+The keys are rewritten from the ``User`` post_save signal (``users.signals``)
+when a searchable field changes; ``manage.py rebuild_user_search`` refills them
+after bulk writes.
+
+With ``STUDENT_DIRECTORY['IN_PROCESS_INDEX']`` on, autocomplete is served from
+a prefix index held in each process instead. It loads once, then picks up new
+key rows by id on every search (one ``MAX(id)`` query), and reloads in full
+every ``INDEX_MAX_AGE`` seconds to drop deleted users.
+
+On PostgreSQL the range scan needs the key index to use the "C" collation
+(or ``varchar_pattern_ops``); SQLite compares bytes already.
+"""
+import bisect
+import re
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Role, User, UserSearchKey
+
+DEFAULTS = {
+    'LIMIT': 20,
+    'IN_PROCESS_INDEX': False,
+    'INDEX_MAX_AGE': 300,
+}
+
+# Fields whose change rewrites a user's keys
+SEARCH_FIELDS = {'roll_no', 'first_name', 'last_name', 'email', 'username', 'roles'}
+MAX_TOKENS = 6
+KEY_LENGTH = UserSearchKey._meta.get_field('key').max_length
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+_PREFIX_END = '\U0010ffff'
+# Rank digit per match: an exact roll number beats a roll number prefix, and so on
+_EXACT_ROLL_NO = '0'
+_RANKS = {UserSearchKey.ROLL_NO: '1', UserSearchKey.NAME: '2', UserSearchKey.ACCOUNT: '3'}
+
+
+def directory_setting(name):
+    return getattr(settings, 'STUDENT_DIRECTORY', {}).get(name, DEFAULTS[name])
+
+
+def normalize(text):
+    """Lower-case ``text`` and strip accents (``'Zoë'`` -> ``'zoe'``)."""
+    decomposed = unicodedata.normalize('NFKD', (text or '').casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(query):
+    return _WORD.findall(normalize(query))[:MAX_TOKENS]
+
+
+def _compact(text):
+    return ''.join(_WORD.findall(normalize(text)))
+
+
+def user_keys(user):
+    """Sorted [(kind, key)] for a user (works on historical models too)."""
+    keys = set()
+    if user.roll_no:
+        keys.add((UserSearchKey.ROLL_NO, _compact(user.roll_no)))
+    for word in _WORD.findall(normalize(f'{user.first_name} {user.last_name}')):
+        keys.add((UserSearchKey.NAME, word))
+    for account in ((user.email or '').split('@')[0], user.username):
+        if account and account != user.roll_no:
+            keys.add((UserSearchKey.ACCOUNT, _compact(account)))
+    return sorted((kind, key[:KEY_LENGTH]) for kind, key in keys if key)
+
+
+def role_flags(user):
+    roles = user.roles or []
+    return {'is_student': Role.STUDENT in roles, 'is_club_coordinator': Role.CLUB_COORDINATOR in roles}
+
+
+def key_rows(user):
+    """Unsaved ``UserSearchKey`` rows for ``user``."""
+    flags = role_flags(user)
+    return [UserSearchKey(user_id=user.pk, kind=kind, key=key, **flags) for kind, key in user_keys(user)]
+
+
+def sync_user(user, using='default'):
+    """Rewrite ``user``'s search keys if they changed; returns True when rewritten."""
+    rows = key_rows(user)
+    wanted = {(row.kind, row.key, row.is_student, row.is_club_coordinator) for row in rows}
+    existing = UserSearchKey.objects.using(using).filter(user_id=user.pk)
+    if set(existing.values_list('kind', 'key', 'is_student', 'is_club_coordinator')) == wanted:
+        return False
+    with transaction.atomic(using=using):
+        existing.delete()
+        UserSearchKey.objects.using(using).bulk_create(rows)
+    return True
+
+
+def add_users(users, using='default', batch_size=2000):
+    """Write keys for users created with ``bulk_create`` (which skips the signal)."""
+    rows = [row for user in users for row in key_rows(user)]
+    UserSearchKey.objects.using(using).bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def rebuild_keys(using='default', batch_size=2000):
+    """Recompute every user's keys; returns the number of key rows written."""
+    written = 0
+    with transaction.atomic(using=using):
+        UserSearchKey.objects.using(using).all().delete()
+        users = User.objects.using(using).only(
+            'id', 'roll_no', 'first_name', 'last_name', 'email', 'username', 'roles'
+        ).order_by('pk')
+        batch = []
+        for user in users.iterator(chunk_size=batch_size):
+            batch.append(user)
+            if len(batch) >= batch_size:
+                written += add_users(batch, using, batch_size)
+                batch = []
+        written += add_users(batch, using, batch_size)
+    _indexes.clear()
+    return written
+
+
+def _prefix(token, kinds=tuple(_RANKS)):
+    # kind leads the index, so it is always constrained
+    return Q(kind__in=kinds, key__gte=token, key__lt=token + _PREFIX_END)
+
+
+def filter_users(queryset, query):
+    """Restrict a ``User`` queryset to users matching every word of ``query``."""
+    for token in tokenize(query):
+        matching = UserSearchKey.objects.using(queryset.db).filter(_prefix(token)).values('user_id')
+        queryset = queryset.filter(pk__in=matching)
+    return queryset
+
+
+def _flag_filters(students_only, exclude_coordinators):
+    filters = {}
+    if students_only:
+        filters['is_student'] = True
+    if exclude_coordinators:
+        filters['is_club_coordinator'] = False
+    return filters
+
+
+def _entry(user_id, first_name, last_name, roll_no, email):
+    return {'id': user_id, 'name': f'{first_name} {last_name}'.strip(), 'roll_no': roll_no, 'email': email}
+
+
+def _select(candidates, limit, accept=None):
+    """{user id: match} for the first ``limit`` users of (match, user id) pairs.
+
+    Candidates come in (match, user id) order, the order of the key index, so
+    reading stops as soon as ``limit`` users are found; a popular name word
+    shared by thousands of users costs no more than a rare one.
+    """
+    found = {}
+    for match, user_id in candidates:
+        if user_id in found or (accept is not None and not accept(user_id)):
+            continue
+        found[user_id] = match
+        if len(found) >= limit:
+            break
+    return found
+
+
+def _rank_entries(found, entries, limit):
+    # Deleted users have no entry and drop out
+    ranked = [(match, entries[user_id]) for user_id, match in found.items() if user_id in entries]
+    ranked.sort(key=lambda item: (item[0], item[1]['name'], item[1]['id']))
+    return [entry for _, entry in ranked[:limit]]
+
+
+def _sql_candidates(tokens, flags, using, page_size=50):
+    """(match, user id) in match order, read from the key index page by page."""
+    first, rest = tokens[0], tokens[1:]
+    keys = UserSearchKey.objects.using(using).filter(**flags)
+    for token in rest:
+        keys = keys.filter(user_id__in=UserSearchKey.objects.using(using).filter(_prefix(token)).values('user_id'))
+    for user_id in keys.filter(kind=UserSearchKey.ROLL_NO, key=first).values_list('user_id', flat=True):
+        yield _EXACT_ROLL_NO + first, user_id
+    for kind, rank in _RANKS.items():
+        matching = keys.filter(_prefix(first, [kind])).order_by('key', 'user_id')
+        after = None
+        while True:
+            page = matching
+            if after is not None:
+                page = page.filter(Q(key__gt=after[0]) | Q(key=after[0], user_id__gt=after[1]))
+            rows = list(page.values_list('key', 'user_id')[:page_size])
+            for key, user_id in rows:
+                yield rank + key, user_id
+            if len(rows) < page_size:
+                break
+            after = rows[-1]
+
+
+def _search_sql(tokens, limit, flags, using):
+    found = _select(_sql_candidates(tokens, flags, using), limit)
+    entries = {
+        row[0]: _entry(*row)
+        for row in User.objects.using(using).filter(pk__in=list(found)).values_list(
+            'pk', 'first_name', 'last_name', 'roll_no', 'email'
+        )
+    }
+    return _rank_entries(found, entries, limit)
+
+
+class PrefixIndex:
+    """In-process copy of the search keys: sorted (key, user id) lists per kind.
+
+    A prefix is a ``bisect`` range in each list, so a lookup costs the same
+    as a trie walk without one dict per character.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.lock = threading.Lock()
+        self.sorted_keys = {kind: [] for kind in _RANKS}
+        self.users = {}  # user id -> (entry, flags, [(kind, key)])
+        self.high_water = 0
+        self.loaded_at = time.monotonic()
+
+    def load(self, since=0):
+        rows = (
+            UserSearchKey.objects.using(self.using).filter(id__gt=since).order_by('id')
+            .values_list('id', 'user_id', 'kind', 'key', 'is_student', 'is_club_coordinator',
+                         'user__first_name', 'user__last_name', 'user__roll_no', 'user__email')
+        )
+        fresh = {}
+        for row_id, user_id, kind, key, is_student, is_coordinator, *details in rows.iterator():
+            entry = fresh.setdefault(user_id, (
+                _entry(user_id, *details), {'is_student': is_student, 'is_club_coordinator': is_coordinator}, [],
+            ))
+            entry[2].append((kind, key))
+            self.high_water = max(self.high_water, row_id)
+        # A user's keys are always rewritten together, so new rows replace all old ones
+        for user_id, entry in fresh.items():
+            self.remove(user_id)
+            self.users[user_id] = entry
+            for kind, key in entry[2]:
+                bisect.insort(self.sorted_keys[kind], (key, user_id))
+
+    def remove(self, user_id):
+        entry = self.users.pop(user_id, None)
+        if entry is None:
+            return
+        for kind, key in entry[2]:
+            keys = self.sorted_keys[kind]
+            position = bisect.bisect_left(keys, (key, user_id))
+            if position < len(keys) and keys[position] == (key, user_id):
+                del keys[position]
+
+    def refresh(self):
+        newest = UserSearchKey.objects.using(self.using).order_by('-id').values_list('id', flat=True).first() or 0
+        if newest > self.high_water:
+            self.load(self.high_water)
+
+    def _candidates(self, token):
+        """(match, user id) in best-match order for one word."""
+        roll_numbers = self.sorted_keys[UserSearchKey.ROLL_NO]
+        position = bisect.bisect_left(roll_numbers, (token,))
+        while position < len(roll_numbers) and roll_numbers[position][0] == token:
+            yield _EXACT_ROLL_NO + token, roll_numbers[position][1]
+            position += 1
+        for kind, rank in _RANKS.items():
+            keys = self.sorted_keys[kind]
+            start = bisect.bisect_left(keys, (token,))
+            end = bisect.bisect_left(keys, (token + _PREFIX_END,))
+            for key, user_id in keys[start:end]:
+                yield rank + key, user_id
+
+    def search(self, tokens, limit, flags):
+        rest = tokens[1:]
+
+        def accept(user_id):
+            _, user_flags, keys = self.users[user_id]
+            return all(user_flags[name] == value for name, value in flags.items()) and all(
+                any(key.startswith(token) for _, key in keys) for token in rest
+            )
+
+        with self.lock:
+            found = _select(self._candidates(tokens[0]), limit, accept)
+            entries = {user_id: self.users[user_id][0] for user_id in found}
+        return _rank_entries(found, entries, limit)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(using='default'):
+    """This process's prefix index for ``using``, loaded or refreshed as needed."""
+    with _indexes_lock:
+        index = _indexes.get(using)
+        if index is None or time.monotonic() - index.loaded_at > directory_setting('INDEX_MAX_AGE'):
+            index = _indexes[using] = PrefixIndex(using)
+            with index.lock:
+                index.load()
+            return index
+    with index.lock:
+        index.refresh()
+    return index
+
+
+def forget_user(user_id, using='default'):
+    """Drop a deleted user from this process's index (others catch up on reload)."""
+    index = _indexes.get(using)
+    if index is not None:
+        with index.lock:
+            index.remove(user_id)
+
+
+def search_students(query, limit=None, *, students_only=True, exclude_coordinators=False, using='default'):
+    """Top ``limit`` directory entries for ``query``, best match first.
+
+    Returns ``[{'id', 'name', 'roll_no', 'email'}]``.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    limit = limit or directory_setting('LIMIT')
+    flags = _flag_filters(students_only, exclude_coordinators)
+    if directory_setting('IN_PROCESS_INDEX'):
+        return get_index(using).search(tokens, limit, flags)
+    return _search_sql(tokens, limit, flags, using)
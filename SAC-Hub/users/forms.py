@@ -2,3 +2,13 @@ from django import forms
 
 class BulkUploadForm(forms.Form):
     file = forms.FileField(label="Select CSV or Excel file")
+    dry_run = forms.BooleanField(
+        required=False, label="Validate only",
+        help_text="Check every row and produce the error report without creating any users"
+    )
+
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.csv', '.xlsx', '.xlsm')):
+            raise forms.ValidationError("Upload a .csv or .xlsx file.")
+        return file
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from sac_project.tabular import TabularError
+from users.bulk_import import UserImporter, read_rows, report_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Import users from a CSV or XLSX file: rows are validated, initial passwords "
+        "hashed in parallel and users inserted in chunks (see users.bulk_import)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without creating users')
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default from settings)')
+        parser.add_argument('--chunk-size', type=int, help='Rows per bulk_create')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to import into')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'{path} does not exist')
+        importer = UserImporter(
+            using=options['database'], chunk_size=options['chunk_size'], workers=options['workers'],
+            dry_run=options['dry_run'],
+        )
+
+        def progress(result):
+            self.stdout.write(f'  ... {result.created} created after {result.chunks} chunk(s)')
+
+        with open(path, 'rb') as handle:
+            try:
+                result = importer.run(read_rows(handle, path.name), on_chunk=progress)
+            except TabularError as error:
+                raise CommandError(str(error))
+
+        if options['dry_run']:
+            self.stdout.write(f'{result.rows} row(s) checked, {result.failed_rows} with errors.')
+        else:
+            self.stdout.write(
+                f'{result.rows} row(s) in {result.seconds:.2f}s ({result.rows_per_second:.0f} rows/s, '
+                f'{result.hash_seconds:.2f}s hashing passwords with {importer.workers} worker(s)).'
+            )
+        if result.report:
+            self.stdout.write(self.style.WARNING(
+                f'{result.failed_rows} row(s) rejected; see {report_dir() / result.report}'
+            ))
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{result.created} user(s) created.'))
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+from users.retention import (
+    ARCHIVERS, RetentionPolicy, apply_policy, configured_policies, get_archiver, retention_setting,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive and delete old notifications according to the retention policies "
+        "in settings.NOTIFICATION_RETENTION (or one ad-hoc policy from the options)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be archived')
+        parser.add_argument('--policy', action='append', dest='policies', help='Run only the named policy (repeatable)')
+        parser.add_argument('--older-than', type=int, help='Ad-hoc policy: age in days')
+        parser.add_argument('--read', choices=['yes', 'no', 'any'], default='yes', help='Ad-hoc policy: read state')
+        parser.add_argument('--archive', choices=sorted(ARCHIVERS), help='Archive target (default from settings)')
+        parser.add_argument('--archive-dir', help='Directory for file archives')
+        parser.add_argument('--batch-size', type=int, help='Rows per transaction')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        if options['older_than'] is not None:
+            read = {'yes': True, 'no': False, 'any': None}[options['read']]
+            policies = [RetentionPolicy(name='ad-hoc', older_than_days=options['older_than'], read=read)]
+        else:
+            policies = configured_policies()
+            if options['policies']:
+                wanted = set(options['policies'])
+                unknown = wanted - {policy.name for policy in policies}
+                if unknown:
+                    raise CommandError(f"Unknown policy: {', '.join(sorted(unknown))}")
+                policies = [policy for policy in policies if policy.name in wanted]
+
+        archiver = None
+        if not options['dry_run']:
+            kind = options['archive'] or retention_setting('ARCHIVE')
+            kwargs = {'directory': options['archive_dir']} if options['archive_dir'] and kind == 'file' else {}
+            archiver = get_archiver(kind, **kwargs)
+
+        total = 0
+        for policy in policies:
+            self.stdout.write(f'Policy {policy}')
+            if options['dry_run']:
+                months = (
+                    policy.queryset().annotate(month=TruncMonth('created_at'))
+                    .values('month').annotate(rows=Count('id')).order_by('month')
+                )
+                for month in months:
+                    self.stdout.write(f"  {month['month']:%Y-%m}: {month['rows']} row(s)")
+
+            def progress(result):
+                if result.batches % 10 == 0:
+                    self.stdout.write(f'  ... {result.archived} archived in {result.batches} batch(es)')
+
+            result = apply_policy(
+                policy, archiver, batch_size=options['batch_size'], dry_run=options['dry_run'],
+                pause=options['pause'], on_batch=progress,
+            )
+            total += result.matched
+            if options['dry_run']:
+                self.stdout.write(f'  would archive {result.matched} row(s)')
+            else:
+                self.stdout.write(
+                    f'  archived {result.archived} row(s) in {result.batches} batch(es), '
+                    f'{result.seconds:.2f}s ({result.rows_per_second:.0f} rows/s)'
+                )
+
+        verb = 'would be archived' if options['dry_run'] else 'archived'
+        self.stdout.write(self.style.SUCCESS(f'{total} notification(s) {verb}.'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from users.directory import rebuild_keys
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the student directory search keys for every user, e.g. after "
+        "bulk imports that bypass model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to rebuild')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_keys(options['database'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} search key(s) in {time.perf_counter() - started:.2f}s.'
+        ))
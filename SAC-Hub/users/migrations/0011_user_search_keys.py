@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:35
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of the key normalisation in users.directory as of this migration
+ROLL_NO, NAME, ACCOUNT = 0, 1, 2
+KEY_LENGTH = 150
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', (text or '').casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _compact(text):
+    return ''.join(_WORD.findall(normalize(text)))
+
+
+def user_keys(user):
+    keys = set()
+    if user.roll_no:
+        keys.add((ROLL_NO, _compact(user.roll_no)))
+    for word in _WORD.findall(normalize(f'{user.first_name} {user.last_name}')):
+        keys.add((NAME, word))
+    for account in ((user.email or '').split('@')[0], user.username):
+        if account and account != user.roll_no:
+            keys.add((ACCOUNT, _compact(account)))
+    return sorted((kind, key[:KEY_LENGTH]) for kind, key in keys if key)
+
+
+def role_flags(user):
+    roles = user.roles or []
+    return {'is_student': 'STUDENT' in roles, 'is_club_coordinator': 'CLUB_COORDINATOR' in roles}
+
+
+def fill_search_keys(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    UserSearchKey = apps.get_model('users', 'UserSearchKey')
+    db = schema_editor.connection.alias
+    batch = []
+    for user in User.objects.using(db).order_by('pk').iterator(chunk_size=2000):
+        flags = role_flags(user)
+        batch.extend(UserSearchKey(user_id=user.pk, kind=kind, key=key, **flags) for kind, key in user_keys(user))
+        if len(batch) >= 2000:
+            UserSearchKey.objects.using(db).bulk_create(batch)
+            batch = []
+    UserSearchKey.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=150)),
+                ('kind', models.PositiveSmallIntegerField(choices=[(0, 'Roll number'), (1, 'Name word'), (2, 'Email local part or username')])),
+                ('is_student', models.BooleanField(default=False)),
+                ('is_club_coordinator', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'key', 'user'], name='user_search_key_idx')],
+            },
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+    ]
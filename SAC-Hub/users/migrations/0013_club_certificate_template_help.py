@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_club_logo_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='club',
+            name='certificate_template',
+            field=models.ImageField(blank=True, help_text='Certificate template image (JPG/PNG, at least 1500x1277px or the same proportions)', null=True, upload_to='certificate_templates/'),
+        ),
+    ]
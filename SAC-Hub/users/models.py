@@ -17,6 +17,8 @@ class Club(models.Model):
         'User', blank=True, related_name='coordinated_clubs'
     )
     logo = models.ImageField(upload_to='club_logos/', null=True, blank=True)
+    # Resized copies of the logo, written by sac_project.images
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     advisor = models.ForeignKey(
         'User', on_delete=models.SET_NULL, null=True, blank=True,
         related_name='advised_clubs', limit_choices_to={'roles': 'FACULTY'}
@@ -25,7 +27,7 @@ class Club(models.Model):
         upload_to='certificate_templates/',
         null=True,
         blank=True,
-        help_text='Upload a certificate template image (JPG/PNG, recommended: 1500x1000px)'
+        help_text='Certificate template image (JPG/PNG, at least 1500x1277px or the same proportions)'
     )
 
     def __str__(self):
@@ -76,6 +78,33 @@ class User(AbstractUser):
 			return f"{self.get_full_name()} ({self.roll_no})"
 		return f"{self.get_full_name()} ({self.email})"
 
+class UserSearchKey(models.Model):
+	"""Normalised prefix key for the student directory search (see users.directory)."""
+	ROLL_NO = 0
+	NAME = 1
+	ACCOUNT = 2
+	KIND_CHOICES = [
+		(ROLL_NO, 'Roll number'),
+		(NAME, 'Name word'),
+		(ACCOUNT, 'Email local part or username'),
+	]
+
+	user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='search_keys')
+	key = models.CharField(max_length=150)
+	kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+	# Copied from User.roles, which SQLite cannot filter on
+	is_student = models.BooleanField(default=False)
+	is_club_coordinator = models.BooleanField(default=False)
+
+	class Meta:
+		indexes = [
+			# Prefix lookups are range scans on key within each kind
+			models.Index(fields=['kind', 'key', 'user'], name='user_search_key_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.key} -> user {self.user_id}"
+
 class Notification(models.Model):
 	user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='notifications')
 	message = models.TextField()
@@ -83,5 +112,26 @@ class Notification(models.Model):
 	created_at = models.DateTimeField(auto_now_add=True)
 	read = models.BooleanField(default=False)
 
+	class Meta:
+		indexes = [
+			# Unread/read counts and filtered lists
+			models.Index(fields=['user', 'read', 'created_at'], name='notification_user_read_idx'),
+			# "Latest N for this user" on the dashboards
+			models.Index(fields=['user', 'created_at'], name='notification_user_created_idx'),
+		]
+
+	def __str__(self):
+		return f"To: {self.user} | {self.message[:40]}{'...' if len(self.message) > 40 else ''}"
+
+class ArchivedNotification(models.Model):
+	"""Notification moved out of the live table by the retention job (see users.retention)."""
+	original_id = models.BigIntegerField(unique=True)
+	user_id = models.BigIntegerField(db_index=True)
+	message = models.TextField()
+	important = models.BooleanField(default=False)
+	read = models.BooleanField(default=False)
+	created_at = models.DateTimeField()
+	archived_at = models.DateTimeField(auto_now_add=True)
+
 	def __str__(self):
-		return f"To: {self.user} | {self.message[:40]}{'...' if len(self.message) > 40 else ''}"
\ No newline at end of file
+		return f"Archived #{self.original_id} for user {self.user_id}"
@@ -0,0 +1,191 @@
+"""
+Retention for ``Notification`` rows.
+
+Policies select old rows (for example "read and older than 90 days"); matching
+rows are copied to an archive and deleted from the live table in small batches.
+Each batch is its own short transaction, so writers on the notifications table
+are never blocked for long, and an interrupted run can simply be restarted.
+
+Two archive targets are available:
+
+* ``file``: gzip-compressed JSON lines, one file per month of ``created_at``
+  (``notifications-2025-08.jsonl.gz``). Each batch is appended as a new gzip
+  member, which standard gzip readers concatenate transparently, once its
+  deletions commit: a batch that rolls back leaves nothing behind, so the
+  next run does not archive its rows twice.
+* ``table``: rows are copied into ``ArchivedNotification``.
+"""
+import gzip
+import json
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedNotification, Notification
+
+DEFAULTS = {
+    'POLICIES': [
+        {'name': 'read-90d', 'read': True, 'older_than_days': 90},
+        {'name': 'unread-365d', 'read': False, 'older_than_days': 365, 'important': False},
+    ],
+    'ARCHIVE': 'file',
+    'ARCHIVE_DIR': None,
+    'BATCH_SIZE': 1000,
+}
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'message', 'important', 'read', 'created_at')
+
+
+def retention_setting(name):
+    return getattr(settings, 'NOTIFICATION_RETENTION', {}).get(name, DEFAULTS[name])
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    name: str
+    older_than_days: int
+    read: bool = None
+    important: bool = None
+
+    def cutoff(self, now=None):
+        return (now or timezone.now()) - timedelta(days=self.older_than_days)
+
+    def queryset(self, now=None):
+        qs = Notification.objects.filter(created_at__lt=self.cutoff(now))
+        if self.read is not None:
+            qs = qs.filter(read=self.read)
+        if self.important is not None:
+            qs = qs.filter(important=self.important)
+        return qs
+
+    def __str__(self):
+        parts = [f'older than {self.older_than_days}d']
+        if self.read is not None:
+            parts.append('read' if self.read else 'unread')
+        if self.important is not None:
+            parts.append('important' if self.important else 'not important')
+        return f"{self.name} ({', '.join(parts)})"
+
+
+def configured_policies():
+    return [RetentionPolicy(**policy) for policy in retention_setting('POLICIES')]
+
+
+class FileArchiver:
+    """Append rows to per-month gzip JSON-lines files."""
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or retention_setting('ARCHIVE_DIR') or settings.BASE_DIR / 'archive' / 'notifications')
+
+    def path_for(self, created_at):
+        return self.directory / f"notifications-{created_at:%Y-%m}.jsonl.gz"
+
+    def archive(self, rows):
+        """Compress ``rows`` into temporary files now and append them when the transaction commits."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(self.path_for(row['created_at']), []).append(row)
+        members = []
+        for path, month_rows in by_month.items():
+            # Anonymous: dropped with the callback if the transaction rolls back
+            member = tempfile.TemporaryFile(dir=self.directory)
+            with gzip.open(member, 'wt', encoding='utf-8') as handle:
+                for row in month_rows:
+                    handle.write(json.dumps({**row, 'created_at': row['created_at'].isoformat()}) + '\n')
+            members.append((path, member))
+        transaction.on_commit(lambda: self._append(members))
+
+    @staticmethod
+    def _append(members):
+        for path, member in members:
+            with member, open(path, 'ab') as handle:
+                member.seek(0)
+                shutil.copyfileobj(member, handle)
+
+
+class TableArchiver:
+    """Copy rows into ``ArchivedNotification``."""
+
+    def archive(self, rows):
+        ArchivedNotification.objects.bulk_create(
+            [
+                ArchivedNotification(
+                    original_id=row['id'], user_id=row['user_id'], message=row['message'],
+                    important=row['important'], read=row['read'], created_at=row['created_at'],
+                )
+                for row in rows
+            ],
+            ignore_conflicts=True,
+        )
+
+
+ARCHIVERS = {
+    'file': FileArchiver,
+    'table': TableArchiver,
+}
+
+
+def get_archiver(kind=None, **kwargs):
+    return ARCHIVERS[kind or retention_setting('ARCHIVE')](**kwargs)
+
+
+@dataclass
+class RetentionResult:
+    policy: RetentionPolicy
+    matched: int = 0
+    archived: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.archived / self.seconds if self.seconds else 0.0
+
+
+def apply_policy(policy, archiver, batch_size=None, dry_run=False, pause=0.0, now=None, on_batch=None):
+    """Archive and delete the rows matching ``policy``.
+
+    Rows are walked in primary-key order with a keyset cursor, so every batch
+    is an index range scan regardless of how much has already been removed.
+    With ``dry_run`` nothing is written; only the match count is reported.
+    """
+    batch_size = batch_size or retention_setting('BATCH_SIZE')
+    queryset = policy.queryset(now)
+    result = RetentionResult(policy=policy)
+    started = time.perf_counter()
+    if dry_run:
+        result.matched = queryset.count()
+        result.seconds = time.perf_counter() - started
+        return result
+
+    cursor = 0
+    while True:
+        rows = list(queryset.filter(id__gt=cursor).order_by('id').values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            break
+        cursor = rows[-1]['id']
+        ids = [row['id'] for row in rows]
+        with transaction.atomic():
+            # Only rows that still match (e.g. not marked unread since) are deleted and archived
+            deleted, _ = queryset.filter(id__in=ids).delete()
+            if deleted < len(rows):
+                kept = set(Notification.objects.filter(id__in=ids).values_list('id', flat=True))
+                rows = [row for row in rows if row['id'] not in kept]
+            archiver.archive(rows)
+        result.matched += len(rows)
+        result.archived += len(rows)
+        result.batches += 1
+        if on_batch:
+            on_batch(result)
+        if pause:
+            time.sleep(pause)
+    result.seconds = time.perf_counter() - started
+    return result
@@ -1,6 +1,8 @@
-from django.db.models.signals import m2m_changed
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from .models import Club, User
+from .models import Club, User, Notification
 
 
 @receiver(m2m_changed, sender=Club.coordinators.through)
@@ -38,3 +40,45 @@ def handle_club_coordinators_changed(sender, instance, action, pk_set, **kwargs)
 			if not user.coordinated_clubs.exists() and 'CLUB_COORDINATOR' in user.roles:
 				user.roles.remove('CLUB_COORDINATOR')
 				user.save()
+
+
+@receiver(post_save, sender=Notification)
+def push_new_notification(sender, instance, created, **kwargs):
+	"""
+	Push newly created notifications to the user's open SSE streams once committed.
+	"""
+	from sac_project.realtime import publish_notification, push_suppressed
+
+	if created and not push_suppressed():
+		transaction.on_commit(lambda: publish_notification(instance))
+
+
+@receiver(post_save, sender=User)
+def update_search_keys(sender, instance, using, update_fields=None, **kwargs):
+	"""
+	Keep the student directory keys in step with the user's searchable fields.
+	"""
+	from .directory import SEARCH_FIELDS, sync_user
+
+	# Logins only touch last_login
+	if update_fields is not None and not set(update_fields) & SEARCH_FIELDS:
+		return
+	sync_user(instance, using)
+
+
+@receiver(post_delete, sender=User)
+def drop_search_keys(sender, instance, using, **kwargs):
+	from .directory import forget_user
+
+	forget_user(instance.pk, using)
+
+
+@receiver(user_logged_in)
+def remember_role_profile(sender, request, user, **kwargs):
+	"""
+	Cache the user's roles and dashboard in the session (see users.backends).
+	"""
+	from .backends import store_role_profile
+
+	if request is not None and hasattr(request, 'session'):
+		store_role_profile(request, user)
@@ -0,0 +1,44 @@
+"""Background tasks of the users app (see jobs.queue)."""
+from jobs.queue import task
+
+# Notifications created per progress report
+CHUNK_SIZE = 500
+
+
+@task('notifications.send')
+def send_notifications(ctx, *, user_ids, message, important=False, broadcast=False):
+    """Create ``message`` for every user in ``user_ids``.
+
+    A broadcast (everyone is a recipient) is written with ``bulk_create`` and
+    announced with one push to all connected clients; targeted notifications
+    are saved one by one so that each recipient gets the usual real-time push.
+
+    Each chunk commits together with its checkpoint, so a retried job picks up
+    after the last committed chunk and nobody is notified twice.
+    """
+    from django.db import transaction
+    from django.db.models import Max
+
+    from sac_project.metrics import NOTIFICATION_FANOUT
+    from sac_project.realtime import publish_announcement
+
+    from .models import Notification
+
+    total = len(user_ids)
+    for start in range(ctx.job.progress_done, total, CHUNK_SIZE):
+        chunk = user_ids[start:start + CHUNK_SIZE]
+        with transaction.atomic():
+            if broadcast:
+                Notification.objects.bulk_create(
+                    [Notification(user_id=user_id, message=message, important=important) for user_id in chunk]
+                )
+            else:
+                for user_id in chunk:
+                    Notification.objects.create(user_id=user_id, message=message, important=important)
+            ctx.checkpoint(start + len(chunk), total)
+    if broadcast and total:
+        # Also right when earlier attempts wrote some of the chunks
+        last_id = Notification.objects.filter(user_id=user_ids[-1], message=message).aggregate(last=Max('id'))['last']
+        publish_announcement(message, important=important, last_id=last_id)
+    NOTIFICATION_FANOUT.observe(total, kind='broadcast' if broadcast else 'targeted')
+    return {'sent': total}
@@ -1,3 +1,330 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import authenticate, get_user
+from django.core.management import call_command
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.functional import SimpleLazyObject
+from django.utils import timezone
+
+from jobs.models import Job, JobStatus
+from jobs.queue import enqueue, run_pending
+from sac_project.tabular import TabularError, read_table
+from .backends import ROLE_PROFILE_SESSION_KEY, lookup_order, role_profile
+from .bulk_import import import_users
+from .directory import _indexes, filter_users, search_students, user_keys
+from .models import ArchivedNotification, Club, Department, Notification, User
+from .retention import FileArchiver, RetentionPolicy, TableArchiver, apply_policy
+
+
+def xlsx(rows):
+    from openpyxl import Workbook
+
+    book = Workbook()
+    for row in rows:
+        book.active.append(row)
+    handle = BytesIO()
+    book.save(handle)
+    handle.seek(0)
+    return handle
+
+
+class TabularTests(TestCase):
+    def test_csv_headers_are_normalized(self):
+        data = '\ufeffName,DEPARTMENT,Roll Number,Extra\nAsha,CSE,21CS0001,x\n,,,\nRavi,ECE\n'.encode()
+        rows = list(read_table(BytesIO(data), 'people.csv', ('name', 'department', 'roll_no'),
+                               aliases={'roll_number': 'roll_no'}))
+        self.assertEqual([number for number, _ in rows], [2, 4])
+        self.assertEqual(rows[0][1], ('Asha', 'CSE', '21CS0001'))
+        self.assertEqual((rows[1][1].name, rows[1][1].roll_no), ('Ravi', ''))
+
+    def test_xlsx_numbers_are_read_as_text(self):
+        handle = xlsx([['name', 'Department', 'roll_no'], ['Asha', 'CSE', 2101.0], [None, None, None]])
+        rows = list(read_table(handle, 'people.xlsx', ('name', 'department', 'roll_no')))
+        self.assertEqual(rows, [(2, ('Asha', 'CSE', '2101'))])
+
+    def test_missing_required_column(self):
+        with self.assertRaisesMessage(TabularError, 'Missing column(s): name.'):
+            read_table(BytesIO(b'department\nCSE\n'), 'people.csv', ('name', 'department'), required=('name',))
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        reports = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, reports, ignore_errors=True)
+        override = override_settings(USER_IMPORT={'REPORT_DIR': reports})
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_import_from_xlsx(self):
+        Department.objects.create(name='CSE')
+        handle = xlsx([
+            ['Roll Number', 'First Name', 'Department', 'Role'],
+            ['21CS0001', 'Asha', 'cse', 'STUDENT'],
+            ['21CS0001', 'Asha again', 'CSE', 'STUDENT'],
+            ['', 'Ravi', 'Physics', 'STUDENT'],
+        ])
+        result = import_users(handle, 'users.xlsx', workers=0)
+        self.assertEqual((result.rows, result.created, result.failed_rows), (3, 1, 2))
+        user = User.objects.get(username='21CS0001')
+        self.assertEqual((user.first_name, user.department.name), ('Asha', 'CSE'))
+        self.assertEqual(
+            sorted((error.row, error.column) for error in result.errors),
+            [(3, 'roll_no'), (4, 'department'), (4, 'roll_no')],
+        )
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        self.user = User.objects.create(username='21CS0001', roles=['STUDENT'])
+
+    def make(self, count, days_old, read):
+        ids = [
+            Notification.objects.create(user=self.user, message=f'Message {number}', read=read).id
+            for number in range(count)
+        ]
+        Notification.objects.filter(id__in=ids).update(created_at=timezone.now() - timedelta(days=days_old))
+        return ids
+
+    def test_archives_to_file_in_batches(self):
+        old = self.make(5, 120, read=True)
+        self.make(2, 10, read=True)
+        self.make(2, 120, read=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = apply_policy(
+                RetentionPolicy('read-90d', 90, read=True), FileArchiver(self.archive_dir), batch_size=2,
+            )
+        self.assertEqual((result.matched, result.archived, result.batches), (5, 5, 3))
+        self.assertFalse(Notification.objects.filter(id__in=old).exists())
+        self.assertEqual(Notification.objects.count(), 4)
+        self.assertEqual(sorted(self.archived_ids()), old)
+
+    def archived_ids(self):
+        ids = []
+        for path in Path(self.archive_dir).glob('notifications-*.jsonl.gz'):
+            with gzip.open(path, 'rt', encoding='utf-8') as handle:
+                ids.extend(json.loads(line)['id'] for line in handle)
+        return ids
+
+    def test_rolled_back_batch_is_not_archived(self):
+        ids = self.make(3, 120, read=True)
+        policy = RetentionPolicy('read-90d', 90, read=True)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            apply_policy(policy, FileArchiver(self.archive_dir))
+            raise RuntimeError('interrupted')
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertEqual(self.archived_ids(), [])
+        self.assertEqual(list(Path(self.archive_dir).iterdir()), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_policy(policy, FileArchiver(self.archive_dir))
+        self.assertEqual(sorted(self.archived_ids()), ids)
+
+    def test_dry_run_then_table_archive(self):
+        ids = self.make(3, 400, read=False)
+        policy = RetentionPolicy('unread-365d', 365, read=False, important=False)
+
+        result = apply_policy(policy, None, dry_run=True)
+        self.assertEqual((result.matched, result.archived), (3, 0))
+        self.assertEqual(Notification.objects.count(), 3)
+
+        apply_policy(policy, TableArchiver())
+        self.assertEqual(sorted(ArchivedNotification.objects.values_list('original_id', flat=True)), ids)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_command_with_archive_dir_and_table_setting(self):
+        self.make(2, 120, read=True)
+        out = StringIO()
+        call_command('prune_notifications', older_than=90, dry_run=True, stdout=out)
+        self.assertIn('2 notification(s) would be archived.', out.getvalue())
+
+        # The directory only applies to file archives
+        with override_settings(NOTIFICATION_RETENTION={'ARCHIVE': 'table'}):
+            call_command('prune_notifications', older_than=90, archive_dir=self.archive_dir, stdout=StringIO())
+        self.assertEqual(ArchivedNotification.objects.count(), 2)
+
+
+class DirectorySearchTests(TestCase):
+    def setUp(self):
+        _indexes.clear()
+        self.addCleanup(_indexes.clear)
+        self.rama = self.user('21CS0042', 'Rāma', 'Krishnan', 'rk@example.edu')
+        self.ramesh = self.user('21CS0420', 'Ramesh', 'Iyer', 'ramesh.iyer@example.edu')
+        self.ramya = self.user('22EE0007', 'Ramya', 'Shah', 'ram21cs@example.edu')
+        self.coordinator = self.user(
+            '21CS0099', 'Ram', 'Coordinator', 'coord@example.edu', ['STUDENT', 'CLUB_COORDINATOR'],
+        )
+        self.faculty = self.user(None, 'Ramanujan', 'Staff', 'ramanujan@example.edu', ['SAC_COORDINATOR'])
+
+    @staticmethod
+    def user(roll_no, first_name, last_name, email, roles=('STUDENT',)):
+        return User.objects.create(
+            username=roll_no or email.split('@')[0], roll_no=roll_no, first_name=first_name,
+            last_name=last_name, email=email, roles=list(roles),
+        )
+
+    def ids(self, query, **options):
+        return [entry['id'] for entry in search_students(query, **options)]
+
+    def check_both_engines(self, test):
+        test()
+        with override_settings(STUDENT_DIRECTORY={'IN_PROCESS_INDEX': True, 'INDEX_MAX_AGE': 300, 'LIMIT': 20}):
+            test()
+
+    def test_roll_numbers_rank_before_names_and_accounts(self):
+        def test():
+            # Exact roll number, roll number prefixes, then name words, then account names
+            self.assertEqual(self.ids('21cs0042'), [self.rama.pk])
+            self.assertEqual(self.ids('21CS004'), [self.rama.pk])
+            self.assertEqual(self.ids('21cs'), [self.rama.pk, self.coordinator.pk, self.ramesh.pk])
+            self.assertEqual(self.ids('rk'), [self.rama.pk])
+        self.check_both_engines(test)
+
+    def test_every_word_must_prefix_a_key_and_accents_are_ignored(self):
+        def test():
+            self.assertEqual(self.ids('rama krish'), [self.rama.pk])
+            self.assertEqual(self.ids('RAM'), [self.coordinator.pk, self.rama.pk, self.ramesh.pk, self.ramya.pk])
+            self.assertEqual(self.ids('ram iyer'), [self.ramesh.pk])
+            self.assertEqual(self.ids('zzz'), [])
+            self.assertEqual(self.ids('  '), [])
+        self.check_both_engines(test)
+
+    def test_role_filters_and_limit(self):
+        def test():
+            self.assertNotIn(self.faculty.pk, self.ids('ram'))
+            self.assertIn(self.faculty.pk, self.ids('ram', students_only=False))
+            self.assertNotIn(self.coordinator.pk, self.ids('ram', exclude_coordinators=True))
+            self.assertEqual(len(self.ids('ram', limit=2)), 2)
+        self.check_both_engines(test)
+
+    def test_keys_follow_changes_and_deletes(self):
+        self.assertEqual(self.ids('iyer'), [self.ramesh.pk])
+        with override_settings(STUDENT_DIRECTORY={'IN_PROCESS_INDEX': True, 'INDEX_MAX_AGE': 300, 'LIMIT': 20}):
+            self.assertEqual(self.ids('iyer'), [self.ramesh.pk])
+            self.ramesh.last_name = 'Menon'
+            self.ramesh.save()
+            self.assertEqual(self.ids('iyer'), [])
+            self.assertEqual(self.ids('menon'), [self.ramesh.pk])
+            self.ramya.delete()
+            self.assertEqual(self.ids('ramya'), [])
+        self.assertEqual(self.ids('menon'), [self.ramesh.pk])
+
+    def test_filter_users(self):
+        self.assertEqual(
+            set(filter_users(User.objects.all(), 'ram 21cs')), {self.rama, self.ramesh, self.coordinator},
+        )
+
+    def test_migration_keys_match_the_directory(self):
+        migration = importlib.import_module('users.migrations.0011_user_search_keys')
+        for user in User.objects.all():
+            self.assertEqual(migration.user_keys(user), user_keys(user))
+            self.assertEqual(
+                migration.role_flags(user),
+                {'is_student': 'STUDENT' in user.roles, 'is_club_coordinator': 'CLUB_COORDINATOR' in user.roles},
+            )
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class IdentifierBackendTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create(
+            username='21CS0001', roll_no='21CS0001', email='asha@example.edu', roles=['STUDENT'],
+        )
+        self.student.set_password('pass-1234')
+        self.student.save()
+        # Not a student, so the username is kept: it looks like an email but is not one
+        self.legacy = User.objects.create(username='ops@sac', roll_no='ST2024001', roles=['FACULTY'])
+        self.legacy.set_password('pass-1234')
+        self.legacy.save()
+
+    def test_lookup_order_follows_the_shape_of_the_identifier(self):
+        self.assertEqual(lookup_order('asha@example.edu'), ['email', 'username'])
+        self.assertEqual(lookup_order('ST2024001'), ['roll_no', 'username'])
+        self.assertEqual(lookup_order('240100001'), ['roll_no', 'username'])
+        # Student usernames are their roll numbers, so these still log in by username
+        self.assertEqual(lookup_order('21CS0001'), ['username', 'roll_no'])
+        self.assertEqual(lookup_order('asha'), ['username', 'roll_no'])
+
+    def test_login_by_roll_number_email_or_username(self):
+        for identifier in ('21CS0001', ' asha@example.edu ', 'asha@example.edu'):
+            self.assertEqual(authenticate(username=identifier, password='pass-1234'), self.student)
+        self.assertEqual(authenticate(username='ops@sac', password='pass-1234'), self.legacy)
+        self.assertEqual(authenticate(username='ST2024001', password='pass-1234'), self.legacy)
+
+    def test_wrong_password_unknown_and_inactive_accounts_fail(self):
+        self.assertIsNone(authenticate(username='21CS0001', password='wrong'))
+        self.assertIsNone(authenticate(username='nobody@example.edu', password='pass-1234'))
+        self.assertIsNone(authenticate(username='', password='pass-1234'))
+        self.student.is_active = False
+        self.student.save()
+        self.assertIsNone(authenticate(username='21CS0001', password='pass-1234'))
+
+    def request(self):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        return request
+
+    def test_role_profile_is_read_from_the_session(self):
+        club = Club.objects.create(name='Robotics')
+        club.coordinators.add(self.student)
+        self.student.roles = ['STUDENT', 'CLUB_COORDINATOR']
+        self.student.save()
+        self.assertTrue(self.client.login(username='21CS0001', password='pass-1234'))
+        request = self.request()
+        request.session.keys()  # load the session
+        with self.assertNumQueries(0):
+            profile = role_profile(request)
+        self.assertEqual(profile['dashboard'], 'club-coordinator-dashboard-template')
+        self.assertEqual(profile['coordinated_clubs'], [{'id': club.pk, 'name': 'Robotics'}])
+        self.assertIsNone(role_profile(RequestFactory().get('/')))
+
+    def test_expired_role_profile_is_rebuilt(self):
+        self.assertTrue(self.client.login(username='21CS0001', password='pass-1234'))
+        self.student.roles = ['SVP']
+        self.student.save()
+        request = self.request()
+        self.assertEqual(role_profile(request)['dashboard'], 'student-dashboard')
+        request.session[ROLE_PROFILE_SESSION_KEY]['refreshed'] = time.time() - 301
+        self.assertEqual(role_profile(request)['dashboard'], 'svp-dashboard-template')
+
+
+class SendNotificationsTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username=f'user{number}') for number in range(3)]
+        self.user_ids = [user.pk for user in self.users]
+
+    def test_sends_to_every_user(self):
+        for broadcast in (False, True):
+            enqueue('notifications.send', args={
+                'user_ids': self.user_ids, 'message': f'Broadcast {broadcast}', 'broadcast': broadcast,
+            })
+            run_pending()
+            self.assertEqual(
+                sorted(Notification.objects.filter(message=f'Broadcast {broadcast}').values_list('user_id', flat=True)),
+                self.user_ids,
+            )
+
+    def test_retry_skips_users_already_notified(self):
+        # An earlier attempt committed the first user's notification with its checkpoint, then died
+        Notification.objects.create(user=self.users[0], message='Fest tomorrow')
+        job = enqueue('notifications.send', args={'user_ids': self.user_ids, 'message': 'Fest tomorrow'})
+        Job.objects.filter(pk=job.pk).update(progress_done=1, attempts=1)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (JobStatus.SUCCEEDED, {'sent': 3}))
+        self.assertEqual(
+            sorted(Notification.objects.filter(message='Fest tomorrow').values_list('user_id', flat=True)),
+            self.user_ids,
+        )